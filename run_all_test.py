@@ -10,8 +10,13 @@ import time
 import tracemalloc
 import gc
 import csv
+import math
+import statistics
+import multiprocessing as mp
+from multiprocessing.connection import wait as wait_connections
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 # Thêm src vào path và cài đặt để import các module
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,40 +34,101 @@ from src.PetriNet import PetriNet
 from src.BDD import bdd_reachable
 from src.BFS import bfs_reachable
 from src.DFS import dfs_reachable
+from src.Generator import FAMILIES, expected_states, write_family
 
 
-def measure_performance(algo_name: str, func, pn: PetriNet, timeout_seconds: float = 300) -> Optional[Dict[str, Any]]:
+ALGORITHMS = {
+    "BDD": bdd_reachable,
+    "BFS": bfs_reachable,
+    "DFS": dfs_reachable,
+}
+
+# Các thống kê thời gian ngoài median (time_ms) mà measure_performance() trả về
+TIME_STAT_KEYS = ("time_min_ms", "time_std_ms", "time_ci_low_ms", "time_ci_high_ms", "repetitions")
+
+
+def _run_once(algo_name: str, func, pn: PetriNet, bdd_stats: Dict[str, Any]) -> int:
+    """Chạy thuật toán một lần, trả về số trạng thái."""
+    if algo_name == "BDD":
+        # BDD trả về (bdd_object, count), stats ghi lại backend đã dùng
+        _, count = func(pn, stats=bdd_stats)
+        return count
+    # BFS/DFS trả về Set[Tuple]
+    return len(func(pn))
+
+
+def median_ci(samples: List[float], confidence: float = 0.95) -> Tuple[float, float]:
     """
-    Đo thời gian và bộ nhớ của một thuật toán.
+    Khoảng tin cậy cho median, không giả định phân phối (order statistics):
+    chọn k lớn nhất sao cho P(Binomial(n, 1/2) < k) <= (1 - confidence) / 2,
+    khoảng là [x_(k), x_(n-k+1)]. Với n quá nhỏ (n < 6 ở mức 95%) không có k
+    nào thỏa, khi đó trả về [min, max].
+    """
+    xs = sorted(samples)
+    n = len(xs)
+    alpha = (1.0 - confidence) / 2
+    k, tail = 0, 0.0
+    while k < n // 2:
+        tail_next = tail + math.comb(n, k) / 2 ** n
+        if tail_next > alpha:
+            break
+        tail, k = tail_next, k + 1
+    if k == 0:
+        return xs[0], xs[-1]
+    return xs[k - 1], xs[n - k]
+
+
+def summarize_times(samples_ms: List[float], confidence: float = 0.95) -> Dict[str, float]:
+    """Median, min, độ lệch chuẩn (mẫu) và khoảng tin cậy của median."""
+    lo, hi = median_ci(samples_ms, confidence)
+    return {
+        "time_ms": statistics.median(samples_ms),
+        "time_min_ms": min(samples_ms),
+        "time_std_ms": statistics.stdev(samples_ms) if len(samples_ms) > 1 else 0.0,
+        "time_ci_low_ms": lo,
+        "time_ci_high_ms": hi,
+        "repetitions": len(samples_ms),
+    }
+
+
+def measure_performance(algo_name: str, func, pn: PetriNet, timeout_seconds: float = 300,
+                        warmup: int = 0, repetitions: int = 1,
+                        progress=None) -> Optional[Dict[str, Any]]:
+    """
+    Đo thời gian và bộ nhớ của một thuật toán, theo hai pha tách biệt:
+    - pha bộ nhớ  : 1 lần chạy có tracemalloc -> peak memory và số trạng thái
+    - pha thời gian: warmup lần chạy bỏ đi, rồi repetitions lần bấm giờ KHÔNG
+                     bật tracemalloc (tracemalloc làm chậm code cấp phát nhiều)
     
     Args:
         algo_name: Tên thuật toán
         func: Hàm thực thi
         pn: Petri Net
-        timeout_seconds: Thời gian tối đa cho phép (giây)
+        timeout_seconds: Ngân sách thời gian (giây) của pha thời gian: hết ngân sách
+            thì không bắt đầu thêm lần chạy nào. Một lần chạy đang dở không tự ngắt
+            được; run_jobs() chạy mỗi job trong process riêng và kill lần chạy quá hạn.
+        warmup: Số lần chạy khởi động không tính giờ
+        repetitions: Số lần bấm giờ
+        progress: Nếu có, được gọi với kết quả tạm (như giá trị trả về) ngay sau pha
+            bộ nhớ và sau mỗi lần chạy của pha thời gian (kể cả warmup), để kết quả
+            không mất khi job bị kill
     
     Returns:
-        Dictionary chứa kết quả hoặc None nếu thất bại
+        Dictionary chứa kết quả hoặc None nếu thất bại.
+        time_ms là median; kèm time_min_ms, time_std_ms, time_ci_low_ms/time_ci_high_ms
+        (khoảng tin cậy 95% của median) và repetitions. Chưa có lần bấm giờ nào
+        (repetitions = 0) thì mọi cột thời gian là -1.
     """
     # Force GC before starting
     gc.collect()
+    bdd_stats = {}
     
-    # Reset và bắt đầu đo bộ nhớ
+    # --- Pha bộ nhớ: reset và bắt đầu đo bộ nhớ ---
     tracemalloc.stop()
     tracemalloc.start()
     
-    # Bắt đầu bấm giờ
-    start_time = time.perf_counter()
-    
     try:
-        if algo_name == "BDD":
-            # BDD trả về (bdd_object, count)
-            _, count = func(pn)
-        else:
-            # BFS/DFS trả về Set[Tuple]
-            visited_set = func(pn)
-            count = len(visited_set)
-            
+        count = _run_once(algo_name, func, pn, bdd_stats)
     except Exception as e:
         tracemalloc.stop()
         return {
@@ -70,27 +136,172 @@ def measure_performance(algo_name: str, func, pn: PetriNet, timeout_seconds: flo
             "count": "ERROR",
             "time_ms": -1,
             "memory_mb": -1,
+            "backend": bdd_stats.get("backend"),
             "error": str(e)
         }
-        
-    # Dừng bấm giờ
-    end_time = time.perf_counter()
     
     # Lấy thông số bộ nhớ (peak)
     _, peak_mem = tracemalloc.get_traced_memory()
     tracemalloc.stop()
-    
-    # Tính toán
-    elapsed_time_ms = (end_time - start_time) * 1000
     peak_mem_mb = peak_mem / (1024 * 1024)
     
-    return {
+    result = {
         "name": algo_name,
         "count": count,
-        "time_ms": elapsed_time_ms,
         "memory_mb": peak_mem_mb,
+        "backend": bdd_stats.get("backend"),
         "error": None
     }
+    # Chưa có lần bấm giờ nào: thời gian -1 như job lỗi (bị loại khỏi tổng và tỉ lệ)
+    result.update({key: -1 for key in ("time_ms",) + TIME_STAT_KEYS}, repetitions=0)
+    if progress is not None:
+        progress(dict(result))
+    
+    # --- Pha thời gian: không bật tracemalloc ---
+    samples_ms = []
+    phase_start = time.perf_counter()
+    for i in range(warmup + max(1, repetitions)):
+        if time.perf_counter() - phase_start > timeout_seconds:
+            break  # hết ngân sách: giữ các lần đã bấm giờ
+        gc.collect()
+        start_time = time.perf_counter()
+        _run_once(algo_name, func, pn, {})
+        end_time = time.perf_counter()
+        if i >= warmup:
+            samples_ms.append((end_time - start_time) * 1000)
+            result.update(summarize_times(samples_ms))
+        # Gửi cả sau lần warmup: run_jobs đặt lại hạn cho từng lần chạy khi nhận
+        if progress is not None:
+            progress(dict(result))
+    return result
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS của process hiện tại (MB), None nếu hệ điều hành không hỗ trợ."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run_job(pnml_file: str, algo_name: str, use_cache: bool, warmup: int, repetitions: int,
+             timeout_seconds: float, conn) -> None:
+    """
+    Chạy MỘT (file, thuật toán) trong process con và gửi kết quả qua pipe dạng
+    (xong?, kết quả): kết quả tạm sau pha bộ nhớ và sau mỗi lần chạy, rồi kết quả cuối.
+    """
+    def send(res, final):
+        res["peak_rss_mb"] = peak_rss_mb()
+        conn.send((final, res))
+
+    try:
+        pn = PetriNet.from_pnml_cached(pnml_file) if use_cache else PetriNet.from_pnml(pnml_file)
+        res = measure_performance(algo_name, ALGORITHMS[algo_name], pn, timeout_seconds,
+                                  warmup=warmup, repetitions=repetitions,
+                                  progress=lambda partial: send(partial, False))
+    except Exception as e:
+        res = {"name": algo_name, "count": "ERROR", "time_ms": -1, "memory_mb": -1,
+               "backend": None, "error": str(e)}
+    send(res, True)
+    conn.close()
+
+
+def _failed_result(algo_name: str, count: str, error: str) -> Dict[str, Any]:
+    return {"name": algo_name, "count": count, "time_ms": -1, "memory_mb": -1,
+            "backend": None, "peak_rss_mb": None, "error": error}
+
+
+def run_jobs(jobs: List[Tuple[str, str]], max_workers: Optional[int] = None,
+             timeout_seconds: float = 300, use_cache: bool = True,
+             warmup: int = 0, repetitions: int = 1) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Chạy các job (pnml_file, algo_name), mỗi job trong một process mới (spawn),
+    tối đa max_workers process cùng lúc (mặc định = số CPU).
+    warmup / repetitions được chuyển cho measure_performance(); timeout tính cho
+    từng lần chạy (đồng hồ đặt lại mỗi khi job gửi kết quả tạm), pha thời gian còn
+    ngừng thêm lần chạy khi đã tiêu hết timeout_seconds. Lần chạy quá hạn bị kill:
+    nếu pha bộ nhớ đã xong thì giữ kết quả tạm cuối cùng (timing_killed = True),
+    không thì count = "TIMEOUT"; process chết bất thường cho count = "ERROR".
+    """
+    max_workers = max(1, max_workers or os.cpu_count() or 1)
+    ctx = mp.get_context("spawn")
+    pending = deque(jobs)
+    running: Dict[Tuple[str, str], Tuple[Any, Any, float]] = {}
+    partial: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                job = pending.popleft()
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=_run_job, args=(job[0], job[1], use_cache, warmup, repetitions,
+                                                          timeout_seconds, send_conn))
+                proc.start()
+                send_conn.close()
+                running[job] = (proc, recv_conn, time.perf_counter())
+
+            ready = wait_connections([conn for _, conn, _ in running.values()], timeout=0.1)
+            now = time.perf_counter()
+
+            for job, (proc, conn, start) in list(running.items()):
+                if conn in ready:
+                    try:
+                        final, res = conn.recv()
+                    except EOFError:
+                        proc.join()
+                        final, res = True, _failed_result(job[1], "ERROR",
+                                                          f"worker exited with code {proc.exitcode}")
+                    if not final:
+                        partial[job] = res
+                        running[job] = (proc, conn, time.perf_counter())
+                        continue
+                    proc.join()
+                elif now - start > timeout_seconds:
+                    proc.kill()
+                    proc.join()
+                    if job in partial:
+                        res = dict(partial[job], timing_killed=True)
+                    else:
+                        res = _failed_result(job[1], "TIMEOUT", f"killed after {timeout_seconds:g}s")
+                else:
+                    continue
+
+                conn.close()
+                del running[job]
+                partial.pop(job, None)
+                results[job] = res
+                print_job_result(job, res)
+    finally:
+        for proc, conn, _ in running.values():
+            proc.kill()
+            proc.join()
+            conn.close()
+
+    return results
+
+
+def print_job_result(job: Tuple[str, str], res: Dict[str, Any]) -> None:
+    filename, algo_name = os.path.basename(job[0]), job[1]
+    rss = res.get("peak_rss_mb")
+    rss_str = f"{rss:.2f}MB" if rss is not None else "N/A"
+    if res["count"] == "TIMEOUT":
+        status = "TIMEOUT"
+    elif res["error"] is not None:
+        status = f"ERROR: {res['error']}"
+    elif not res["repetitions"]:
+        status = f"OK (States: {res['count']}, Time: N/A [no timed run], Peak RSS: {rss_str})"
+    else:
+        status = (f"OK (States: {res['count']}, Time: {res['time_ms']:.2f}ms "
+                  f"[median of {res['repetitions']}, CI {res['time_ci_low_ms']:.2f}-{res['time_ci_high_ms']:.2f}], "
+                  f"Peak RSS: {rss_str})")
+    if res.get("timing_killed"):
+        status += " [timing run killed, earlier runs kept]"
+    backend = f", Backend: {res['backend']}" if algo_name == "BDD" and res.get("backend") else ""
+    print(f"  [{algo_name}] {filename}: {status}{backend}")
 
 
 def get_pnml_files(test_folder: str) -> List[str]:
@@ -111,9 +322,18 @@ def get_pnml_files(test_folder: str) -> List[str]:
     return sorted(pnml_files, key=extract_number)
 
 
-def run_benchmark_all(test_folder: str = "Test_cases", output_folder: str = "Benchmark_output"):
+def run_benchmark_all(test_folder: str = "Test_cases", output_folder: str = "Benchmark_output",
+                      use_cache: bool = True, max_workers: Optional[int] = None,
+                      timeout_seconds: float = 300, warmup: int = 1, repetitions: int = 5):
     """
     Chạy benchmark cho tất cả các file Petri Net và xuất kết quả.
+    use_cache: đọc net qua cache nhị phân <file>.pnml.cache.npz thay vì parse lại XML.
+    max_workers: số job (file, thuật toán) chạy song song, mỗi job một process riêng
+                 (mặc định = số CPU; đặt 1 để thời gian đo không bị tranh chấp CPU).
+    timeout_seconds: hạn cho từng lần chạy (xem run_jobs); lần chạy quá hạn bị kill,
+                 kết quả ghi "TIMEOUT" nếu chưa xong cả pha bộ nhớ.
+    warmup, repetitions: số lần chạy khởi động / số lần bấm giờ cho mỗi job;
+                 thời gian báo cáo là median, bộ nhớ đo ở một lần chạy riêng có tracemalloc.
     """
     # Tạo thư mục output nếu chưa tồn tại
     os.makedirs(output_folder, exist_ok=True)
@@ -129,24 +349,25 @@ def run_benchmark_all(test_folder: str = "Test_cases", output_folder: str = "Ben
     print("BENCHMARK: BDD vs BFS vs DFS (Reachability Analysis)")
     print(f"Thời gian chạy: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Số lượng file: {len(pnml_files)}")
+    print(f"Số process song song: {max_workers or os.cpu_count() or 1}, timeout: {timeout_seconds:g}s")
+    print(f"Warmup: {warmup}, repetitions: {repetitions}")
     print("=" * 80)
     
     # Kết quả tổng hợp
     all_results = []
+    jobs = []
     
     for idx, pnml_file in enumerate(pnml_files, 1):
         filename = os.path.basename(pnml_file)
-        print(f"\n[{idx}/{len(pnml_files)}] Processing: {filename}")
-        print("-" * 60)
         
-        # Đọc Petri Net
+        # Đọc Petri Net (tạo luôn cache cho các process con)
         try:
-            pn = PetriNet.from_pnml(pnml_file)
+            pn = PetriNet.from_pnml_cached(pnml_file) if use_cache else PetriNet.from_pnml(pnml_file)
             num_places = len(pn.place_names)
             num_trans = len(pn.trans_names)
-            print(f"  Places: {num_places}, Transitions: {num_trans}")
+            print(f"[{idx}/{len(pnml_files)}] {filename}: Places: {num_places}, Transitions: {num_trans}")
         except Exception as e:
-            print(f"  ERROR: Không thể đọc file - {e}")
+            print(f"[{idx}/{len(pnml_files)}] {filename}: ERROR: Không thể đọc file - {e}")
             all_results.append({
                 "file": filename,
                 "places": "N/A",
@@ -154,53 +375,48 @@ def run_benchmark_all(test_folder: str = "Test_cases", output_folder: str = "Ben
                 "bdd_states": "ERROR",
                 "bdd_time_ms": -1,
                 "bdd_memory_mb": -1,
+                "bdd_peak_rss_mb": -1,
+                "bdd_backend": "N/A",
                 "bfs_states": "ERROR",
                 "bfs_time_ms": -1,
                 "bfs_memory_mb": -1,
+                "bfs_peak_rss_mb": -1,
                 "dfs_states": "ERROR",
                 "dfs_time_ms": -1,
-                "dfs_memory_mb": -1
+                "dfs_memory_mb": -1,
+                "dfs_peak_rss_mb": -1
             })
             continue
         
-        # Chạy 3 thuật toán
-        result_entry = {
+        all_results.append({
             "file": filename,
             "places": num_places,
-            "transitions": num_trans
-        }
-        
-        # BDD
-        print("  Running BDD...", end=" ", flush=True)
-        res_bdd = measure_performance("BDD", bdd_reachable, pn)
-        if res_bdd:
-            result_entry["bdd_states"] = res_bdd["count"]
-            result_entry["bdd_time_ms"] = res_bdd["time_ms"]
-            result_entry["bdd_memory_mb"] = res_bdd["memory_mb"]
-            status = "OK" if res_bdd["error"] is None else f"ERROR: {res_bdd['error']}"
-            print(f"{status} (States: {res_bdd['count']}, Time: {res_bdd['time_ms']:.2f}ms)")
-        
-        # BFS
-        print("  Running BFS...", end=" ", flush=True)
-        res_bfs = measure_performance("BFS", bfs_reachable, pn)
-        if res_bfs:
-            result_entry["bfs_states"] = res_bfs["count"]
-            result_entry["bfs_time_ms"] = res_bfs["time_ms"]
-            result_entry["bfs_memory_mb"] = res_bfs["memory_mb"]
-            status = "OK" if res_bfs["error"] is None else f"ERROR: {res_bfs['error']}"
-            print(f"{status} (States: {res_bfs['count']}, Time: {res_bfs['time_ms']:.2f}ms)")
-        
-        # DFS
-        print("  Running DFS...", end=" ", flush=True)
-        res_dfs = measure_performance("DFS", dfs_reachable, pn)
-        if res_dfs:
-            result_entry["dfs_states"] = res_dfs["count"]
-            result_entry["dfs_time_ms"] = res_dfs["time_ms"]
-            result_entry["dfs_memory_mb"] = res_dfs["memory_mb"]
-            status = "OK" if res_dfs["error"] is None else f"ERROR: {res_dfs['error']}"
-            print(f"{status} (States: {res_dfs['count']}, Time: {res_dfs['time_ms']:.2f}ms)")
-        
-        all_results.append(result_entry)
+            "transitions": num_trans,
+            "_path": pnml_file
+        })
+        jobs.extend((pnml_file, algo_name) for algo_name in ALGORITHMS)
+    
+    # Chạy mọi (file, thuật toán) song song, mỗi job một process
+    print("-" * 60)
+    job_results = run_jobs(jobs, max_workers, timeout_seconds, use_cache, warmup, repetitions)
+    
+    # Gộp kết quả theo từng file, giữ thứ tự file ban đầu
+    for result_entry in all_results:
+        pnml_file = result_entry.pop("_path", None)
+        if pnml_file is None:
+            continue
+        for algo_name in ALGORITHMS:
+            res = job_results[(pnml_file, algo_name)]
+            prefix = algo_name.lower()
+            result_entry[f"{prefix}_states"] = res["count"]
+            result_entry[f"{prefix}_time_ms"] = res["time_ms"]
+            result_entry[f"{prefix}_memory_mb"] = res["memory_mb"]
+            result_entry[f"{prefix}_peak_rss_mb"] = res["peak_rss_mb"] if res["peak_rss_mb"] is not None else -1
+            for key in TIME_STAT_KEYS:
+                result_entry[f"{prefix}_{key}"] = res.get(key, -1)
+            result_entry[f"{prefix}_timing_killed"] = bool(res.get("timing_killed"))
+            if algo_name == "BDD":
+                result_entry["bdd_backend"] = res["backend"] or "N/A"
     
     # Xuất kết quả ra file
     export_results_csv(all_results, output_folder)
@@ -220,13 +436,15 @@ def export_results_csv(results: List[Dict], output_folder: str):
     
     fieldnames = [
         "file", "places", "transitions",
-        "bdd_states", "bdd_time_ms", "bdd_memory_mb",
-        "bfs_states", "bfs_time_ms", "bfs_memory_mb",
-        "dfs_states", "dfs_time_ms", "dfs_memory_mb"
+        "bdd_states", "bdd_time_ms", "bdd_memory_mb", "bdd_peak_rss_mb", "bdd_backend",
+        "bfs_states", "bfs_time_ms", "bfs_memory_mb", "bfs_peak_rss_mb",
+        "dfs_states", "dfs_time_ms", "dfs_memory_mb", "dfs_peak_rss_mb"
     ]
+    fieldnames += [f"{algo.lower()}_{key}" for algo in ALGORITHMS for key in TIME_STAT_KEYS]
+    fieldnames += [f"{algo.lower()}_timing_killed" for algo in ALGORITHMS]
     
     with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval=-1)
         writer.writeheader()
         writer.writerows(results)
 
@@ -236,25 +454,27 @@ def export_results_txt(results: List[Dict], output_folder: str):
     txt_file = os.path.join(output_folder, "result.txt")
     
     with open(txt_file, 'w', encoding='utf-8') as f:
-        f.write("=" * 140 + "\n")
+        f.write("=" * 191 + "\n")
         f.write("BENCHMARK RESULTS: BDD vs BFS vs DFS (Reachability Analysis)\n")
         f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write("=" * 140 + "\n\n")
+        f.write("=" * 191 + "\n\n")
         
         # Header
         header = (
             f"{'File':<15} | {'Places':>6} | {'Trans':>6} | "
-            f"{'BDD States':>12} | {'BDD Time(ms)':>14} | {'BDD Mem(MB)':>12} | "
-            f"{'BFS States':>12} | {'BFS Time(ms)':>14} | {'BFS Mem(MB)':>12} | "
-            f"{'DFS States':>12} | {'DFS Time(ms)':>14} | {'DFS Mem(MB)':>12}"
+            f"{'BDD States':>12} | {'BDD Time(ms)':>14} | {'BDD Mem(MB)':>12} | {'RSS(MB)':>10} | {'Backend':>9} | "
+            f"{'BFS States':>12} | {'BFS Time(ms)':>14} | {'BFS Mem(MB)':>12} | {'RSS(MB)':>10} | "
+            f"{'DFS States':>12} | {'DFS Time(ms)':>14} | {'DFS Mem(MB)':>12} | {'RSS(MB)':>10}"
         )
         f.write(header + "\n")
-        f.write("-" * 140 + "\n")
+        f.write("-" * 191 + "\n")
         
         # Data rows
         for r in results:
             def fmt_val(val, is_time=False, is_mem=False):
-                if val == "ERROR" or val == "N/A" or val == -1:
+                if val == "TIMEOUT":
+                    return val
+                if val == "ERROR" or val == "N/A" or val == -1 or val is None:
                     return "N/A"
                 if is_time:
                     return f"{val:.4f}"
@@ -264,13 +484,32 @@ def export_results_txt(results: List[Dict], output_folder: str):
             
             row = (
                 f"{r['file']:<15} | {str(r['places']):>6} | {str(r['transitions']):>6} | "
-                f"{fmt_val(r.get('bdd_states', 'N/A')):>12} | {fmt_val(r.get('bdd_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('bdd_memory_mb', -1), is_mem=True):>12} | "
-                f"{fmt_val(r.get('bfs_states', 'N/A')):>12} | {fmt_val(r.get('bfs_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('bfs_memory_mb', -1), is_mem=True):>12} | "
-                f"{fmt_val(r.get('dfs_states', 'N/A')):>12} | {fmt_val(r.get('dfs_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('dfs_memory_mb', -1), is_mem=True):>12}"
+                f"{fmt_val(r.get('bdd_states', 'N/A')):>12} | {fmt_val(r.get('bdd_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('bdd_memory_mb', -1), is_mem=True):>12} | {fmt_val(r.get('bdd_peak_rss_mb', -1), is_time=True):>10} | {str(r.get('bdd_backend', 'N/A')):>9} | "
+                f"{fmt_val(r.get('bfs_states', 'N/A')):>12} | {fmt_val(r.get('bfs_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('bfs_memory_mb', -1), is_mem=True):>12} | {fmt_val(r.get('bfs_peak_rss_mb', -1), is_time=True):>10} | "
+                f"{fmt_val(r.get('dfs_states', 'N/A')):>12} | {fmt_val(r.get('dfs_time_ms', -1), is_time=True):>14} | {fmt_val(r.get('dfs_memory_mb', -1), is_mem=True):>12} | {fmt_val(r.get('dfs_peak_rss_mb', -1), is_time=True):>10}"
             )
             f.write(row + "\n")
         
-        f.write("-" * 140 + "\n")
+        f.write("-" * 191 + "\n")
+        f.write("Time = median các lần bấm giờ (không bật tracemalloc); Mem = peak tracemalloc ở lần chạy riêng.\n")
+        
+        # Thống kê thời gian chi tiết
+        f.write("\n" + "=" * 80 + "\n")
+        f.write("THỐNG KÊ THỜI GIAN (ms)\n")
+        f.write("=" * 80 + "\n\n")
+        f.write(f"{'File':<15} | {'Algo':<4} | {'Median':>12} | {'Min':>12} | {'Stddev':>10} | "
+                f"{'95% CI (median)':>27} | {'N':>3}\n")
+        f.write("-" * 100 + "\n")
+        for r in results:
+            for algo in ALGORITHMS:
+                prefix = algo.lower()
+                if r.get(f"{prefix}_time_ms", -1) == -1:
+                    continue
+                ci = f"{r[f'{prefix}_time_ci_low_ms']:.4f} - {r[f'{prefix}_time_ci_high_ms']:.4f}"
+                f.write(f"{r['file']:<15} | {algo:<4} | {r[f'{prefix}_time_ms']:>12.4f} | "
+                        f"{r[f'{prefix}_time_min_ms']:>12.4f} | {r[f'{prefix}_time_std_ms']:>10.4f} | "
+                        f"{ci:>27} | {r[f'{prefix}_repetitions']:>3}\n")
+        f.write("-" * 100 + "\n")
         
         # Tổng hợp thống kê
         f.write("\n" + "=" * 80 + "\n")
@@ -325,5 +564,93 @@ def export_results_txt(results: List[Dict], output_folder: str):
         f.write("=" * 80 + "\n")
 
 
+def run_scaling_sweep(family: str, sizes: List[int], output_folder: str = "Benchmark_output",
+                      max_workers: Optional[int] = None, timeout_seconds: float = 300,
+                      warmup: int = 0, repetitions: int = 1, plot: bool = True, **params) -> List[Dict]:
+    """
+    Quét tham số kích thước của một họ net sinh tự động (src/Generator.py):
+    ghi PNML vào <output_folder>/<family>/, chạy BDD/BFS/DFS cho từng kích thước
+    như run_benchmark_all, so số trạng thái với công thức expected_states(), rồi
+    xuất scaling_<family>.csv và (nếu có matplotlib) scaling_<family>.png.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown net family: {family}")
+    os.makedirs(output_folder, exist_ok=True)
+    paths = write_family(family, sizes, os.path.join(output_folder, family), **params)
+    
+    print("=" * 80)
+    print(f"SCALING SWEEP: {family}{f' {params}' if params else ''}, sizes = {sizes}")
+    print("=" * 80)
+    jobs = [(path, algo_name) for path in paths for algo_name in ALGORITHMS]
+    job_results = run_jobs(jobs, max_workers, timeout_seconds, False, warmup, repetitions)
+    
+    rows = []
+    for n, path in zip(sizes, paths):
+        pn = PetriNet.from_pnml(path)
+        row = {
+            "n": n,
+            "places": len(pn.place_ids),
+            "transitions": len(pn.trans_ids),
+            "expected_states": expected_states(family, n, **params),
+        }
+        for algo_name in ALGORITHMS:
+            res = job_results[(path, algo_name)]
+            prefix = algo_name.lower()
+            row[f"{prefix}_states"] = res["count"]
+            row[f"{prefix}_time_ms"] = res["time_ms"]
+            row[f"{prefix}_memory_mb"] = res["memory_mb"]
+            row[f"{prefix}_peak_rss_mb"] = res["peak_rss_mb"] if res["peak_rss_mb"] is not None else -1
+            row[f"{prefix}_timing_killed"] = bool(res.get("timing_killed"))
+            if res["error"] is None and res["count"] != row["expected_states"]:
+                print(f"  WARNING: {algo_name} n={n}: {res['count']} states, expected {row['expected_states']}")
+        rows.append(row)
+    
+    csv_file = os.path.join(output_folder, f"scaling_{family}.csv")
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Kết quả: {csv_file}")
+    
+    if plot:
+        plot_scaling(rows, family, os.path.join(output_folder, f"scaling_{family}.png"))
+    return rows
+
+
+def plot_scaling(rows: List[Dict], family: str, png_file: str) -> None:
+    """Vẽ thời gian và bộ nhớ theo n cho từng thuật toán (cần matplotlib, không có thì bỏ qua)."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib chưa được cài, bỏ qua bước vẽ đồ thị")
+        return
+    
+    fig, (ax_time, ax_mem) = plt.subplots(1, 2, figsize=(12, 4.5))
+    for algo_name in ALGORITHMS:
+        prefix = algo_name.lower()
+        ok = [r for r in rows if r[f"{prefix}_time_ms"] != -1]
+        if not ok:
+            continue
+        ax_time.plot([r["n"] for r in ok], [r[f"{prefix}_time_ms"] for r in ok], marker="o", label=algo_name)
+        ax_mem.plot([r["n"] for r in ok], [r[f"{prefix}_memory_mb"] for r in ok], marker="o", label=algo_name)
+    for ax, ylabel in ((ax_time, "Time (ms)"), (ax_mem, "Memory (MB)")):
+        ax.set_xlabel("n")
+        ax.set_ylabel(ylabel)
+        ax.set_yscale("log")
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend()
+    fig.suptitle(f"Scaling: {family}")
+    fig.tight_layout()
+    fig.savefig(png_file, dpi=120)
+    plt.close(fig)
+    print(f"Đồ thị: {png_file}")
+
+
 if __name__ == "__main__":
-    run_benchmark_all()
+    # python run_all_test.py sweep <family> <n1> <n2> ...  -> quét kích thước net sinh tự động
+    if len(sys.argv) > 2 and sys.argv[1] == "sweep":
+        run_scaling_sweep(sys.argv[2], [int(n) for n in sys.argv[3:]])
+    else:
+        run_benchmark_all()
@@ -1,187 +1,1446 @@
-from typing import Tuple, List, Dict, Set
+from typing import Any, Tuple, List, Dict, Optional, Set, Union
+import hashlib
+import importlib
+import logging
+import os
+import time
+import warnings
+import zipfile
 import numpy as np
 from dd import autoref as _bdd
-from src.PetriNet import PetriNet
+from src.PetriNet import PetriNet, atomic_write
+from src.Marking import BoundViolation
+from src.POR import PORResult
+from src.Ordering import ORDER_METHODS, place_order
+from src.Structural import implied_places
 
-# TASK 3 
-def bdd_reachable(pn: PetriNet) -> Tuple[object, int]:
-    '''
-    --- 1. SETUP & CHUẨN HÓA DỮ LIỆU ---
-    Do các ma trận I và O được nhóm em dùng có dạng
-    hàng là places, cột là transitions, 1 tương ứng 
-    có cung từ place đến transition, ngược lại là 0 nên chỉ cần dùng int8 là đủ
-    Nên ta chuyển đổi chúng sang numpy array với dtype là int8 để tiết kiệm bộ nhớ
-    Đồng thời, ta kiểm tra và tự động chuyển vị ma trận I và O nếu cần
-    để đảm bảo số hàng tương ứng với số place thực tế
-    Ngoài ra, ta cũng chuẩn hóa kích thước của M0 nếu cần thiết
-    '''
-    I = np.asarray(pn.I, dtype=np.int8) 
-    O = np.asarray(pn.O, dtype=np.int8) 
-    M0 = np.asarray(pn.M0, dtype=np.int8)
-
-    raw_place_names = getattr(pn, "place_names", None) or [] 
-    num_places_declared = len(raw_place_names) 
-    rows, cols = I.shape
-    
-    # Auto-transpose nếu ma trận bị ngược
-    if cols == num_places_declared and rows != num_places_declared:
-        I, O = I.T, O.T
-    
-    num_places, num_trans = I.shape
-
-    '''
-    Resize M0 nếu cần ( Nếu số lượng place trong M0 khác với số lượng place thực tế)
-    Tạo mảng mới với kích thước đúng với toàn bộ giá trị là 0
-    và sao chép giá trị từ M0 cũ sang mảng mới
-    '''
-    if M0.shape[0] != num_places:
-        new_M0 = np.zeros(num_places, dtype=np.int8) 
-        new_M0[:min(M0.shape[0], num_places)] = M0[:min(M0.shape[0], num_places)] 
-        M0 = new_M0
-
-    # Tạo tên biến BDD
-    # Sử dụng tên place nếu có, nếu không thì dùng place ID, nếu vẫn không có thì dùng tên mặc định P[i]
-    place_ids = getattr(pn, "place_ids", None) or [] 
-    bdd_var_names: List[str] = []
-    
-    for i in range(num_places):
-        name = None
-        if i < len(raw_place_names) and raw_place_names[i]: 
-            name = str(raw_place_names[i]) 
-        elif i < len(place_ids) and place_ids[i]:
-            name = str(place_ids[i]) 
-        bdd_var_names.append((name or f"P{i}").replace(" ", "").replace("-", "")) 
-                                                                                   
-    bdd_var_names_p = [n + "_p" for n in bdd_var_names] # Mảng lưu tên biến BDD cho trạng sau khi fire ( p1 -> p1_p)
-    
-    '''
-     --- 2. KHỞI TẠO BDD MANAGER ---
-    '''
-
-    bdd = _bdd.BDD()
-
-    # Interleaved ordering: x0, x0', x1, x1'...
-    ordered_vars = []
-    for i in range(num_places):
-        ordered_vars.extend([bdd_var_names[i], bdd_var_names_p[i]])
-    bdd.declare(*ordered_vars)
-    # Đặt thứ tự biến trong BDD theo kiểu xen kẽ: x0, x0', x1, x1' 
-    # để tối ưu hóa hiệu suất thao tác BDD sau này
-
-    # Pre-fetch BDD nodes vào lists
-    x_nodes = [bdd.var(bdd_var_names[i]) for i in range(num_places)] # BDD nodes cho trạng thái hiện tại x[i] để truy cập nhanh
-    xp_nodes = [bdd.var(bdd_var_names_p[i]) for i in range(num_places)] # BDD nodes cho trạng thái tiếp theo x'[i] để truy cập nhanh
-
-
-    # Cache equivalence BDDs: equiv[i] = (x[i] <-> x'[i])
-    equiv_cache = [(x_nodes[i] & xp_nodes[i]) | (~x_nodes[i] & ~xp_nodes[i])  
-                   for i in range(num_places)]
-    ''' 
-    Vì khi 1 transition bắn, chỉ 1 số ít place bị ảnh hưởng phần còn lại sẽ giữ nguyên trạng thái
-    Nên ta dùng cache này để tái sử dụng, dùng nó làm khung và chỉ thay đổi những place bị ảnh hưởng
-    giúp giảm thiểu số lượng thao tác BDD cần thiết
-    '''
-
-    '''
-     --- 3. XÂY DỰNG MONOLITHIC TRANSITION RELATION ---
-     Phần này xây dựng BDD biểu diễn quan hệ chuyển đổi monolithic T_monolithic
-     từ ma trận I và O của Petri net thông qua việc lặp qua từng transition và 
-     kết hợp các điều kiện enable, update và frame
-    '''
-
-    I_bool = I > 0 
-    O_bool = O > 0 
-    T_monolithic = bdd.false 
-    
-    for t in range(num_trans):
-        input_idx = np.flatnonzero(I_bool[:, t]) 
-        output_idx = np.flatnonzero(O_bool[:, t])
-        
-        if len(input_idx) == 0 and len(output_idx) == 0:
+BACKENDS = ("autoref", "cudd", "sylvan")
+
+
+def load_backend(name: Optional[str] = None) -> Tuple[object, str]:
+    '''
+    Chọn module BDD cho bdd_reachable:
+    - tham số name, nếu None thì đọc biến môi trường BDD_BACKEND, mặc định "autoref"
+    - "cudd" / "sylvan" là C extension của dd; nếu chưa được cài thì cảnh báo
+      và lùi về dd.autoref (thuần Python)
+    Trả về (module, tên backend thực sự được dùng).
+    '''
+    requested = (name or os.environ.get("BDD_BACKEND") or "autoref").strip().lower()
+    if requested not in BACKENDS:
+        raise ValueError(f"Unknown BDD backend: {requested}")
+    if requested != "autoref":
+        try:
+            return importlib.import_module(f"dd.{requested}"), requested
+        except ImportError:
+            warnings.warn(f"dd.{requested} is not available, falling back to dd.autoref")
+    return _bdd, "autoref"
+
+
+def _new_manager(module, backend: str, initial_cache_size: Optional[int]):
+    '''
+    Tạo BDD manager, trả về (manager, các tham số đã thực sự truyền cho constructor).
+    Chỉ CUDD có initial_cache_size (kích thước ban đầu của computed table, bộ nhớ
+    đệm kết quả phép toán, không phải bảng unique); autoref/sylvan không có tham số
+    tương ứng nên bỏ qua giá trị này.
+    '''
+    options = {}
+    if backend == "cudd" and initial_cache_size is not None:
+        options["initial_cache_size"] = initial_cache_size
+    return module.BDD(**options), options
+
+
+def _node_count(u) -> int:
+    '''Số node của một BDD (dag_size nếu backend có, ngược lại len(u)).'''
+    size = getattr(u, "dag_size", None)
+    return int(size) if size is not None else len(u)
+
+
+def _manager_size(bdd) -> Optional[int]:
+    '''Số node hiện có trong manager, None nếu backend không hỗ trợ.'''
+    try:
+        return len(bdd)
+    except TypeError:
+        return None
+
+
+class _ReorderMonitor(logging.Handler):
+    '''
+    Đếm số lần reorder và thời gian reorder của manager dd.bdd (autoref).
+    dd không lưu các số liệu này, nhưng ghi log "Reordering needed..." khi bắt
+    đầu sifting tự động và "Reordering changed ..." khi reorder xong,
+    nên ta gắn tạm một handler vào logger "dd.bdd" để thu lại.
+    '''
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.count = 0
+        self.dynamic_time = 0.0
+        self._started = None
+        self._logger = logging.getLogger("dd.bdd")
+        self._old_level = None
+
+    def emit(self, record):
+        msg = record.getMessage()
+        if msg.startswith("Reordering needed"):
+            self._started = time.perf_counter()
+        elif msg.startswith("Reordering changed"):
+            self.count += 1
+            if self._started is not None:
+                self.dynamic_time += time.perf_counter() - self._started
+                self._started = None
+
+    def __enter__(self):
+        self._old_level = self._logger.level
+        if self._logger.getEffectiveLevel() > logging.INFO:
+            self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc):
+        self._logger.removeHandler(self)
+        self._logger.setLevel(self._old_level)
+        return False
+
+
+def _transition_enable(bdd, x_nodes, input_idx, output_idx):
+    '''
+    Enable condition
+    Điều kiện enable: tất cả input phải có token
+    và tất cả output không thuộc input (không phải self-loop) không có token
+    '''
+    input_set = set(input_idx)
+    enable = bdd.true
+    for idx in input_idx:
+        enable &= x_nodes[idx]
+    for idx in output_idx:
+        if idx not in input_set:
+            enable &= ~x_nodes[idx]
+    return enable
+
+
+def _transition_change(bdd, xp_nodes, input_idx, output_idx):
+    '''
+    Update condition
+    Điều kiện update: cập nhật trạng thái các place bị ảnh hưởng
+    input mất token (nếu không phải self-loop), output nhận token (nếu không phải self-loop)
+    '''
+    input_set = set(input_idx)
+    output_set = set(output_idx)
+    change = bdd.true
+    for idx in input_idx:
+        change &= xp_nodes[idx] if idx in output_set else ~xp_nodes[idx]
+    for idx in output_idx:
+        if idx not in input_set:
+            change &= xp_nodes[idx]
+    return change
+
+
+def _transition_effect(bdd, x_nodes, input_idx, output_idx):
+    '''
+    Với net 1-safe, giá trị mới của mỗi place bị ảnh hưởng là hằng số:
+    output (kể cả self-loop) = 1, input không phải output = 0.
+    Trả về cube trên biến hiện tại x biểu diễn các giá trị đó.
+    '''
+    output_set = set(output_idx)
+    effect = bdd.true
+    for idx in output_idx:
+        effect &= x_nodes[idx]
+    for idx in input_idx:
+        if idx not in output_set:
+            effect &= ~x_nodes[idx]
+    return effect
+
+
+def _const_lt(bdd, bits, c: int):
+    '''x < c với x là số không dấu trên các biến bits (bit thấp trước), c là hằng số.'''
+    if c <= 0:
+        return bdd.false
+    if c >= 1 << len(bits):
+        return bdd.true
+    lt = bdd.false
+    for j, x in enumerate(bits):
+        lt = (~x | lt) if (c >> j) & 1 else (~x & lt)
+    return lt
+
+
+def _const_add(bdd, bits, bits_p, c: int):
+    '''
+    x' = (x + c) mod 2^b: bộ cộng ripple-carry với hằng số c (c âm = trừ, bù 2).
+    Dựng từ bit cao xuống: nxt[carry] là ràng buộc trên các bit cao hơn khi có
+    carry vào, nên BDD (x, x' xen kẽ) chỉ có O(b) node.
+    '''
+    b = len(bits)
+    c %= 1 << b
+    nxt = {0: bdd.true, 1: bdd.true}
+    for j in range(b - 1, -1, -1):
+        cj = (c >> j) & 1
+        x, xp = bits[j], bits_p[j]
+        lit = lambda v: xp if v else ~xp
+        nxt = {
+            carry: (~x & lit(cj ^ carry) & nxt[cj & carry])
+                   | (x & lit(1 ^ cj ^ carry) & nxt[cj | carry])
+            for carry in (0, 1)
+        }
+    return nxt[0]
+
+
+def _value_cube(bdd, bits, v: int):
+    '''Cube gán giá trị v cho số không dấu trên bits (bit thấp trước); false nếu v không vừa.'''
+    if not 0 <= v < 1 << len(bits):
+        return bdd.false
+    u = bdd.true
+    for j, x in enumerate(bits):
+        u &= x if (v >> j) & 1 else ~x
+    return u
+
+
+def _linear_eq(bdd, terms, rhs: int):
+    '''BDD của Σ a_i · x_i == rhs với terms = [(x_i, a_i)], x_i là biến Boolean.'''
+    # Quy hoạch động lặp trên (i, tổng tiền tố s), từ term cuối ngược về đầu;
+    # không dùng closure đệ quy: vòng tham chiếu của nó giữ các node dd tới lúc tắt
+    prefix = [{0}]
+    for _, a in terms:
+        prefix.append({s + a for s in prefix[-1]} | prefix[-1])
+    layer = {s: bdd.true if s == rhs else bdd.false for s in prefix[-1]}
+    for i in range(len(terms) - 1, -1, -1):
+        x, a = terms[i]
+        layer = {s: (x & layer[s + a]) | (~x & layer[s]) for s in prefix[i]}
+    return layer[0]
+
+
+def _image(bdd, S, part):
+    '''
+    Image của tập S qua một partition (enable_t, biến bị ảnh hưởng, effect_t, rename_t).
+    Net k-bounded: enable_t là relation trên (x, x') của các place bị ảnh hưởng,
+    effect_t = true và rename_t đổi x' về x sau khi lượng tử hóa.
+    '''
+    enable_t, q_vars_t, effect_t, rename_t = part
+    conj = S & enable_t
+    if conj == bdd.false:
+        return bdd.false
+    img = bdd.quantify(conj, q_vars_t, forall=False) & effect_t
+    return img if rename_t is None else bdd.let(rename_t, img)
+
+
+def _chain(bdd, R, frontier, partitions):
+    '''
+    Một vòng chaining: áp dụng lần lượt từng transition, trạng thái mới sinh ra
+    bởi transition trước được dùng ngay cho transition sau trong cùng vòng.
+    Trả về (R mới, tập trạng thái mới của cả vòng).
+    '''
+    S = frontier
+    new_iter = bdd.false
+    for part in partitions:
+        new_states = _image(bdd, S, part) & ~R
+        if new_states == bdd.false:
             continue
-            
-        input_set = set(input_idx)  
-        output_set = set(output_idx)
-        affected_set = input_set | output_set # Tập hợp các place bị ảnh hưởng bởi transition t
+        R |= new_states
+        S |= new_states
+        new_iter |= new_states
+    return R, new_iter
+
+
+# Tăng khi thay đổi định dạng file lưu BDD (.bdd.npz)
+BDD_STORE_VERSION = 1
+BDD_STORE_SUFFIX = ".bdd.npz"
+
+
+def _store_key(bound: Optional[int] = None, invariants: bool = False,
+               order: Union[str, List[int]] = "pnml", **_) -> str:
+    '''Khóa ngắn của các tham số quyết định encoding của R (tên file trong cached()).'''
+    order = order if isinstance(order, str) else [int(p) for p in order]
+    return hashlib.sha256(repr((bound, bool(invariants), order)).encode("utf-8")).hexdigest()[:16]
 
+
+def _dump_nodes(bdd, roots: List[object], var_index: Dict[str, int]):
+    '''
+    Ghi các BDD roots thành bảng node dùng chung, không phụ thuộc backend:
+    node k (k >= 1) = ite(var[k], high[k], low[k]), các node con luôn đứng trước
+    node cha (hậu thứ tự). Một cạnh được mã hóa 2 * id + negated, id 0 là hằng
+    TRUE (nên TRUE = 0, FALSE = 1) — giữ nguyên complemented edge của dd/CUDD.
+    Trả về (node_var, node_low, node_high, cạnh của từng root).
+    '''
+    ids: Dict[int, int] = {}
+    node_var: List[int] = []
+    node_low: List[int] = []
+    node_high: List[int] = []
+
+    def key(u) -> int:
+        return int(~u) if u.negated else int(u)
+
+    def edge(u) -> int:
+        if u.var is None:
+            return int(u.negated)
+        return 2 * ids[key(u)] + int(u.negated)
+
+    for root in roots:
+        stack = [root]
+        while stack:
+            u = stack[-1]
+            if u.var is None or key(u) in ids:
+                stack.pop()
+                continue
+            low, high = u.low, u.high
+            pending = [c for c in (low, high) if c.var is not None and key(c) not in ids]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            ids[key(u)] = len(node_var) + 1
+            node_var.append(var_index[u.var])
+            node_low.append(edge(low))
+            node_high.append(edge(high))
+
+    return (np.array(node_var, dtype=np.int32), np.array(node_low, dtype=np.int64),
+            np.array(node_high, dtype=np.int64), [edge(r) for r in roots])
+
+
+def _load_nodes(bdd, var_nodes: List[object], node_var: np.ndarray, node_low: np.ndarray,
+                node_high: np.ndarray, root_edges: List[int]) -> List[object]:
+    '''
+    Dựng lại các root từ bảng node của _dump_nodes trong manager bdd.
+    Chỉ dựng các node mà roots cần tới; var_nodes[i] là BDD của biến thứ i.
+    '''
+    node_var, node_low, node_high = node_var.tolist(), node_low.tolist(), node_high.tolist()
+    needed = [False] * (len(node_var) + 1)
+    for e in root_edges:
+        needed[e >> 1] = True
+    for k in range(len(node_var), 0, -1):
+        if needed[k]:
+            needed[node_low[k - 1] >> 1] = True
+            needed[node_high[k - 1] >> 1] = True
+
+    nodes = [bdd.true] + [None] * len(node_var)
+
+    def edge(e):
+        u = nodes[e >> 1]
+        return ~u if e & 1 else u
+
+    for k in range(1, len(nodes)):
+        if needed[k]:
+            x = var_nodes[node_var[k - 1]]
+            if x is None:
+                raise ValueError("Stored BDD refers to an undeclared variable")
+            nodes[k] = bdd.ite(x, edge(node_high[k - 1]), edge(node_low[k - 1]))
+    return [edge(e) for e in root_edges]
+
+
+# TASK 3 
+def bdd_reachable(
+    pn: PetriNet,
+    relation: str = "partitioned",
+    strategy: str = "bfs",
+    order: Union[str, List[int]] = "pnml",
+    reordering: Optional[bool] = None,
+    reorder_after_build: bool = False,
+    initial_cache_size: Optional[int] = None,
+    backend: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    bound: Optional[int] = None,
+    invariants: bool = False,
+) -> Tuple[object, int]:
+    '''
+    relation:
+    - "partitioned" : mỗi transition một BDD nhỏ chỉ trên các place bị ảnh hưởng,
+                      image tính riêng từng transition (không cần frame condition)
+    - "monolithic"  : OR tất cả transition (kèm frame) thành một T_monolithic
+
+    strategy (chiến lược tính điểm bất động):
+    - "bfs"        : image của cả frontier qua toàn bộ relation mỗi vòng (bản gốc)
+    - "chaining"   : áp dụng từng transition nối tiếp nhau trong một vòng
+    - "saturation" : nhóm transition theo biến cao nhất bị ảnh hưởng, bão hòa
+                     từ dưới lên theo thứ tự biến (cần relation="partitioned")
+
+    order (thứ tự biến tĩnh, tính từ I/O trước khi declare):
+    - "pnml"          : theo thứ tự place trong file (bản gốc)
+    - "force"         : FORCE, kéo các place cùng transition lại gần nhau
+    - "cuthill-mckee" / "rcm" : giảm bandwidth đồ thị place–transition
+    - danh sách chỉ số place : thứ tự cho trước (ví dụ current_order() của lần chạy trước)
+
+    Điều khiển BDD manager:
+    - reordering          : bật/tắt dynamic reordering (sifting); None = mặc định
+    - reorder_after_build : chạy sifting một lần ngay sau khi dựng xong relation
+    - initial_cache_size  : kích thước ban đầu của computed table (cache kết quả
+                            phép toán) của CUDD; autoref/sylvan không có tham số
+                            tương ứng nên bỏ qua. stats["manager_options"] ghi
+                            các tham số đã thực sự truyền cho manager
+
+    backend: "autoref" | "cudd" | "sylvan" (xem load_backend); None thì đọc
+    biến môi trường BDD_BACKEND. Backend thực sự dùng được ghi vào stats["backend"].
+
+    stats: nếu truyền vào một dict, hàm ghi thêm số vòng lặp (iterations),
+    số node lớn nhất của manager (peak_nodes), số node của R (R_nodes) và của
+    relation (relation_nodes, T_monolithic_nodes), số lần / thời gian reorder
+    (reorderings, reorder_time_s), thời gian dựng relation (build_time_s) và
+    thời gian tính điểm bất động (fixpoint_time_s), thứ tự biến đã dùng (order).
+
+    bound: None (mặc định) là encoding 1-safe, một biến Boolean mỗi place. Số nguyên
+    k >= 1: net k-bounded, mỗi place ceil(log2(k+1)) biến nhị phân, relation từng
+    transition là bộ so sánh (enable) và bộ cộng hằng số (x' = x - pre + post) trên
+    các place bị ảnh hưởng (chỉ relation="partitioned"). Marking vượt k -> BoundViolation.
+
+    invariants: True thì bỏ biến của các place có giá trị suy ra từ P-semiflow
+    (Structural.implied_places) khỏi điểm bất động: ít biến hơn trong R và các
+    tầng; R cuối cùng vẫn đủ mọi biến (chỉ relation="partitioned", encoding 1-safe,
+    không hỗ trợ sửa net tăng dần).
+
+    Trả về (R, số marking reachable). Cần truy vấn thêm trên R (deadlock, dead
+    transition, ...) thì dùng SymbolicReachability để giữ lại manager và relation;
+    truy vấn dừng sớm không tính hết R: SymbolicReachability.query.
+    '''
+    sr = SymbolicReachability(
+        pn, relation, strategy, order, reordering,
+        reorder_after_build, initial_cache_size, backend, bound,
+        invariants=invariants,
+    )
+    sr.compute(stats)
+    return sr.R, sr.count
+
+
+class SymbolicReachability:
+    '''
+    Giữ manager BDD, biến, relation và tập reachable R của một Petri net để trả lời
+    nhiều truy vấn mà không phải tính lại điểm bất động:
+    - deadlocks()                   : R ∧ ¬∨ enable_t
+    - place_bounds()                : cận trên số token của từng place trên R
+    - dead_transitions()            : transition t có R ∧ enable_t = ∅
+    - is_reachable(partial)         : có marking nào trong R khớp phép gán một phần
+    - witnesses(S) / sample(S, k)   : liệt kê / lấy mẫu đều các marking trong S
+    - trace(target)                 : dãy bắn ngắn nhất từ M0 tới target (đi ngược bằng preimage)
+    - query(target)                 : như trace nhưng trả về PORResult, dừng sớm khi chưa có R
+
+    Tham số của constructor giống bdd_reachable (xem docstring ở đó). R được tính
+    khi gọi compute() lần đầu hoặc khi truy vấn đầu tiên cần đến nó.
+    keep_frontiers=True (strategy="bfs") giữ các tầng BFS trong self.frontiers để
+    trace() khỏi phải tính lại; tốn thêm bộ nhớ cho các BDD tầng.
+    '''
+
+    def __init__(self, pn: PetriNet, relation: str = "partitioned", strategy: str = "bfs",
+                 order: Union[str, List[int]] = "pnml", reordering: Optional[bool] = None,
+                 reorder_after_build: bool = False, initial_cache_size: Optional[int] = None,
+                 backend: Optional[str] = None, bound: Optional[int] = None,
+                 keep_frontiers: bool = False, invariants: bool = False):
+        self._reset(pn, relation, strategy, order, initial_cache_size)
+        self.keep_frontiers = keep_frontiers
+        with self._monitor:
+            self._build(pn, relation, strategy, order, reordering, reorder_after_build,
+                        initial_cache_size, backend, bound=bound, invariants=invariants)
+
+    def _reset(self, pn, relation, strategy, order, initial_cache_size) -> None:
+        self.pn = pn
+        self.relation = relation
+        self.strategy = strategy
+        self.order = order
+        self.initial_cache_size = initial_cache_size
+        self.R = None
+        self.iterations = 0
+        self.incremental = False
+        self.loaded_from = None
+        self.keep_frontiers = False
+        self.frontiers = None
+        # invariants=True: place suy ra được -> hàm f_p trên các place còn lại
+        self.invariants = False
+        self._implied: Dict[int, object] = {}
+        self._implied_equiv = None
+        # Phân tích lại tăng dần: R cũ (chắc chắn vẫn reachable) và các transition đã sửa
+        self._grow_from = None
+        self._touched: Set[int] = set()
+        self._monitor = _ReorderMonitor()
+
+    def _build(self, pn, relation, strategy, order, reordering, reorder_after_build,
+               initial_cache_size, backend, build_relation=True, bound=None,
+               invariants=False):
         '''
-        Enable condition
-        Điều kiện enable: tất cả input phải có token
-        và tất cả output không thuộc input (không phải self-loop) không có token
+        --- 1. SETUP & CHUẨN HÓA DỮ LIỆU ---
+        Pre-set / post-set của từng transition lấy từ pn.structure (dạng thưa,
+        dùng chung với BFS, DFS), luôn có dạng (n_trans, n_places) nên không cần
+        đoán chiều ma trận. Ngoài ra, ta cũng chuẩn hóa kích thước của M0 nếu cần thiết
         '''
-        enable = bdd.true
-        for idx in input_idx:
-            enable &= x_nodes[idx] 
-        for idx in output_idx:
-            if idx not in input_set: 
-                enable &= ~x_nodes[idx] 
+        if relation not in ("partitioned", "monolithic"):
+            raise ValueError(f"Unknown transition relation: {relation}")
+        if strategy not in ("bfs", "chaining", "saturation"):
+            raise ValueError(f"Unknown fixpoint strategy: {strategy}")
+        if isinstance(order, str) and order not in ORDER_METHODS:
+            raise ValueError(f"Unknown variable ordering: {order}")
+        if strategy != "bfs" and relation != "partitioned":
+            raise ValueError(f"Strategy '{strategy}' requires relation='partitioned'")
+        if bound is not None and bound < 1:
+            raise ValueError("Bound must be >= 1")
+        if bound is not None and relation != "partitioned":
+            raise ValueError("Bounded nets require relation='partitioned'")
+        if invariants and (relation != "partitioned" or bound is not None):
+            raise ValueError("Invariant-implied variables require relation='partitioned' "
+                             "and a 1-safe encoding")
+        self.bound = bound
+        self.invariants = invariants
+
+        st = pn.structure
+        M0 = np.asarray(pn.M0, dtype=np.int8)
+
+        raw_place_names = getattr(pn, "place_names", None) or [] 
+        num_places, num_trans = st.num_places, st.num_trans
+        self.num_places = num_places
+
+        '''
+        Resize M0 nếu cần ( Nếu số lượng place trong M0 khác với số lượng place thực tế)
+        Tạo mảng mới với kích thước đúng với toàn bộ giá trị là 0
+        và sao chép giá trị từ M0 cũ sang mảng mới
+        '''
+        if M0.shape[0] != num_places:
+            new_M0 = np.zeros(num_places, dtype=np.int8) 
+            new_M0[:min(M0.shape[0], num_places)] = M0[:min(M0.shape[0], num_places)] 
+            M0 = new_M0
+        self._check_initial(M0)
+        self.M0 = M0
+
+        # Tạo tên biến BDD
+        # Sử dụng tên place nếu có, nếu không thì dùng place ID, nếu vẫn không có thì dùng tên mặc định P[i]
+        place_ids = getattr(pn, "place_ids", None) or [] 
+        bdd_var_names: List[str] = []
         
-        if enable == bdd.false: # Mâu thuẫn, bỏ qua transition này
-            continue
+        for i in range(num_places):
+            name = None
+            if i < len(raw_place_names) and raw_place_names[i]: 
+                name = str(raw_place_names[i]) 
+            elif i < len(place_ids) and place_ids[i]:
+                name = str(place_ids[i]) 
+            bdd_var_names.append((name or f"P{i}").replace(" ", "").replace("-", "")) 
+                                                                                       
+        bdd_var_names_p = [n + "_p" for n in bdd_var_names] # Mảng lưu tên biến BDD cho trạng sau khi fire ( p1 -> p1_p)
+        self.var_names = bdd_var_names
+        self.var_names_p = bdd_var_names_p
+
+        # Net k-bounded: mỗi place một nhóm bit p_b0 (thấp nhất), p_b1, ...
+        # Net 1-safe: nhóm một bit chính là biến của place
+        if bound is None:
+            self.place_bits = [[n] for n in bdd_var_names]
+        else:
+            width = max(1, bound.bit_length())
+            self.place_bits = [[f"{n}_b{j}" for j in range(width)] for n in bdd_var_names]
         
         '''
-        Update condition  
-        Điều kiện update: cập nhật trạng thái các place bị ảnh hưởng
-        input mất token (nếu không phải self-loop), output nhận token (nếu không phải self-loop)
+         --- 2. KHỞI TẠO BDD MANAGER ---
+        '''
+
+        build_start = time.perf_counter()
+        bdd_module, backend = load_backend(backend)
+        bdd, self.manager_options = _new_manager(bdd_module, backend, initial_cache_size)
+        if reordering is not None:
+            try:
+                bdd.configure(reordering=reordering)
+            except (AttributeError, TypeError, ValueError):
+                raise ValueError(f"Backend '{backend}' does not support dynamic reordering")
+        self.bdd = bdd
+        self.backend = backend
+
+        # Interleaved ordering: x0, x0', x1, x1'...
+        # (partitioned không dùng biến x' nên chỉ khai báo x0, x1, ...)
+        # Thứ tự place được chọn bởi tham số order
+        if isinstance(order, str):
+            var_order = place_order(st, order)
+        else:
+            var_order = [int(i) for i in order]
+            if sorted(var_order) != list(range(num_places)):
+                raise ValueError("Variable order must be a permutation of place indices")
+        ordered_vars = []
+        for i in var_order:
+            for v in self.place_bits[i]:
+                ordered_vars.append(v)
+                if relation == "monolithic" or bound is not None:
+                    ordered_vars.append(v + "_p")
+        bdd.declare(*ordered_vars)
+        # Đặt thứ tự biến trong BDD theo kiểu xen kẽ: x0, x0', x1, x1' 
+        # để tối ưu hóa hiệu suất thao tác BDD sau này
+
+        # Pre-fetch BDD nodes vào lists
+        self.bit_nodes = [[bdd.var(v) for v in bits] for bits in self.place_bits]
+        self.bitp_nodes = [[bdd.var(v + "_p") for v in bits] for bits in self.place_bits] \
+            if bound is not None else []
+        x_nodes = [bits[0] for bits in self.bit_nodes] if bound is None else [] # BDD nodes cho trạng thái hiện tại x[i] để truy cập nhanh
+        xp_nodes = [bdd.var(bdd_var_names_p[i]) for i in range(num_places)] if relation == "monolithic" else [] # BDD nodes cho trạng thái tiếp theo x'[i] để truy cập nhanh
+        self.x_nodes = x_nodes
+
+
+        # Cache equivalence BDDs: equiv[i] = (x[i] <-> x'[i]) (chỉ monolithic cần frame)
+        equiv_cache = [(x_nodes[i] & xp_nodes[i]) | (~x_nodes[i] & ~xp_nodes[i])  
+                       for i in range(num_places)] if relation == "monolithic" else []
+        ''' 
+        Vì khi 1 transition bắn, chỉ 1 số ít place bị ảnh hưởng phần còn lại sẽ giữ nguyên trạng thái
+        Nên ta dùng cache này để tái sử dụng, dùng nó làm khung và chỉ thay đổi những place bị ảnh hưởng
+        giúp giảm thiểu số lượng thao tác BDD cần thiết
+        '''
+
+        '''
+         --- 3. XÂY DỰNG TRANSITION RELATION ---
+         Partitioned (mặc định): với mỗi transition t giữ bộ ba
+           (enable_t, biến x của các place bị ảnh hưởng, effect_t)
+         Vì net 1-safe nên giá trị mới của các place bị ảnh hưởng là hằng số,
+         effect_t là một cube trên chính biến x. Image của t:
+           img_t(S) = (∃ x_aff . S & enable_t) & effect_t
+         chỉ lượng tử hóa đúng các biến bị ảnh hưởng, không cần biến x', không cần
+         đổi tên (rename sẽ phải copy cả BDD) và không cần frame toàn cục.
+         Monolithic: kết hợp enable, update và frame của mọi transition vào T_monolithic
+         enables[t] giữ enable_t của MỌI transition (kể cả transition không có cung,
+         luôn enabled) cho các truy vấn deadlock / dead transition.
+        '''
+        self.xp_nodes = xp_nodes
+        self.equiv_cache = equiv_cache
+        self.enables = []
+        self._violations = []  # net k-bounded: marking mà bắn t sẽ vượt cận (None nếu không có)
+        self._parts = []   # partition của từng transition (None nếu bị bỏ qua)
+        self._mono = []    # enable & change & frame của từng transition (monolithic)
+        if invariants:
+            self._set_implied(pn)
+        if build_relation:
+            for t in range(num_trans):
+                self._add_transition_relation(t, st)
+        self.T_monolithic = self._union_monolithic()
+
+        # Reorder một lần sau khi dựng relation (relation đã được tham chiếu nên giữ nguyên)
+        self.explicit_reorder_time = 0.0
+        if reorder_after_build:
+            if not hasattr(bdd_module, "reorder"):
+                raise ValueError(f"Backend '{backend}' does not support reordering")
+            t0 = time.perf_counter()
+            bdd_module.reorder(bdd)
+            self.explicit_reorder_time = time.perf_counter() - t0
+
+        self.relation_nodes = self._relation_nodes()
+        self.build_time = time.perf_counter() - build_start
+
+    def _add_transition_relation(self, t: int, st) -> None:
+        '''Dựng (hoặc dựng lại) enable_t và phần relation của transition t.'''
+        if self.bound is not None:
+            self._add_bounded_relation(t, st)
+            return
+        bdd, x_nodes = self.bdd, self.x_nodes
+        input_idx = st.pre_sets[t]
+        output_idx = st.post_sets[t]
+
+        enable = _transition_enable(bdd, x_nodes, input_idx, output_idx)
+        part = mono = None
+
+        # Transition không có cung (luôn enabled, không đổi gì) hoặc mâu thuẫn: bỏ qua
+        if (len(input_idx) or len(output_idx)) and enable != bdd.false:
+            affected = st.affected_sets[t].tolist() # Các place bị ảnh hưởng bởi transition t
+
+            if self.relation == "partitioned":
+                part = (
+                    enable,
+                    {self.var_names[i] for i in affected},
+                    _transition_effect(bdd, x_nodes, input_idx, output_idx),
+                    None,
+                )
+            else:
+                '''
+                Frame condition (dùng cache)
+                Với những place không bị ảnh hưởng ( không phải input hay output)
+                giữ nguyên trạng thái bằng cách sử dụng cache
+                '''
+                change = _transition_change(bdd, self.xp_nodes, input_idx, output_idx)
+
+                affected_set = set(affected)
+                frame = bdd.true
+                for i in range(self.num_places):
+                    if i not in affected_set:
+                        frame &= self.equiv_cache[i]
+                mono = enable & change & frame
+                # Kết hợp điều kiện enable, update và frame của transition
+
+        if part is not None and self._implied:
+            part = self._reduce_part(part)
+        self._set_transition(t, enable, part, mono)
+
+    def _set_implied(self, pn) -> None:
+        '''
+        Place trụ của Structural.implied_places: divisor · M(p) = constant - Σ a_q M(q)
+        với q là các place tự do, nên trên encoding 1-safe x_p = f_p(x) với
+        f_p = [Σ a_q x_q == constant - divisor]. Biến x_p không tham gia điểm bất
+        động (xem _reduce_part); R đủ biến được dựng lại bằng R ∧ ∧_p (x_p <-> f_p).
+        '''
+        bdd = self.bdd
+        self._implied = {}
+        equiv = bdd.true
+        for rule in implied_places(pn):
+            free = sorted(rule.terms, key=lambda q: bdd.level_of_var(self.var_names[q]))
+            f = _linear_eq(bdd, [(self.x_nodes[q], rule.terms[q]) for q in free],
+                           rule.constant - rule.divisor)
+            x = self.x_nodes[rule.place]
+            self._implied[rule.place] = f
+            equiv &= (x & f) | (~x & ~f)
+        self._implied_equiv = equiv
+
+    def _reduce_part(self, part):
+        '''
+        Partition trên các place tự do: thế x_p := f_p vào enable_t, bỏ x_p khỏi
+        effect_t và biến lượng tử hóa. Transition chỉ đổi place suy ra được thì
+        không đổi marking (các place tự do giữ nguyên) -> None.
+        '''
+        bdd = self.bdd
+        enable, q_vars, effect, rename = part
+        implied = {self.var_names[p]: f for p, f in self._implied.items()}
+        dropped = q_vars & set(implied)
+        enable = bdd.let(implied, enable)
+        if dropped:
+            effect = bdd.quantify(effect, dropped, forall=False)
+        q_vars = q_vars - dropped
+        if not q_vars or enable == bdd.false:
+            return None
+        return (enable, q_vars, effect, rename)
+
+    def _project(self, S):
+        '''Bỏ biến của các place suy ra được (không gian của điểm bất động).'''
+        if not self._implied:
+            return S
+        return self.bdd.quantify(S, {self.var_names[p] for p in self._implied}, forall=False)
+
+    def _lift(self, S):
+        '''Ngược lại _project: thêm lại giá trị x_p = f_p của các place suy ra được.'''
+        if not self._implied:
+            return S
+        return S & self._implied_equiv
+
+    def _set_transition(self, t: int, enable, part, mono, violation=None) -> None:
+        if t == len(self.enables):
+            self.enables.append(enable)
+            self._parts.append(part)
+            self._mono.append(mono)
+            self._violations.append(violation)
+        else:
+            self.enables[t], self._parts[t], self._mono[t] = enable, part, mono
+            self._violations[t] = violation
+
+    def _add_bounded_relation(self, t: int, st) -> None:
+        '''
+        Net k-bounded (ngữ nghĩa P/T có trọng số):
+        - enable_t    : x_p >= pre(p, t) với mọi input p
+        - violation_t : enable_t và có place p tăng d_p = post - pre > 0 token mà
+                        x_p > k - d_p (bắn t sẽ vượt cận)
+        - relation_t  : enable_t ∧ ¬violation_t ∧ ∧_p (x'_p = x_p + d_p) trên các
+                        place có d_p != 0; image lượng tử hóa bit x của các place đó
+                        rồi đổi tên x' -> x
         '''
-        change = bdd.true
-        for idx in input_idx:
-            change &= xp_nodes[idx] if idx in output_set else ~xp_nodes[idx]
-        for idx in output_idx:
-            if idx not in input_set:
-                change &= xp_nodes[idx]
+        bdd, k = self.bdd, self.bound
+        pre = dict(zip(st.pre_sets[t].tolist(), st.pre_weights[t].tolist()))
+        post = dict(zip(st.post_sets[t].tolist(), st.post_weights[t].tolist()))
+
+        enable = bdd.true
+        for p, w in pre.items():
+            enable &= ~_const_lt(bdd, self.bit_nodes[p], w)
+
+        delta = {p: post.get(p, 0) - pre.get(p, 0) for p in set(pre) | set(post)}
+        delta = {p: d for p, d in sorted(delta.items()) if d != 0}
+        safe = bdd.true
+        for p, d in delta.items():
+            if d > 0:
+                safe &= _const_lt(bdd, self.bit_nodes[p], k - d + 1)
+        violation = enable & ~safe
+        part = None
+
+        # Transition không đổi marking (không cung / chỉ self-loop) hoặc không bao giờ bắn được: bỏ qua
+        if delta and (enable & safe) != bdd.false:
+            relation = enable & safe
+            for p, d in delta.items():
+                relation &= _const_add(bdd, self.bit_nodes[p], self.bitp_nodes[p], d)
+            bits = [v for p in delta for v in self.place_bits[p]]
+            part = (relation, set(bits), bdd.true, {v + "_p": v for v in bits})
+
+        self._set_transition(t, enable, part, None,
+                             violation if violation != bdd.false else None)
+
+    def _relation_nodes(self) -> int:
+        if self.relation == "partitioned":
+            return sum(_node_count(part[0] & part[2]) for part in self.partitions)
+        return _node_count(self.T_monolithic)
+
+    def _union_monolithic(self):
+        T_monolithic = self.bdd.false
+        for mono in self._mono:
+            if mono is not None:
+                T_monolithic |= mono
+        return T_monolithic
+
+    @property
+    def partitions(self) -> list:
+        return [part for part in self._parts if part is not None]
+
+    def marking_bdd(self, M) -> object:
+        '''BDD của đúng một marking M (số token theo thứ tự place).'''
+        u = self.bdd.true
+        for i, v in enumerate(M):
+            u &= _value_cube(self.bdd, self.bit_nodes[i], int(v))
+        return u
+
+    def _check_initial(self, M0) -> None:
+        if self.bound is None:
+            return
+        over = np.flatnonzero(np.asarray(M0) > self.bound)
+        if len(over):
+            raise BoundViolation(tuple(np.asarray(M0).tolist()), self.pn.place_ids[over[0]], self.bound)
+
+    def _any_violation(self):
+        u = self.bdd.false
+        for violation in self._violations:
+            if violation is not None:
+                u |= violation
+        return u
 
+    def _check_bound(self, S, any_violation) -> None:
         '''
-        Frame condition (dùng cache)
-        Với những place không bị ảnh hưởng ( không phải input hay output)
-        giữ nguyên trạng thái bằng cách sử dụng cache
+        Net k-bounded: nếu S có marking mà bắn một transition sẽ vượt cận thì báo
+        BoundViolation với marking vượt cận (tính tường minh từ marking trong S).
         '''
-        frame = bdd.true
-        for i in range(num_places):         
-            if i not in affected_set:       
-                frame &= equiv_cache[i]     
+        if any_violation == self.bdd.false or (S & any_violation) == self.bdd.false:
+            return
+        st = self.pn.structure
+        for t, violation in enumerate(self._violations):
+            if violation is None or (S & violation) == self.bdd.false:
+                continue
+            m = self.witnesses(S & violation, limit=1)[0]
+            new = list(m)
+            for p, w in zip(st.pre_sets[t].tolist(), st.pre_weights[t].tolist()):
+                new[p] -= w
+            for p, w in zip(st.post_sets[t].tolist(), st.post_weights[t].tolist()):
+                new[p] += w
+            place = next(p for p, v in enumerate(new) if v > self.bound)
+            raise BoundViolation(tuple(new), self.pn.place_ids[place], self.bound,
+                                 self.pn.trans_ids[t], m)
+
+    def compute(self, stats: Optional[Dict[str, Any]] = None) -> "SymbolicReachability":
+        '''Tính R (chỉ lần đầu) rồi ghi stats nếu được truyền vào.'''
+        if self.R is None:
+            with self._monitor:
+                self._fixpoint()
+        if stats is not None:
+            self._write_stats(stats)
+        return self
+
+    def _fixpoint(self) -> None:
+        bdd = self.bdd
+        partitions = self.partitions
+        strategy = self.strategy
+
+        # --- 4. TRẠNG THÁI KHỞI TẠO ---
+        # Đầu tiên, initial marking M0 đươc thêm vào tập trạng thái reachable R
+        # Nếu thay đổi của net chỉ làm tập reachable lớn thêm thì bắt đầu luôn từ R cũ:
+        # R cũ đã đóng với mọi transition chưa sửa, nên frontier ban đầu chỉ cần
+        # là các marking của R cũ mà transition vừa sửa / vừa thêm enabled
+        self.incremental = self._grow_from is not None
+        if self.incremental:
+            R = self._grow_from
+            start = bdd.false
+            for t in self._touched:
+                start |= self.enables[t]
+            start &= R
+        else:
+            R = self._project(self.marking_bdd(self.M0))
+            start = R
+        self._grow_from = None
+        self._touched = set()
+        any_violation = self._any_violation()
+        self._check_bound(start, any_violation)
         
-        T_monolithic |= enable & change & frame
-        # Cập nhật transition (kết hợp điều kiện enable, update và frame) vào transition relation
-    
-    del equiv_cache   
-
-    # --- 4. TRẠNG THÁI KHỞI TẠO ---
-    # Đầu tiên, initial marking M0 đươc thêm vào tập trạng thái reachable R
-    R = bdd.true 
-    for i in range(num_places):
-        R &= x_nodes[i] if M0[i] else ~x_nodes[i] 
-    
-    # --- 5. REACHABILITY LOOP  ---
-    '''
-    Vòng lặp tìm kiếm các trạng thái reachable mới từ frontier hiện tại
-    Đầu tiên, frontier được khởi tạo bằng tập R ban đầu
-    Trong mỗi vòng lặp, ta tính giao của frontier với T_monolithic để tìm
-    các trạng thái có thể đạt được từ frontier
-    Sau đó, sử dụng phép lượng tử hóa để loại bỏ biến hiện tại x[i], chỉ giữ lại biến tiếp theo x'[i]
-    Tiếp theo, đổi tên biến x'[i] thành x[i] để tiếp tục xử lý
-    Lọc ra các trạng thái mới chưa có trong tập R
-    Nếu tìm thấy trạng thái mới, cập nhật tập R và frontier để tiếp tục tìm kiếm
-    Ngược lại, nếu không tìm thấy trạng thái mới, vòng lặp kết thúc
-    '''
-    frontier = R
-    rename_map = {bdd_var_names_p[i]: bdd_var_names[i] for i in range(num_places)} 
-    q_vars = set(bdd_var_names) 
-    
-    while True:
-        conj = frontier & T_monolithic 
+        # --- 5. REACHABILITY LOOP  ---
+        '''
+        Vòng lặp tìm kiếm các trạng thái reachable mới từ frontier hiện tại
+        Đầu tiên, frontier được khởi tạo bằng tập R ban đầu
+        Trong mỗi vòng lặp, ta tính image của frontier qua transition relation:
+        - monolithic: giao frontier với T_monolithic, lượng tử hóa toàn bộ x[i],
+          rồi đổi tên x'[i] thành x[i]
+        - partitioned: với từng transition, giao frontier với enable_t, chỉ lượng tử hóa
+          các biến của place bị ảnh hưởng, gán giá trị mới bằng effect_t, rồi OR lại
+        Lọc ra các trạng thái mới chưa có trong tập R
+        Nếu tìm thấy trạng thái mới, cập nhật tập R và frontier để tiếp tục tìm kiếm
+        Ngược lại, nếu không tìm thấy trạng thái mới, vòng lặp kết thúc
+        Với "chaining"/"saturation" thì thứ tự áp dụng transition khác (xem bên dưới),
+        nhưng điểm bất động R thu được là như nhau
+        '''
+        fixpoint_start = time.perf_counter()
+        self.frontiers = None
+        iterations = 0
+        peak_nodes = _manager_size(bdd) or 0
+
+        if strategy == "saturation":
+            '''
+            Saturation-style: nhóm các partition theo level cao nhất (gần gốc nhất)
+            trong các biến bị ảnh hưởng. Duyệt nhóm từ dưới lên: ở bước k, chaining
+            với các nhóm 0..k đến điểm bất động cục bộ, nên trạng thái mới do nhóm k
+            sinh ra luôn được các nhóm thấp hơn bão hòa lại ngay.
+            (Xấp xỉ saturation trên BDD phẳng, không đệ quy theo từng node như MDD.)
+            '''
+            top_level = lambda part: min(bdd.level_of_var(v) for v in part[1])
+            groups: Dict[int, list] = {}
+            for part in partitions:
+                groups.setdefault(top_level(part), []).append(part)
+            levels = sorted(groups, reverse=True)  # level lớn = gần đáy BDD
+
+            active = []
+            for level in levels:
+                active = groups[level] + active
+                frontier = R
+                while frontier != bdd.false:
+                    R, frontier = _chain(bdd, R, frontier, active)
+                    self._check_bound(frontier, any_violation)
+                    iterations += 1
+                    peak_nodes = max(peak_nodes, _manager_size(bdd) or 0)
+
+        elif strategy == "chaining":
+            frontier = start
+            while frontier != bdd.false:
+                R, frontier = _chain(bdd, R, frontier, partitions)
+                self._check_bound(frontier, any_violation)
+                iterations += 1
+                peak_nodes = max(peak_nodes, _manager_size(bdd) or 0)
+
+        else:
+            frontier = start
+            # Tầng BFS (marking ở khoảng cách đúng j từ M0), giữ lại cho trace()
+            layers = [start] if self.keep_frontiers and not self.incremental else None
+            while True:
+                img_renamed = self._post(frontier)
+                new_states = img_renamed & ~R 
+                iterations += 1
+                peak_nodes = max(peak_nodes, _manager_size(bdd) or 0)
+                
+                if new_states == bdd.false: 
+                    break
+                self._check_bound(new_states, any_violation)
+                
+                R |= new_states 
+                frontier = new_states 
+                if layers is not None:
+                    layers.append(new_states)
+            self.frontiers = [self._lift(layer) for layer in layers] if layers is not None else None
+
+        self.R = self._lift(R)
+        self.iterations = iterations
+        self.peak_nodes = peak_nodes
+        self.fixpoint_time = time.perf_counter() - fixpoint_start
+
+    def _post(self, S):
+        '''
+        Image của S qua toàn bộ relation (với invariants: S và kết quả đều không
+        có biến của place suy ra được):
+        - monolithic: giao S với T_monolithic, lượng tử hóa toàn bộ x[i], rồi đổi tên x'[i] thành x[i]
+        - partitioned: OR image của từng transition (_image)
+        '''
+        bdd = self.bdd
+        if self.relation == "partitioned":
+            img = bdd.false
+            for part in self.partitions:
+                img |= _image(bdd, S, part)
+            return img
+        conj = S & self.T_monolithic
         if conj == bdd.false:
-            break
-        
-        img = bdd.quantify(conj, q_vars, forall=False) 
-        img_renamed = bdd.let(rename_map, img) 
-        new_states = img_renamed & ~R 
-        
-        if new_states == bdd.false: 
-            break
-        
-        R |= new_states 
-        frontier = new_states 
+            return bdd.false
+        img = bdd.quantify(conj, set(self.var_names), forall=False)
+        return bdd.let(dict(zip(self.var_names_p, self.var_names)), img)
+
+    def _pre(self, S, t: int):
+        '''
+        Preimage của S qua transition t: các marking mà bắn t thì rơi vào S.
+        - partitioned 1-safe : enable_t ∧ ∃ x_aff . (S ∧ effect_t)
+        - k-bounded          : ∃ x'_aff . (relation_t ∧ S[x_aff := x'_aff])
+        - monolithic         : ∃ x' . (T_t ∧ S[x := x'])
+        Transition bị bỏ qua (không đổi marking) trả về false. S và kết quả đủ biến.
+        '''
+        bdd = self.bdd
+        if self.relation == "partitioned":
+            part = self._parts[t]
+            if part is None:
+                return bdd.false
+            enable, q_vars, effect, rename = part
+            if rename is None:
+                S = self._project(S)
+                return self._lift(enable & bdd.quantify(S & effect, q_vars, forall=False))
+            primed = {v: p for p, v in rename.items()}
+            return bdd.quantify(bdd.let(primed, S) & enable, set(rename), forall=False)
+        mono = self._mono[t]
+        if mono is None:
+            return bdd.false
+        shifted = bdd.let(dict(zip(self.var_names, self.var_names_p)), S)
+        return bdd.quantify(shifted & mono, set(self.var_names_p), forall=False)
+
+    def _write_stats(self, stats: Dict[str, Any]) -> None:
+        bdd = self.bdd
+        peak_nodes = self.peak_nodes
+        reorderings = self._monitor.count
+        reorder_time = self._monitor.dynamic_time + self.explicit_reorder_time
+        with warnings.catch_warnings():
+            # dd.cudd cảnh báo về đơn vị của khóa 'mem', không dùng ở đây
+            warnings.simplefilter("ignore")
+            manager_stats = bdd.statistics() if hasattr(bdd, "statistics") else {}
+        if "n_reorderings" in manager_stats:
+            # CUDD tự đếm (kể cả lần reorder_after_build)
+            reorderings = manager_stats["n_reorderings"]
+            reorder_time = manager_stats.get("reordering_time", reorder_time)
+        if "peak_live_nodes" in manager_stats:
+            peak_nodes = max(peak_nodes, manager_stats["peak_live_nodes"])
+        try:
+            dynamic = bdd.configure()["reordering"]
+        except (AttributeError, KeyError, TypeError, ValueError):
+            dynamic = None
+
+        stats.update({
+            "backend": self.backend,
+            "relation": self.relation,
+            "strategy": self.strategy,
+            "incremental": self.incremental,
+            "loaded_from": self.loaded_from,
+            "iterations": self.iterations,
+            "peak_nodes": peak_nodes,
+            "final_nodes": _manager_size(bdd),
+            "R_nodes": _node_count(self.R),
+            "relation_nodes": self.relation_nodes,
+            "T_monolithic_nodes": self.relation_nodes if self.relation == "monolithic" else None,
+            "reordering": dynamic,
+            "reorderings": reorderings,
+            "reorder_time_s": reorder_time,
+            "initial_cache_size": self.initial_cache_size,
+            "manager_options": dict(self.manager_options),
+            "build_time_s": self.build_time,
+            "fixpoint_time_s": self.fixpoint_time,
+            # Thứ tự thực tế (có thể khác thứ tự ban đầu nếu đã reorder)
+            "order": sorted(self._x_vars(), key=bdd.level_of_var),
+            "bound": self.bound,
+            "implied_places": len(self._implied),
+        })
+
+    # --- 6. ĐẾM SỐ LƯỢNG VÀ TRUY VẤN TRÊN R ---
+
+    @property
+    def reachable(self):
+        '''BDD tập marking reachable (tính điểm bất động nếu chưa có).'''
+        return self.compute().R
+
+    def _x_vars(self) -> List[str]:
+        return [v for bits in self.place_bits for v in bits]
+
+    def count_of(self, S) -> int:
+        return int(self.bdd.count(S, nvars=sum(len(bits) for bits in self.place_bits)))
+
+    @property
+    def count(self) -> int:
+        '''Số lượng marking reachable.'''
+        return self.count_of(self.reachable)
+
+    def deadlocks(self):
+        '''Tập marking reachable không có transition nào enabled: R ∧ ¬∨ enable_t.'''
+        return self.reachable & self._target_bdd("deadlock")
+
+    def has_deadlock(self) -> bool:
+        return self.deadlocks() != self.bdd.false
+
+    def place_bounds(self) -> List[int]:
+        '''
+        Số token lớn nhất của từng place trên R. Encoding 1-safe thì cận là 0
+        (place không bao giờ có token) hoặc 1; net k-bounded thì chọn tham lam
+        từ bit cao xuống, giữ bit = 1 khi R vẫn còn marking thỏa mãn.
+        '''
+        R = self.reachable
+        bounds = []
+        for bits in self.bit_nodes:
+            u, value = R, 0
+            for j in range(len(bits) - 1, -1, -1):
+                if (u & bits[j]) != self.bdd.false:
+                    u &= bits[j]
+                    value |= 1 << j
+                else:
+                    u &= ~bits[j]
+            bounds.append(value)
+        return bounds
+
+    def dead_transitions(self) -> List[str]:
+        '''Id các transition không enabled ở bất kỳ marking reachable nào (L0-dead).'''
+        R = self.reachable
+        return [self.pn.trans_ids[t] for t, enable in enumerate(self.enables)
+                if (R & enable) == self.bdd.false]
+
+    def partial_marking_bdd(self, partial: Dict[Any, int]):
+        '''
+        BDD của phép gán một phần {place: số token}; place là chỉ số, id hoặc tên.
+        Place không có trong partial được để tự do.
+        '''
+        u = self.bdd.true
+        for place, value in partial.items():
+            u &= _value_cube(self.bdd, self.bit_nodes[self.pn.place_index(place)], int(value))
+        return u
+
+    def is_reachable(self, partial: Dict[Any, int]) -> bool:
+        '''Có marking reachable nào khớp phép gán một phần partial hay không.'''
+        return (self.reachable & self.partial_marking_bdd(partial)) != self.bdd.false
+
+    def matching(self, partial: Dict[Any, int]):
+        '''Tập marking reachable khớp partial (BDD, dùng với witnesses / sample).'''
+        return self.reachable & self.partial_marking_bdd(partial)
+
+    def _to_marking(self, assignment: Dict[str, bool]) -> Tuple[int, ...]:
+        return tuple(sum(int(bool(assignment[v])) << j for j, v in enumerate(bits))
+                     for bits in self.place_bits)
+
+    def witnesses(self, S=None, limit: Optional[int] = 10) -> List[Tuple[int, ...]]:
+        '''Liệt kê tối đa limit marking (tuple số token) trong S (mặc định R).'''
+        S = self.reachable if S is None else S
+        care = set(self._x_vars())
+        result = []
+        for assignment in self.bdd.pick_iter(S, care_vars=care):
+            result.append(self._to_marking(assignment))
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def sample(self, S=None, k: int = 1, seed: Optional[int] = None) -> List[Tuple[int, ...]]:
+        '''
+        Lấy k marking ngẫu nhiên phân phối đều trong S (mặc định R): đi lần lượt
+        từng biến, chọn giá trị theo tỉ lệ số marking của hai nhánh (bdd.count).
+        '''
+        S = self.reachable if S is None else S
+        if S == self.bdd.false:
+            return []
+        rng = np.random.default_rng(seed)
+        result = []
+        for _ in range(k):
+            u = S
+            marking = []
+            for bits in self.bit_nodes:
+                value = 0
+                for j, x in enumerate(bits):
+                    ones = self.count_of(u & x)
+                    total = self.count_of(u)
+                    take = rng.random() * total < ones
+                    u &= x if take else ~x
+                    value |= int(take) << j
+                marking.append(value)
+            result.append(tuple(marking))
+        return result
+
+    def _target_bdd(self, target):
+        '''
+        Target của trace / query: BDD tập marking, marking đầy đủ (tuple, list hoặc
+        mảng NumPy theo thứ tự place), phép gán một phần hoặc "deadlock".
+        '''
+        if isinstance(target, str):
+            if target != "deadlock":
+                raise ValueError(f"Unknown query target: {target}")
+            any_enabled = self.bdd.false
+            for enable in self.enables:
+                any_enabled |= enable
+            return ~any_enabled
+        if isinstance(target, dict):
+            return self.partial_marking_bdd(target)
+        if isinstance(target, (tuple, list, np.ndarray)):
+            if len(target) != len(self.place_bits):
+                raise ValueError(f"Target marking has {len(target)} places, "
+                                 f"expected {len(self.place_bits)}")
+            return self.marking_bdd(target)
+        if isinstance(target, type(self.bdd.true)):
+            return target
+        raise ValueError(f"Unsupported query target type: {type(target).__name__}")
+
+    def _layers(self, target) -> List[object]:
+        '''
+        Tầng BFS từ M0, kiểm tra tầng ∧ target sau mỗi vòng và dừng ở tầng đầu tiên
+        chạm target (hoặc khi hết trạng thái mới). Net k-bounded: tầng chưa chạm
+        target mà bắn tiếp sẽ vượt cận -> BoundViolation như compute().
+        '''
+        bdd = self.bdd
+        any_violation = self._any_violation()
+        target = self._project(self._lift(target))
+        layers = [self._project(self.marking_bdd(self.M0))]
+        seen = layers[0]
+        while (layers[-1] & target) == bdd.false:
+            self._check_bound(layers[-1], any_violation)
+            new_states = self._post(layers[-1]) & ~seen
+            if new_states == bdd.false:
+                break
+            seen |= new_states
+            layers.append(new_states)
+        return [self._lift(layer) for layer in layers]
+
+    def query(self, target) -> PORResult:
+        '''
+        Truy vấn dừng sớm: target là phép gán một phần {place: số token}, "deadlock",
+        một marking đầy đủ hoặc BDD tập marking (xem _target_bdd). Chưa có R thì chỉ duyệt các tầng BFS tới tầng đầu tiên
+        chạm target (_layers), rẻ hơn nhiều so với tính hết điểm bất động khi mục
+        tiêu nằm ở vài tầng đầu. Tìm thấy thì đi ngược bằng preimage: ở tầng j chọn
+        transition có preimage của marking hiện tại giao tầng j-1.
+        Trả về POR.PORResult: trace ngắn nhất, states = số marking đã duyệt.
+        '''
+        bdd = self.bdd
+        target = self._target_bdd(target)
+        if self.R is not None and (self.R & target) == bdd.false:
+            return PORResult(False, None, [], self.count, 0)
+        layers = self.frontiers if self.frontiers is not None else self._layers(target)
+        hit = next((j for j, layer in enumerate(layers) if (layer & target) != bdd.false), None)
+        explored = bdd.false
+        for layer in layers[:len(layers) if hit is None else hit + 1]:
+            explored |= layer
+        states = self.count_of(explored)
+        if hit is None:
+            return PORResult(False, None, [], states, len(layers) - 1)
+
+        marking = self.witnesses(layers[hit] & target, limit=1)[0]
+        current = self.marking_bdd(marking)
+        path = []
+        for i in range(hit, 0, -1):
+            for t in range(len(self.enables)):
+                pre = self._pre(current, t) & layers[i - 1]
+                if pre != bdd.false:
+                    current = self.marking_bdd(self.witnesses(pre, limit=1)[0])
+                    path.append(self.pn.trans_ids[t])
+                    break
+        return PORResult(True, marking, path[::-1], states, hit)
+
+    def trace(self, target) -> Optional[Tuple[List[str], Tuple[int, ...]]]:
+        '''
+        Dãy bắn ngắn nhất từ M0 tới một marking của target (như query): trả về
+        (danh sách transition id, marking đích) hoặc None nếu target không reachable.
+        Dùng các tầng BFS đã giữ (keep_frontiers) nếu có, không thì tính lại tới
+        tầng đầu tiên chạm target.
+        '''
+        result = self.query(target)
+        return (result.trace, result.marking) if result.found else None
+
+    # --- 7. PHÂN TÍCH LẠI TĂNG DẦN KHI NET THAY ĐỔI ---
+    # Sửa net qua các hàm dưới đây (không sửa trực tiếp pn) để manager, biến và
+    # relation của các transition không đổi được giữ lại; R được tính lại ở truy vấn sau.
+
+    def set_initial_marking(self, M0) -> None:
+        '''Đổi M0: giữ nguyên toàn bộ relation, chỉ tính lại điểm bất động từ M0 mới.'''
+        M0 = np.asarray(M0, dtype=np.int8)
+        if M0.shape != (self.num_places,):
+            raise ValueError(f"Initial marking must have {self.num_places} entries")
+        if np.array_equal(M0, self.M0):
+            return
+        self._check_editable()
+        self._check_initial(M0)
+        self.pn.M0 = M0.astype(np.asarray(self.pn.M0).dtype)
+        self.M0 = M0
+        self._invalidate(grows=False)
+
+    def set_arcs(self, transition: Union[int, str], inputs=None, outputs=None) -> None:
+        '''Thay cung vào / ra của một transition (xem PetriNet.set_arcs); chỉ dựng lại partition của nó.'''
+        t = self.pn.trans_index(transition)
+        self._check_editable()
+        grows = self._is_dead_before_edit(t)
+        self.pn.set_arcs(t, inputs, outputs)
+        self._rebuild_transition(t, grows)
+
+    def add_arc(self, place: Union[int, str], transition: Union[int, str],
+                side: str = "input", weight: int = 1) -> None:
+        '''Thêm cung place -> transition (side="input") hoặc transition -> place ("output").'''
+        t, arcs = self._arcs(transition, side)
+        arcs[self.pn.place_index(place)] = weight
+        self.set_arcs(t, **{side + "s": arcs})
+
+    def remove_arc(self, place: Union[int, str], transition: Union[int, str],
+                   side: str = "input") -> None:
+        t, arcs = self._arcs(transition, side)
+        p = self.pn.place_index(place)
+        if p not in arcs:
+            raise ValueError(f"No {side} arc between {place} and {transition}")
+        del arcs[p]
+        self.set_arcs(t, **{side + "s": arcs})
+
+    def add_transition(self, trans_id: str, inputs=(), outputs=(),
+                       name: Optional[str] = None) -> None:
+        '''Thêm transition mới; tập reachable chỉ có thể lớn thêm nên bắt đầu lại từ R cũ.'''
+        self._check_editable()
+        t = self.pn.add_transition(trans_id, inputs, outputs, name)
+        self._rebuild_transition(t, grows=True)
+
+    def _check_editable(self) -> None:
+        # Semiflow (và các hàm f_p) phụ thuộc cả cung lẫn M0
+        if self.invariants:
+            raise ValueError("Incremental edits are not supported with invariants=True")
+
+    def _arcs(self, transition, side: str) -> Tuple[int, Dict[int, int]]:
+        if side not in ("input", "output"):
+            raise ValueError(f"Unknown arc side: {side}")
+        t = self.pn.trans_index(transition)
+        matrix = self.pn.I_sparse if side == "input" else self.pn.O_sparse
+        cols, vals = matrix.row(t)
+        return t, dict(zip(cols.tolist(), vals.tolist()))
+
+    def _is_dead_before_edit(self, t: int) -> bool:
+        '''
+        Sửa transition t chỉ làm tập reachable lớn thêm nếu t chưa từng enabled trên
+        R đã tính: mọi đường đi tới R không dùng t nên vẫn còn nguyên sau khi sửa.
+        '''
+        base = self.R if self.R is not None else self._grow_from
+        if base is None:
+            return False
+        if self.R is None and t in self._touched:
+            return True
+        return (base & self.enables[t]) == self.bdd.false
+
+    def _rebuild_transition(self, t: int, grows: bool) -> None:
+        with self._monitor:
+            self._add_transition_relation(t, self.pn.structure)
+            if self.relation == "monolithic":
+                self.T_monolithic = self._union_monolithic()
+        self.relation_nodes = self._relation_nodes()
+        self._invalidate(grows, t)
+
+    def _invalidate(self, grows: bool, t: Optional[int] = None) -> None:
+        if grows and (self.R is not None or self._grow_from is not None):
+            if self.R is not None:
+                self._grow_from = self.R
+                self._touched = set()
+            self._touched.add(t)
+        else:
+            self._grow_from = None
+            self._touched = set()
+        self.R = None
+        self.frontiers = None
+
+    # --- 8. LƯU / ĐỌC R TRÊN ĐĨA ---
+
+    def current_order(self) -> List[int]:
+        '''Chỉ số place theo thứ tự level hiện tại của biến x (sau mọi lần reorder).'''
+        return sorted(range(self.num_places), key=lambda i: self.bdd.level_of_var(self.place_bits[i][0]))
+
+    def save(self, path: str, relation: bool = False) -> None:
+        '''
+        Ghi R (tính nếu chưa có) ra file .npz không nén: bảng node (xem _dump_nodes),
+        tên biến theo level, thứ tự place và content_hash() của net để kiểm tra khi đọc.
+        relation=True thì lưu kèm enable_t, effect_t (partitioned) hoặc phần relation
+        của từng transition và T_monolithic (monolithic), load() khỏi phải dựng lại.
+        '''
+        bdd = self.bdd
+        R = self.reachable
+        var_names = sorted(bdd.vars, key=bdd.level_of_var)
+        var_index = {v: i for i, v in enumerate(var_names)}
+
+        roots = [R]
+        # relation k-bounded / đã thế biến suy ra được (invariants) luôn dựng lại từ pn
+        relation = relation and self.bound is None and not self._implied
+        if relation:
+            roots += self.enables
+            pieces = [part[2] if part is not None else None for part in self._parts] \
+                if self.relation == "partitioned" else self._mono
+            present = [u for u in pieces if u is not None]
+            roots += present
+            roots.append(self.T_monolithic)
+        node_var, node_low, node_high, edges = _dump_nodes(bdd, roots, var_index)
+
+        extra = {}
+        if relation:
+            num_trans = len(self.enables)
+            it = iter(edges[1 + num_trans:])
+            extra = dict(
+                enables=np.array(edges[1:1 + num_trans], dtype=np.int64),
+                pieces=np.array([next(it) if u is not None else -1 for u in pieces], dtype=np.int64),
+                T_monolithic=np.array(edges[-1], dtype=np.int64),
+            )
+
+        with atomic_write(path) as f:
+            np.savez(
+                f,
+                format_version=np.array(BDD_STORE_VERSION),
+                net_hash=np.array(self.pn.content_hash()),
+                relation=np.array(self.relation),
+                var_names=np.array(var_names, dtype=str),
+                place_order=np.array(self.current_order(), dtype=np.int32),
+                node_var=node_var, node_low=node_low, node_high=node_high,
+                R=np.array(edges[0], dtype=np.int64),
+                count=np.array(self.count, dtype=np.int64),
+                bound=np.array(-1 if self.bound is None else self.bound, dtype=np.int64),
+                **extra,
+            )
+
+    @classmethod
+    def load(cls, pn: PetriNet, path: str, relation: Optional[str] = None, strategy: str = "bfs",
+             reordering: Optional[bool] = None, initial_cache_size: Optional[int] = None,
+             backend: Optional[str] = None, invariants: bool = False) -> "SymbolicReachability":
+        '''
+        Đọc R do save() ghi vào một manager mới, biến được khai báo đúng thứ tự đã
+        lưu nên mỗi node chỉ là một lần tra bảng unique. relation mặc định là loại
+        đã lưu; relation được lưu kèm và cùng loại thì dùng lại, không thì dựng từ pn.
+        invariants=True dựng lại các place suy ra được như constructor (R lưu đủ biến).
+        File không khớp với pn (content_hash) -> ValueError.
+        '''
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["format_version"]) != BDD_STORE_VERSION:
+                raise ValueError(f"Unsupported BDD store format in {path}")
+            if str(z["net_hash"]) != pn.content_hash():
+                raise ValueError(f"Stored BDD in {path} does not match this net")
+            stored_relation = str(z["relation"])
+            relation = relation or stored_relation
+            reuse = "enables" in z and relation == stored_relation
+            data = {k: z[k] for k in z.files}
+        bound = int(data["bound"]) if "bound" in data and int(data["bound"]) >= 0 else None
+
+        start = time.perf_counter()
+        sr = cls.__new__(cls)
+        order = data["place_order"].tolist()
+        sr._reset(pn, relation, strategy, order, initial_cache_size)
+        with sr._monitor:
+            sr._build(pn, relation, strategy, order, reordering, False,
+                      initial_cache_size, backend, build_relation=not reuse, bound=bound,
+                      invariants=invariants)
+            declared = set(sr.bdd.vars)
+            var_nodes = [sr.bdd.var(v) if v in declared else None for v in data["var_names"].tolist()]
+            edges = [int(data["R"])]
+            if reuse:
+                edges += data["enables"].tolist() + [e for e in data["pieces"].tolist() if e >= 0]
+                edges.append(int(data["T_monolithic"]))
+            roots = _load_nodes(sr.bdd, var_nodes, data["node_var"], data["node_low"],
+                                data["node_high"], edges)
+
+        sr.R = roots[0]
+        if reuse:
+            st = pn.structure
+            num_trans = st.num_trans
+            sr.enables = roots[1:1 + num_trans]
+            it = iter(roots[1 + num_trans:-1])
+            pieces = [next(it) if e >= 0 else None for e in data["pieces"].tolist()]
+            if relation == "partitioned":
+                sr._parts = [
+                    (sr.enables[t], {sr.var_names[i] for i in st.affected_sets[t].tolist()}, effect, None)
+                    if effect is not None else None
+                    for t, effect in enumerate(pieces)
+                ]
+                sr._mono = [None] * num_trans
+                sr._violations = [None] * num_trans
+            else:
+                sr._parts = [None] * num_trans
+                sr._violations = [None] * num_trans
+                sr._mono = pieces
+            sr.T_monolithic = roots[-1]
+            sr.relation_nodes = sr._relation_nodes()
+        sr.peak_nodes = _manager_size(sr.bdd) or 0
+        sr.fixpoint_time = 0.0
+        sr.load_time = time.perf_counter() - start
+        sr.loaded_from = path
+        return sr
+
+    @classmethod
+    def cached(cls, pn: PetriNet, directory: str, save_relation: bool = False,
+               **kwargs) -> "SymbolicReachability":
+        '''
+        Đọc R từ <directory>/<content_hash>-<encoding>.bdd.npz nếu có, không thì tính
+        rồi ghi file đó; <encoding> là khóa ngắn của bound, invariants và order (mỗi
+        cách mã hóa một file riêng, bound=2 không bao giờ đọc nhầm R 1-safe).
+        kwargs truyền cho constructor (relation, strategy, order, backend, ...);
+        khi đọc chỉ relation, strategy, reordering, initial_cache_size, backend,
+        invariants có tác dụng. Không ghi được file (thư mục chỉ đọc, ...) thì chỉ cảnh báo.
+        '''
+        name = f"{pn.content_hash()}-{_store_key(**kwargs)}{BDD_STORE_SUFFIX}"
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            load_kwargs = {k: v for k, v in kwargs.items()
+                           if k in ("relation", "strategy", "reordering", "initial_cache_size",
+                                    "backend", "invariants")}
+            try:
+                return cls.load(pn, path, **load_kwargs)
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+                pass  # file hỏng, ghi dở hoặc khác định dạng -> tính lại
 
-    # --- 6. ĐẾM SỐ LƯỢNG ---
-    return R, int(bdd.count(R, nvars=num_places)) # Trả về BDD của tập trạng thái reachable và số lượng trạng thái trong đó
\ No newline at end of file
+        sr = cls(pn, **kwargs).compute()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            sr.save(path, relation=save_relation)
+        except OSError as e:
+            warnings.warn(f"Cannot write BDD store {path}: {e}")
+        return sr
@@ -1,10 +1,26 @@
 from collections import deque
+import tempfile
 import numpy as np
 from .PetriNet import PetriNet
-from typing import Set, Tuple
+from .Marking import (
+    check_one_safe, compile_masks, compile_fields, pack_marking, unpack_markings,
+    pack_rows, unpack_rows, rows_to_tuples,
+)
+from .Parallel import parallel_reachable
+from .Bitstate import BITSTATE_BYTES, BITSTATE_HASHES, BitstateResult, bitstate_reachable
+from .Graph import ReachabilityGraph, TraceTable, reachability_graph, trace_table
+from typing import Optional, Set, Tuple, Union
 
+# Số marking tối đa của frontier xử lý trong một lần nhân ma trận
+# (giới hạn bộ nhớ của mảng (chunk, |T|) trung gian)
+FRONTIER_CHUNK = 1 << 15
 
-def bfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
+
+def bfs_reachable(pn: PetriNet, mode: str = "numpy", workers: int = 1,
+                  bound: Optional[int] = None, graph: bool = False,
+                  trace: bool = False, memory_bytes: int = BITSTATE_BYTES,
+                  hashes: int = BITSTATE_HASHES
+                  ) -> Union[Set[Tuple[int, ...]], BitstateResult, ReachabilityGraph, TraceTable]:
     """
     Trả về tập tất cả marking reachable (dưới dạng tuple)
     bằng thuật toán duyệt BFS, với giả thiết net là 1-safe.
@@ -13,22 +29,83 @@ def bfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
     - Kiểm tra đầy đủ enabling condition cho 1-safe nets
     - Output-only places phải rỗng trước khi firing
     - Proper 1-safe semantics
+
+    mode:
+    - "numpy"  : duyệt từng marking bằng vector NumPy (bản gốc)
+    - "packed" : marking nén thành số nguyên, enable/fire bằng bitmask
+    - "vectorized" : BFS theo tầng, cả frontier xử lý bằng phép toán ma trận
+    - "external" : như vectorized nhưng các tầng và tập visited nằm trên đĩa
+                   (External.bfs_reachable_external, dùng cho không gian trạng thái
+                   lớn hơn RAM; ở đây kết quả vẫn được đọc hết về tập tuple)
+    - "bitstate" : visited là Bloom filter kích thước cố định (Bitstate.bitstate_reachable);
+                   trả về BitstateResult (len() = số marking đã thăm, kèm xác suất bỏ sót);
+                   memory_bytes / hashes là kích thước mảng bit và số hàm băm
+
+    workers:
+    - 1 (mặc định) : chạy tuần tự theo mode
+    - N > 1 / None : N process (None = số CPU), mỗi process sở hữu một phân vùng
+                     băm của không gian marking (xem Parallel.parallel_reachable);
+                     kết quả giống hệt bản tuần tự; chỉ với mode "numpy"/"packed",
+                     các mode khác -> ValueError
+
+    bound: None (mặc định) là net 1-safe như trên. Số nguyên k >= 1: net k-bounded
+    với ngữ nghĩa P/T có trọng số (bfs_reachable_bounded, chỉ mode "numpy"/"packed",
+    workers = 1); marking đầu tiên vượt k được báo bằng Marking.BoundViolation.
+
+    graph: True thì trả về Graph.ReachabilityGraph (marking đánh id theo thứ tự
+    phát hiện + mọi cạnh (src, transition, dst) trong mảng int32) thay vì tập tuple;
+    chỉ mode "numpy"/"packed", workers = 1, dùng được cùng bound. Ghi cạnh thẳng
+    ra đĩa: gọi Graph.reachability_graph(pn, edges=EdgeListWriter(path)).
+
+    trace: True thì trả về Graph.TraceTable (mỗi marking kèm id marking cha và
+    transition đã bắn, trong mảng int32); table.trace(marking) cho dãy bắn ngắn
+    nhất từ M0, table.deadlocks là các deadlock. Điều kiện như graph.
+
+    Truy vấn dừng sớm (phép gán một phần hoặc deadlock): Query.query_reachable.
     """
+    if mode not in ("numpy", "packed", "vectorized", "external", "bitstate"):
+        raise ValueError(f"Unknown BFS mode: {mode}")
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be >= 1")
+    if graph or trace:
+        if mode not in ("numpy", "packed") or workers != 1:
+            raise ValueError(f"BFS mode '{mode}' with workers={workers} "
+                             "does not support graph or trace")
+        if trace:
+            return trace_table(pn, bound=bound)
+        return reachability_graph(pn, order="bfs", bound=bound)
+    if bound is not None:
+        if mode not in ("numpy", "packed") or workers != 1:
+            raise ValueError(f"BFS mode '{mode}' with workers={workers} only supports 1-safe nets")
+        return bfs_reachable_bounded(pn, bound)
+    if workers != 1 and mode not in ("numpy", "packed"):
+        raise ValueError(f"BFS mode '{mode}' does not support workers={workers}")
+    if mode == "bitstate":
+        return bitstate_reachable(pn, memory_bytes, hashes, order="bfs")
+    if workers is None or workers > 1:
+        return unpack_markings(parallel_reachable(pn, workers), pn.structure.num_places)
+    if mode == "packed":
+        return unpack_markings(bfs_reachable_packed(pn), pn.I.shape[1])
+    if mode == "external":
+        # Import trễ: External dùng expand_frontier của module này
+        from .External import bfs_reachable_external, load_reachable
+        with tempfile.TemporaryDirectory(prefix="pn_external_bfs_") as workdir:
+            _, path = bfs_reachable_external(pn, workdir=workdir)
+            keys = np.array(load_reachable(path))
+        return rows_to_tuples(unpack_rows(keys, pn.structure.num_places))
+    if mode == "vectorized":
+        keys = bfs_reachable_vectorized(pn)
+        return rows_to_tuples(unpack_rows(keys, pn.I.shape[1]))
 
-    I = pn.I          # shape: (|T|, |P|)
-    O = pn.O          # shape: (|T|, |P|)
+    # Pre-set / post-set thưa của từng transition (dùng chung với DFS, BDD)
+    st = pn.structure
     M0 = pn.M0        # np.array, shape: (|P|,)
 
-    num_trans = I.shape[0]     # số transition = số hàng
-    num_places = I.shape[1]    # số place = số cột
+    num_trans = st.num_trans
+    num_places = st.num_places
 
     # Validation
-    if np.any(I < 0) or np.any(O < 0):
-        raise ValueError("Input/Output matrices must be non-negative")
-    if np.any(I > 1) or np.any(O > 1):
-        raise ValueError("For 1-safe Petri nets, arc weights must be 0 or 1")
-    if np.any(M0 < 0) or np.any(M0 > 1):
-        raise ValueError("Initial marking must be 0 or 1 for 1-safe net")
+    check_one_safe(pn)
 
     # Marking ban đầu dưới dạng tuple để đưa vào set
     init = tuple(M0.tolist())
@@ -44,37 +121,32 @@ def bfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
         M = np.array(marking, dtype=int)  # vector kích thước |P|
 
         for t in range(num_trans):
-            pre = I[t, :]    # input requirements (0 hoặc 1)
-            post = O[t, :]   # output production (0 hoặc 1)
+            pre_idx = st.pre_sets[t]      # input places của t
+            post_idx = st.post_sets[t]    # output places của t
 
             # ========================================
             # ENABLING CONDITION (1-safe semantics)
             # ========================================
             
-            # 1. Input places phải có token
-            input_enabled = np.all(M >= pre)
+            # 1. Input places phải có token (chỉ xét các place trong pre-set)
+            input_enabled = np.all(M[pre_idx] >= st.pre_weights[t])
             if not input_enabled:
                 continue
             
             # 2. Output-only places phải rỗng
             # (place là output nhưng KHÔNG phải input)
-            output_only_mask = (post > 0) & (pre == 0)
-            
             # Kiểm tra: tất cả output-only places phải = 0
-            if np.any(M[output_only_mask] > 0):
+            if np.any(M[st.out_only_sets[t]] > 0):
                 continue  # Vi phạm 1-safe pre-condition
             
             # ========================================
             # FIRING TRANSITION
             # ========================================
             
-            # Cách 1: Dùng công thức truyền thống (vẫn đúng)
-            M_new = M - pre + post
-            
-            # Cách 2: Explicit logic cho 1-safe (rõ ràng hơn)
-            # M_new = M.copy()
-            # M_new[pre > 0] = 0   # Remove tokens từ input places
-            # M_new[post > 0] = 1  # Add tokens vào output places
+            # M - pre + post, chỉ cập nhật các place nằm trong pre/post-set
+            M_new = M.copy()
+            M_new[pre_idx] -= st.pre_weights[t]
+            M_new[post_idx] += st.post_weights[t]
             
             # ========================================
             # POST-CONDITION CHECK
@@ -96,6 +168,121 @@ def bfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
     return visited
 
 
+def bfs_reachable_packed(pn: PetriNet) -> Set[int]:
+    """
+    BFS trên packed marking: mỗi marking là một số nguyên (bit i <-> place i),
+    visited là set các int. Dùng unpack_markings() để đổi về tập tuple.
+    """
+    masks = compile_masks(pn)
+    rules = masks.rules()
+
+    init = pack_marking(pn.M0)
+    visited: Set[int] = {init}
+    q = deque([init])
+
+    while q:
+        m = q.popleft()
+        for pre, post, out_only in rules:
+            # Input places có token và output-only places rỗng
+            if m & pre != pre or m & out_only:
+                continue
+            m_new = (m ^ pre) | post
+            if m_new not in visited:
+                visited.add(m_new)
+                q.append(m_new)
+
+    return visited
+
+
+def expand_frontier(frontier: np.ndarray, pre: np.ndarray, post: np.ndarray,
+                    out_only: np.ndarray) -> np.ndarray:
+    """
+    Sinh toàn bộ successor của một frontier 2-D (n_markings, |P|) trong một lần.
+    Enabled của mọi cặp (marking, transition) tính bằng hai phép nhân ma trận:
+    - missing[f, t] = số input place của t đang rỗng  -> phải = 0
+    - blocked[f, t] = số output-only place của t có token -> phải = 0
+    """
+    F = frontier.astype(np.float32)
+    missing = (1.0 - F) @ pre.T
+    blocked = F @ out_only.T
+    f_idx, t_idx = np.nonzero((missing == 0) & (blocked == 0))
+    return frontier[f_idx] - pre[t_idx] + post[t_idx]
+
+
+def bfs_reachable_bounded(pn: PetriNet, bound: int) -> Set[Tuple[int, ...]]:
+    """
+    BFS cho net k-bounded trên marking dạng trường (Marking.FieldMasks): mỗi marking
+    là một số nguyên, mỗi place một trường cố định, enable/fire/kiểm tra cận bằng
+    vài phép cộng trừ trên cả số nguyên. Marking vượt cận đầu tiên (gần M0 nhất)
+    -> BoundViolation kèm transition và marking trước đó.
+    """
+    fields = compile_fields(pn, bound)
+    rules = fields.rules()
+    guard = fields.guard
+
+    init = fields.initial(pn)
+    visited: Set[int] = {init}
+    q = deque([init])
+
+    while q:
+        m = q.popleft()
+        probe = m | guard
+        for t, (pre, post) in enumerate(rules):
+            if (probe - pre) & guard != guard:
+                continue
+            m_new = m - pre + post
+            if m_new in visited:
+                continue
+            place = fields.over_bound(m_new)
+            if place >= 0:
+                raise fields.violation(pn, m_new, place, m, t)
+            visited.add(m_new)
+            q.append(m_new)
+
+    return fields.unpack_all(visited)
+
+
+def bfs_reachable_vectorized(pn: PetriNet) -> np.ndarray:
+    """
+    BFS level-synchronous: mỗi tầng là mảng 2-D các marking, successor được
+    sinh hàng loạt rồi khử trùng lặp bằng sort/unique trên packed key.
+    Trả về mảng key đã sắp xếp của toàn bộ marking reachable
+    (giải nén bằng Marking.unpack_rows).
+    """
+    check_one_safe(pn)
+
+    pre = np.asarray(pn.I, dtype=np.uint8)
+    post = np.asarray(pn.O, dtype=np.uint8)
+    out_only = ((post > 0) & (pre == 0)).astype(np.float32)
+    pre_f = pre.astype(np.float32)
+
+    frontier = np.asarray(pn.M0, dtype=np.uint8).reshape(1, -1)
+    visited = pack_rows(frontier)
+
+    while len(frontier):
+        succ_parts = []
+        for start in range(0, len(frontier), FRONTIER_CHUNK):
+            chunk = frontier[start:start + FRONTIER_CHUNK]
+            succ = expand_frontier(chunk, pre_f, post, out_only).astype(np.uint8)
+            if len(succ):
+                succ_parts.append(succ)
+        if not succ_parts:
+            break
+
+        succ = np.concatenate(succ_parts)
+        keys, first = np.unique(pack_rows(succ), return_index=True)
+        is_new = ~np.isin(keys, visited, assume_unique=True)
+        if not np.any(is_new):
+            break
+
+        # visited và keys[is_new] đều đã sắp xếp, rời nhau -> merge bằng sort ổn định
+        visited = np.concatenate([visited, keys[is_new]])
+        visited.sort(kind="stable")
+        frontier = succ[first[is_new]]
+
+    return visited
+
+
 def bfs_reachable_verbose(pn: PetriNet, debug: bool = False) -> Set[Tuple[int, ...]]:
     """
     Version với debug output để kiểm tra transition firing.
@@ -0,0 +1,140 @@
+from collections import deque
+from .PetriNet import PetriNet
+from .Marking import compile_masks, pack_marking
+
+# Bộ nhớ mặc định cho mảng bit visited (byte) và số hàm băm
+BITSTATE_BYTES = 16 * 1024 * 1024
+BITSTATE_HASHES = 3
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(x: int) -> int:
+    """splitmix64 finalizer: trộn đều các bit của x (64 bit)."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _hash_marking(m: int) -> int:
+    """Băm packed marking dài tùy ý: trộn lần lượt từng word 64 bit qua _mix64."""
+    h = 0
+    while True:
+        h = _mix64(h ^ (m & _MASK64))
+        m >>= 64
+        if not m:
+            return h
+
+
+class BitstateSet:
+    """
+    Tập visited xác suất (Bloom filter / bitstate hashing) trên packed marking:
+    mảng bit cố định memory_bytes byte, k vị trí bit cho mỗi marking theo double
+    hashing h1 + i*h2. Bộ nhớ không đổi dù số trạng thái tăng; đổi lại một marking
+    mới có thể bị coi nhầm là đã thăm (bỏ sót), không bao giờ ngược lại.
+    """
+
+    def __init__(self, memory_bytes: int = BITSTATE_BYTES, hashes: int = BITSTATE_HASHES):
+        if memory_bytes < 1 or hashes < 1:
+            raise ValueError("memory_bytes and hashes must be >= 1")
+        self.bits = bytearray(memory_bytes)
+        self.num_bits = memory_bytes * 8
+        self.hashes = hashes
+        self.bits_set = 0
+        self.count = 0
+        # Kỳ vọng số marking mới bị bỏ sót: mỗi lần chèn ở độ đầy f, một marking
+        # mới khác bị trùng cả k bit với xác suất f^k
+        self.expected_omitted = 0.0
+
+    def add(self, m: int) -> bool:
+        """Chèn m; True nếu m chắc chắn chưa có (ít nhất một bit còn 0)."""
+        # Không dùng hash(m): hash của int là m mod 2^61 - 1 nên các marking lệch
+        # nhau bội của 2^61 - 1 (vd chỉ place 0 và chỉ place 61 có token) trùng mọi bit
+        h1 = _hash_marking(m)
+        h2 = _mix64(h1) | 1
+        fill = self.bits_set / self.num_bits
+        bits = self.bits
+        new = False
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.num_bits
+            byte, bit = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                self.bits_set += 1
+                new = True
+        if new:
+            self.count += 1
+            p = fill ** self.hashes
+            self.expected_omitted += p / (1.0 - p) if p < 1.0 else float("inf")
+        return new
+
+    @property
+    def fill_ratio(self) -> float:
+        return self.bits_set / self.num_bits
+
+    @property
+    def omission_probability(self) -> float:
+        """Xác suất một marking mới bị coi nhầm là đã thăm ở độ đầy hiện tại."""
+        return self.fill_ratio ** self.hashes
+
+
+class BitstateResult:
+    """
+    Kết quả duyệt bitstate. len(result) = số marking đã thăm (cận dưới của số
+    marking reachable thật), để dùng được như tập kết quả của các mode khác.
+    - fill_ratio           : tỉ lệ bit đã bật
+    - omission_probability : xác suất bỏ sót một marking mới ở cuối lần chạy
+    - expected_omitted     : kỳ vọng số marking bị bỏ sót trực tiếp do trùng băm
+                             (chưa tính các marking chỉ đạt được qua chúng)
+    - coverage             : ước lượng states / (states + expected_omitted)
+    """
+
+    def __init__(self, visited: BitstateSet):
+        self.states = visited.count
+        self.memory_bytes = len(visited.bits)
+        self.hashes = visited.hashes
+        self.fill_ratio = visited.fill_ratio
+        self.omission_probability = visited.omission_probability
+        self.expected_omitted = visited.expected_omitted
+        total = self.states + self.expected_omitted
+        self.coverage = self.states / total if total > 0 else 1.0
+
+    def __len__(self) -> int:
+        return self.states
+
+    def __repr__(self) -> str:
+        return (f"BitstateResult(states={self.states}, fill_ratio={self.fill_ratio:.4g}, "
+                f"omission_probability={self.omission_probability:.3g}, "
+                f"expected_omitted={self.expected_omitted:.3g}, coverage={self.coverage:.6f})")
+
+
+def bitstate_reachable(pn: PetriNet, memory_bytes: int = BITSTATE_BYTES,
+                       hashes: int = BITSTATE_HASHES, order: str = "bfs") -> BitstateResult:
+    """
+    Duyệt packed marking (như bfs/dfs_reachable_packed) nhưng visited là BitstateSet
+    kích thước cố định memory_bytes. order = "bfs" (hàng đợi) hoặc "dfs" (ngăn xếp).
+    Chỉ visited có kích thước cố định; hàng đợi/ngăn xếp vẫn tăng theo frontier
+    (BFS) hoặc độ sâu (DFS).
+    """
+    if order not in ("bfs", "dfs"):
+        raise ValueError(f"Unknown bitstate order: {order}")
+    rules = compile_masks(pn).rules()
+    visited = BitstateSet(memory_bytes, hashes)
+
+    init = pack_marking(pn.M0)
+    visited.add(init)
+    pending = deque([init])
+    take = pending.popleft if order == "bfs" else pending.pop
+
+    while pending:
+        m = take()
+        for pre, post, out_only in rules:
+            # Input places có token và output-only places rỗng
+            if m & pre != pre or m & out_only:
+                continue
+            m_new = (m ^ pre) | post
+            if visited.add(m_new):
+                pending.append(m_new)
+
+    return BitstateResult(visited)
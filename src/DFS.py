@@ -1,20 +1,74 @@
 from collections import deque  # deque không bắt buộc cho DFS nhưng cứ giữ import
 import numpy as np
 from .PetriNet import PetriNet
-from typing import Set, Tuple 
+from .Marking import compile_masks, compile_fields, pack_marking, unpack_markings
+from .Parallel import parallel_reachable
+from .Bitstate import BITSTATE_BYTES, BITSTATE_HASHES, BitstateResult, bitstate_reachable
+from .Graph import ReachabilityGraph, reachability_graph
+from .POR import dfs_reachable_stubborn
+from typing import Optional, Set, Tuple, Union
 
-def dfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
+def dfs_reachable(pn: PetriNet, mode: str = "numpy", workers: int = 1,
+                  bound: Optional[int] = None, graph: bool = False,
+                  memory_bytes: int = BITSTATE_BYTES, hashes: int = BITSTATE_HASHES
+                  ) -> Union[Set[Tuple[int, ...]], BitstateResult, ReachabilityGraph]:
     """
     Trả về tập tất cả marking reachable (dưới dạng tuple)
     bằng thuật toán duyệt DFS, với giả thiết net là 1-safe.
+
+    mode:
+    - "numpy"  : duyệt từng marking bằng vector NumPy (bản gốc)
+    - "packed" : marking nén thành số nguyên, enable/fire bằng bitmask
+    - "bitstate" : visited là Bloom filter kích thước cố định, trả về BitstateResult
+                   (xem Bitstate.bitstate_reachable); memory_bytes / hashes là kích
+                   thước mảng bit và số hàm băm
+    - "stubborn" : partial-order reduction (POR.dfs_reachable_stubborn): chỉ bắn một
+                   stubborn set các transition enabled; trả về TẬP CON các marking
+                   reachable nhưng giữ nguyên mọi deadlock. Truy vấn deadlock /
+                   coverability trực tiếp: POR.find_deadlock, POR.check_coverable
+
+    workers: N > 1 (hoặc None = số CPU) thì duyệt song song bằng N process
+    như bfs_reachable(); thứ tự duyệt khi đó không còn là DFS nhưng tập
+    marking trả về giống hệt bản tuần tự. Chỉ với mode "numpy"/"packed";
+    "bitstate"/"stubborn" cùng workers != 1 -> ValueError.
+
+    bound: k >= 1 thì duyệt net k-bounded (dfs_reachable_bounded, như
+    bfs_reachable(bound=k)) thay vì bỏ qua marking có place > 1.
+
+    graph: True thì trả về Graph.ReachabilityGraph theo thứ tự DFS
+    (xem bfs_reachable).
+
+    Truy vấn dừng sớm theo thứ tự DFS: Query.query_reachable(order="dfs").
     """
+    if mode not in ("numpy", "packed", "bitstate", "stubborn"):
+        raise ValueError(f"Unknown DFS mode: {mode}")
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be >= 1")
+    if graph:
+        if mode not in ("numpy", "packed") or workers != 1:
+            raise ValueError(f"DFS mode '{mode}' with workers={workers} does not support graph")
+        return reachability_graph(pn, order="dfs", bound=bound)
+    if bound is not None:
+        if mode not in ("numpy", "packed") or workers != 1:
+            raise ValueError(f"DFS mode '{mode}' with workers={workers} only supports 1-safe nets")
+        return dfs_reachable_bounded(pn, bound)
+    if workers != 1 and mode not in ("numpy", "packed"):
+        raise ValueError(f"DFS mode '{mode}' does not support workers={workers}")
+    if mode == "bitstate":
+        return bitstate_reachable(pn, memory_bytes, hashes, order="dfs")
+    if mode == "stubborn":
+        return unpack_markings(dfs_reachable_stubborn(pn), pn.structure.num_places)
+    if workers is None or workers > 1:
+        return unpack_markings(parallel_reachable(pn, workers), pn.structure.num_places)
+    if mode == "packed":
+        return unpack_markings(dfs_reachable_packed(pn), pn.I.shape[1])
 
-    I = pn.I          # shape: (|T|, |P|)
-    O = pn.O          # shape: (|T|, |P|)
+    # Pre-set / post-set thưa của từng transition (dùng chung với BFS, BDD)
+    st = pn.structure
     M0 = pn.M0        # np.array, shape: (|P|,)
 
-    num_trans = I.shape[0]     # số transition = số hàng
-    num_places = I.shape[1]    # số place = số cột
+    num_trans = st.num_trans
+    num_places = st.num_places
 
     init = tuple(M0.tolist())
 
@@ -28,11 +82,13 @@ def dfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
         M = np.array(marking, dtype=int)
 
         for t in range(num_trans):
-            pre = I[t, :]
-            post = O[t, :]
+            pre_idx = st.pre_sets[t]
+            post_idx = st.post_sets[t]
 
-            if np.all(M >= pre):
-                M_new = M - pre + post
+            if np.all(M[pre_idx] >= st.pre_weights[t]):
+                M_new = M.copy()
+                M_new[pre_idx] -= st.pre_weights[t]
+                M_new[post_idx] += st.post_weights[t]
 
                 # 1-safe
                 if np.any(M_new > 1):
@@ -44,3 +100,59 @@ def dfs_reachable(pn: PetriNet) -> Set[Tuple[int, ...]]:
                     stack.append(new_tuple)
 
     return visited
+
+
+def dfs_reachable_packed(pn: PetriNet) -> Set[int]:
+    """
+    DFS trên packed marking: mỗi marking là một số nguyên (bit i <-> place i),
+    visited là set các int. Dùng unpack_markings() để đổi về tập tuple.
+    """
+    masks = compile_masks(pn)
+    rules = masks.rules()
+
+    init = pack_marking(pn.M0)
+    visited: Set[int] = {init}
+    stack = [init]
+
+    while stack:
+        m = stack.pop()
+        for pre, post, out_only in rules:
+            if m & pre != pre or m & out_only:
+                continue
+            m_new = (m ^ pre) | post
+            if m_new not in visited:
+                visited.add(m_new)
+                stack.append(m_new)
+
+    return visited
+
+
+def dfs_reachable_bounded(pn: PetriNet, bound: int) -> Set[Tuple[int, ...]]:
+    """
+    DFS cho net k-bounded trên marking dạng trường (xem BFS.bfs_reachable_bounded).
+    Marking vượt cận đầu tiên gặp theo thứ tự DFS -> BoundViolation.
+    """
+    fields = compile_fields(pn, bound)
+    rules = fields.rules()
+    guard = fields.guard
+
+    init = fields.initial(pn)
+    visited: Set[int] = {init}
+    stack = [init]
+
+    while stack:
+        m = stack.pop()
+        probe = m | guard
+        for t, (pre, post) in enumerate(rules):
+            if (probe - pre) & guard != guard:
+                continue
+            m_new = m - pre + post
+            if m_new in visited:
+                continue
+            place = fields.over_bound(m_new)
+            if place >= 0:
+                raise fields.violation(pn, m_new, place, m, t)
+            visited.add(m_new)
+            stack.append(m_new)
+
+    return fields.unpack_all(visited)
@@ -0,0 +1,212 @@
+import os
+import tempfile
+import numpy as np
+from .PetriNet import PetriNet
+from .Marking import check_one_safe, pack_rows, unpack_rows
+from .BFS import expand_frontier, FRONTIER_CHUNK
+from typing import Iterator, List, Optional, Tuple
+
+# Số successor key giữ trong RAM trước khi sort rồi ghi ra một run file
+SPILL_BUFFER = 1 << 20
+
+# Số key đọc mỗi lần khi merge / trừ hai file đã sắp xếp
+MERGE_BLOCK = 1 << 18
+
+
+def _open_keys(path: str, dtype: np.dtype) -> np.ndarray:
+    """memmap chỉ đọc một file key thô (np.memmap không mở được file rỗng)."""
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _aligned_blocks(a: np.ndarray, b: np.ndarray,
+                    block: int = MERGE_BLOCK) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Duyệt song song hai mảng key đã sắp xếp, không trùng lặp bên trong mỗi mảng,
+    theo từng block: mỗi cặp (a_blk, b_blk) trả ra chứa đúng mọi key <= một ngưỡng
+    chung, nên key bằng nhau của a và b luôn nằm trong cùng một cặp.
+    Chỉ tối đa 2 * block key nằm trong RAM.
+    """
+    i = j = 0
+    na, nb = len(a), len(b)
+    while i < na and j < nb:
+        a_blk = np.asarray(a[i:i + block])
+        b_blk = np.asarray(b[j:j + block])
+        # Ngưỡng = min(a_blk[-1], b_blk[-1]); so sánh qua searchsorted để dùng được cả key void
+        kb = int(np.searchsorted(b_blk, a_blk[-1:], side="right")[0])
+        if kb < len(b_blk):
+            ka = len(a_blk)
+        else:
+            ka = int(np.searchsorted(a_blk, b_blk[-1:], side="right")[0])
+            kb = len(b_blk)
+        yield a_blk[:ka], b_blk[:kb]
+        i += ka
+        j += kb
+    for start in range(i, na, block):
+        yield np.asarray(a[start:start + block]), b[:0]
+    for start in range(j, nb, block):
+        yield a[:0], np.asarray(b[start:start + block])
+
+
+def _merge_files(path_a: str, path_b: str, out_path: str, dtype: np.dtype) -> int:
+    """Hợp hai file key đã sắp xếp thành out_path (sắp xếp, khử trùng). Trả về số key."""
+    a, b = _open_keys(path_a, dtype), _open_keys(path_b, dtype)
+    count = 0
+    with open(out_path, "wb") as f:
+        for a_blk, b_blk in _aligned_blocks(a, b):
+            merged = np.union1d(a_blk, b_blk) if len(a_blk) and len(b_blk) \
+                else (a_blk if len(a_blk) else b_blk)
+            f.write(np.ascontiguousarray(merged).tobytes())
+            count += len(merged)
+    return count
+
+
+def _subtract_file(path_a: str, path_b: str, out_path: str, dtype: np.dtype) -> int:
+    """Ghi a \\ b (cả hai đã sắp xếp) ra out_path. Trả về số key còn lại."""
+    a, b = _open_keys(path_a, dtype), _open_keys(path_b, dtype)
+    count = 0
+    with open(out_path, "wb") as f:
+        for a_blk, b_blk in _aligned_blocks(a, b):
+            if len(b_blk):
+                a_blk = a_blk[~np.isin(a_blk, b_blk, assume_unique=True)]
+            f.write(np.ascontiguousarray(a_blk).tobytes())
+            count += len(a_blk)
+    return count
+
+
+def _merge_runs(runs: List[str], out_path: str, dtype: np.dtype) -> None:
+    """Gộp các run file đã sắp xếp từng đôi một (mỗi lượt đọc tuần tự) thành out_path."""
+    if not runs:
+        open(out_path, "wb").close()
+        return
+    while len(runs) > 1:
+        merged = []
+        for k in range(0, len(runs) - 1, 2):
+            target = runs[k] + ".m"
+            _merge_files(runs[k], runs[k + 1], target, dtype)
+            os.remove(runs[k])
+            os.remove(runs[k + 1])
+            merged.append(target)
+        if len(runs) % 2:
+            merged.append(runs[-1])
+        runs = merged
+    os.replace(runs[0], out_path)
+
+
+def bfs_reachable_external(pn: PetriNet, output: Optional[str] = None,
+                           workdir: Optional[str] = None,
+                           buffer_states: int = SPILL_BUFFER) -> Tuple[int, str]:
+    """
+    BFS external-memory với delayed duplicate detection:
+    - mỗi tầng (frontier) là một file packed key đã sắp xếp trên đĩa, được đọc
+      qua memmap theo từng chunk FRONTIER_CHUNK marking
+    - successor gom trong buffer tối đa buffer_states key; đầy thì sort/unique
+      rồi ghi ra một run file
+    - cuối tầng: merge các run -> tập ứng viên, trừ đi tập visited trên đĩa bằng
+      một lượt merge -> tầng mới; tầng mới được merge vào visited
+    Trong RAM chỉ có một chunk frontier, buffer successor và vài block merge.
+
+    Trả về (số marking reachable, đường dẫn file .npy chứa toàn bộ packed key đã
+    sắp xếp). Mở lại bằng load_reachable() để truy vấn mà không cần đọc hết vào RAM.
+    workdir mặc định là một thư mục tạm; output mặc định <workdir>/reachable.npy.
+    """
+    check_one_safe(pn)
+    num_places = pn.structure.num_places
+
+    pre = pn.structure.pre.toarray(dtype=np.uint8)
+    post = pn.structure.post.toarray(dtype=np.uint8)
+    out_only = ((post > 0) & (pre == 0)).astype(np.float32)
+    pre_f = pre.astype(np.float32)
+
+    workdir = workdir or tempfile.mkdtemp(prefix="pn_external_bfs_")
+    os.makedirs(workdir, exist_ok=True)
+    output = output or os.path.join(workdir, "reachable.npy")
+
+    init = pack_rows(np.asarray(pn.M0, dtype=np.uint8).reshape(1, -1))
+    dtype = init.dtype
+    visited_path = os.path.join(workdir, "visited.bin")
+    frontier_path = os.path.join(workdir, "layer_0.bin")
+    init.tofile(visited_path)
+    init.tofile(frontier_path)
+
+    layer = 0
+    while True:
+        frontier = _open_keys(frontier_path, dtype)
+        if len(frontier) == 0:
+            break
+
+        # --- Sinh successor, tràn ra đĩa theo run đã sắp xếp ---
+        runs: List[str] = []
+        buffer: List[np.ndarray] = []
+        buffered = 0
+
+        def spill() -> None:
+            nonlocal buffer, buffered
+            if not buffer:
+                return
+            run_path = os.path.join(workdir, f"run_{layer}_{len(runs)}.bin")
+            np.unique(np.concatenate(buffer)).tofile(run_path)
+            runs.append(run_path)
+            buffer, buffered = [], 0
+
+        for start in range(0, len(frontier), FRONTIER_CHUNK):
+            rows = unpack_rows(np.asarray(frontier[start:start + FRONTIER_CHUNK]), num_places)
+            succ = expand_frontier(rows, pre_f, post, out_only).astype(np.uint8)
+            if len(succ):
+                buffer.append(pack_rows(succ))
+                buffered += len(succ)
+                if buffered >= buffer_states:
+                    spill()
+        spill()
+        del frontier
+
+        # --- Delayed duplicate detection: ứng viên \ visited -> tầng mới ---
+        candidates_path = os.path.join(workdir, f"candidates_{layer}.bin")
+        _merge_runs(runs, candidates_path, dtype)
+        next_path = os.path.join(workdir, f"layer_{layer + 1}.bin")
+        _subtract_file(candidates_path, visited_path, next_path, dtype)
+        os.remove(candidates_path)
+
+        merged_path = visited_path + ".new"
+        _merge_files(visited_path, next_path, merged_path, dtype)
+        os.replace(merged_path, visited_path)
+
+        os.remove(frontier_path)
+        frontier_path = next_path
+        layer += 1
+
+    os.remove(frontier_path)
+    count = _write_npy(visited_path, output, dtype)
+    os.remove(visited_path)
+    return count, output
+
+
+def _write_npy(raw_path: str, npy_path: str, dtype: np.dtype) -> int:
+    """Chép file key thô sang định dạng .npy (để np.load(mmap_mode='r') đọc được)."""
+    raw = _open_keys(raw_path, dtype)
+    out = np.lib.format.open_memmap(npy_path, mode="w+", dtype=dtype, shape=(len(raw),))
+    for start in range(0, len(raw), MERGE_BLOCK):
+        out[start:start + MERGE_BLOCK] = raw[start:start + MERGE_BLOCK]
+    out.flush()
+    count = len(raw)
+    del out, raw
+    return count
+
+
+def load_reachable(path: str) -> np.ndarray:
+    """Mở file kết quả của bfs_reachable_external() dạng memmap chỉ đọc."""
+    return np.load(path, mmap_mode="r")
+
+
+def reachable_contains(keys: np.ndarray, marking) -> bool:
+    """Kiểm tra marking (vector 0/1) có trong tập key đã sắp xếp (memmap) hay không."""
+    key = pack_rows(np.asarray(marking, dtype=np.uint8).reshape(1, -1))
+    idx = int(np.searchsorted(keys, key)[0])
+    return idx < len(keys) and bytes(np.asarray(keys[idx:idx + 1]).data) == bytes(key.data)
+
+
+def reachable_markings(keys: np.ndarray, num_places: int, start: int = 0,
+                       stop: Optional[int] = None) -> np.ndarray:
+    """Giải nén keys[start:stop] thành mảng marking uint8 (n, num_places)."""
+    return unpack_rows(np.asarray(keys[start:stop]), num_places)
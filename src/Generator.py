@@ -0,0 +1,226 @@
+import os
+import numpy as np
+from .PetriNet import PetriNet, CSRMatrix
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class NetBuilder:
+    """
+    Dựng PetriNet từng bước theo id: add_place / add_transition(pre, post).
+    Cung được gom dạng COO và chuyển thẳng sang CSR như from_pnml.
+    """
+
+    def __init__(self):
+        self.place_ids: List[str] = []
+        self.trans_ids: List[str] = []
+        self.marking: List[int] = []
+        self._p_index: Dict[str, int] = {}
+        self._arcs: List[Tuple[List[int], List[int]]] = []
+
+    def add_place(self, pid: str, tokens: int = 0) -> int:
+        self._p_index[pid] = len(self.place_ids)
+        self.place_ids.append(pid)
+        self.marking.append(tokens)
+        return self._p_index[pid]
+
+    def add_transition(self, tid: str, pre: List[str], post: List[str]) -> int:
+        self.trans_ids.append(tid)
+        self._arcs.append(([self._p_index[p] for p in pre], [self._p_index[p] for p in post]))
+        return len(self.trans_ids) - 1
+
+    def build(self) -> PetriNet:
+        shape = (len(self.trans_ids), len(self.place_ids))
+        I_rows, I_cols, O_rows, O_cols = [], [], [], []
+        for t, (pre, post) in enumerate(self._arcs):
+            I_rows += [t] * len(pre); I_cols += pre
+            O_rows += [t] * len(post); O_cols += post
+        return PetriNet(
+            place_ids=list(self.place_ids),
+            trans_ids=list(self.trans_ids),
+            place_names=list(self.place_ids),
+            trans_names=list(self.trans_ids),
+            I=CSRMatrix.from_coo(I_rows, I_cols, np.ones(len(I_rows)), shape),
+            O=CSRMatrix.from_coo(O_rows, O_cols, np.ones(len(O_rows)), shape),
+            M0=np.array(self.marking, dtype=int),
+        )
+
+
+# ------------------------------------------------------------------
+# Các họ net 1-safe có số trạng thái biết trước
+# ------------------------------------------------------------------
+
+def philosophers(n: int) -> PetriNet:
+    """
+    n triết gia ăn tối (n >= 2). Triết gia i: think_i -> hasLeft_i -> eat_i -> think_i,
+    lấy fork_i (trái) rồi fork_{i+1} (phải), trả cả hai khi ăn xong.
+    4n place, 3n transition, có deadlock (mọi triết gia cùng cầm đũa trái).
+    """
+    if n < 2:
+        raise ValueError("philosophers requires n >= 2")
+    b = NetBuilder()
+    for i in range(n):
+        b.add_place(f"think{i}", 1)
+        b.add_place(f"hasLeft{i}")
+        b.add_place(f"eat{i}")
+        b.add_place(f"fork{i}", 1)
+    for i in range(n):
+        right = f"fork{(i + 1) % n}"
+        b.add_transition(f"takeLeft{i}", [f"think{i}", f"fork{i}"], [f"hasLeft{i}"])
+        b.add_transition(f"takeRight{i}", [f"hasLeft{i}", right], [f"eat{i}"])
+        b.add_transition(f"release{i}", [f"eat{i}"], [f"think{i}", f"fork{i}", right])
+    return b.build()
+
+
+def philosophers_states(n: int) -> int:
+    """
+    Mỗi triết gia ở một trong {think, hasLeft, eat}; fork_i bị giữ bởi i (hasLeft/eat)
+    hoặc bởi i-1 (eat), không thể cả hai. Số trạng thái = trace(A^n) với A là
+    ma trận chuyển giữa hai triết gia liền nhau (hàng: i-1, cột: i).
+    """
+    A = np.array([[1, 1, 1],
+                  [1, 1, 1],
+                  [1, 0, 0]], dtype=object)
+    return int(np.trace(np.linalg.matrix_power(A, n)))
+
+
+def pipeline(n: int) -> PetriNet:
+    """
+    Pipeline n tầng, mỗi tầng một buffer dung lượng 1 (empty_i / full_i bù nhau):
+    produce: empty_0 -> full_0, move_i: full_i + empty_{i+1} -> empty_i + full_{i+1},
+    consume: full_{n-1} -> empty_{n-1}. Mọi tổ hợp buffer đều đạt được.
+    """
+    if n < 1:
+        raise ValueError("pipeline requires n >= 1")
+    b = NetBuilder()
+    for i in range(n):
+        b.add_place(f"empty{i}", 1)
+        b.add_place(f"full{i}")
+    b.add_transition("produce", ["empty0"], ["full0"])
+    for i in range(n - 1):
+        b.add_transition(f"move{i}", [f"full{i}", f"empty{i + 1}"], [f"empty{i}", f"full{i + 1}"])
+    b.add_transition("consume", [f"full{n - 1}"], [f"empty{n - 1}"])
+    return b.build()
+
+
+def pipeline_states(n: int) -> int:
+    return 2 ** n
+
+
+def token_ring(n: int) -> PetriNet:
+    """
+    Vòng token n trạm. Trạm i: idle_i -> wait_i (request bất kỳ lúc nào),
+    wait_i + tok_i -> cs_i (enter), cs_i -> idle_i + tok_{i+1} (leave);
+    token đi qua trạm đang idle bằng pass_i: tok_i + idle_i -> idle_i + tok_{i+1}.
+    """
+    if n < 1:
+        raise ValueError("token_ring requires n >= 1")
+    b = NetBuilder()
+    for i in range(n):
+        b.add_place(f"idle{i}", 1)
+        b.add_place(f"wait{i}")
+        b.add_place(f"cs{i}")
+        b.add_place(f"tok{i}", 1 if i == 0 else 0)
+    for i in range(n):
+        nxt = f"tok{(i + 1) % n}"
+        b.add_transition(f"request{i}", [f"idle{i}"], [f"wait{i}"])
+        b.add_transition(f"enter{i}", [f"wait{i}", f"tok{i}"], [f"cs{i}"])
+        b.add_transition(f"leave{i}", [f"cs{i}"], [f"idle{i}", nxt])
+        if n > 1:
+            b.add_transition(f"pass{i}", [f"tok{i}", f"idle{i}"], [f"idle{i}", nxt])
+    return b.build()
+
+
+def token_ring_states(n: int) -> int:
+    """
+    Token tự do ở một trong n vị trí, mỗi trạm idle/wait: n * 2^n;
+    hoặc một trạm đang trong cs, các trạm còn lại idle/wait: n * 2^(n-1).
+    """
+    return n * 2 ** n + n * 2 ** (n - 1)
+
+
+def fork_join(n: int, length: int = 1) -> PetriNet:
+    """
+    Fork/join song song: fork: start -> n nhánh, mỗi nhánh là chuỗi length bước
+    (length + 1 vị trí), join: cuối mọi nhánh -> start (lặp lại).
+    """
+    if n < 1 or length < 1:
+        raise ValueError("fork_join requires n >= 1 and length >= 1")
+    b = NetBuilder()
+    b.add_place("start", 1)
+    for i in range(n):
+        for k in range(length + 1):
+            b.add_place(f"b{i}_{k}")
+    b.add_transition("fork", ["start"], [f"b{i}_0" for i in range(n)])
+    for i in range(n):
+        for k in range(length):
+            b.add_transition(f"step{i}_{k}", [f"b{i}_{k}"], [f"b{i}_{k + 1}"])
+    b.add_transition("join", [f"b{i}_{length}" for i in range(n)], ["start"])
+    return b.build()
+
+
+def fork_join_states(n: int, length: int = 1) -> int:
+    return (length + 1) ** n + 1
+
+
+def random_state_machines(n: int, states: int = 4, extra_edges: int = 2,
+                          seed: Optional[int] = 0) -> PetriNet:
+    """
+    n state machine ngẫu nhiên chạy song song (không đồng bộ), mỗi máy có `states`
+    trạng thái cục bộ: một chu trình Hamilton ngẫu nhiên (đảm bảo liên thông mạnh)
+    cộng thêm extra_edges cạnh ngẫu nhiên. Mỗi máy có đúng một token nên net 1-safe.
+    """
+    if n < 1 or states < 2:
+        raise ValueError("random_state_machines requires n >= 1 and states >= 2")
+    rng = np.random.default_rng(seed)
+    b = NetBuilder()
+    for i in range(n):
+        for s in range(states):
+            b.add_place(f"m{i}_s{s}", 1 if s == 0 else 0)
+    for i in range(n):
+        cycle = rng.permutation(states).tolist()
+        edges = {(cycle[k], cycle[(k + 1) % states]) for k in range(states)}
+        for _ in range(extra_edges):
+            src, dst = rng.choice(states, size=2, replace=False).tolist()
+            edges.add((src, dst))
+        for e, (src, dst) in enumerate(sorted(edges)):
+            b.add_transition(f"m{i}_t{e}", [f"m{i}_s{src}"], [f"m{i}_s{dst}"])
+    return b.build()
+
+
+def random_state_machines_states(n: int, states: int = 4, extra_edges: int = 2,
+                                 seed: Optional[int] = 0) -> int:
+    return states ** n
+
+
+FAMILIES: Dict[str, Tuple[Callable[..., PetriNet], Callable[..., int]]] = {
+    "philosophers": (philosophers, philosophers_states),
+    "pipeline": (pipeline, pipeline_states),
+    "token_ring": (token_ring, token_ring_states),
+    "fork_join": (fork_join, fork_join_states),
+    "random_sm": (random_state_machines, random_state_machines_states),
+}
+
+
+def generate(family: str, n: int, **params) -> PetriNet:
+    """Sinh net thuộc họ family với tham số kích thước n."""
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown net family: {family}")
+    return FAMILIES[family][0](n, **params)
+
+
+def expected_states(family: str, n: int, **params) -> int:
+    """Số marking reachable của generate(family, n, **params), tính theo công thức."""
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown net family: {family}")
+    return FAMILIES[family][1](n, **params)
+
+
+def write_family(family: str, sizes: List[int], folder: str, **params) -> List[str]:
+    """Ghi generate(family, n) cho mỗi n ra <folder>/<family>_<n>.pnml, trả về danh sách file."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for n in sizes:
+        path = os.path.join(folder, f"{family}_{n}.pnml")
+        generate(family, n, **params).to_pnml(path, net_id=f"{family}_{n}")
+        paths.append(path)
+    return paths
@@ -0,0 +1,363 @@
+import os
+import numpy as np
+import xml.etree.ElementTree as ET
+from collections import deque
+from .PetriNet import PetriNet, CSRMatrix
+from .Marking import compile_masks, compile_fields, pack_marking, unpack_marking, successors
+from typing import Dict, List, Optional, Set, Tuple
+
+# Số cạnh giữ trong RAM trước khi EdgeListWriter ghi ra đĩa
+GRAPH_CHUNK = 1 << 16
+
+# Số marking tối đa khi xuất DOT / GraphML (định dạng text, chỉ hợp với đồ thị nhỏ)
+GRAPH_TEXT_LIMIT = 10000
+
+
+class EdgeBuffer:
+    """
+    Danh sách cạnh (src, transition, dst) trong ba mảng int32 tăng dần dung lượng
+    (nhân đôi khi đầy): 12 byte / cạnh, không tạo tuple Python cho từng cạnh.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.src = np.empty(capacity, dtype=np.int32)
+        self.trans = np.empty(capacity, dtype=np.int32)
+        self.dst = np.empty(capacity, dtype=np.int32)
+        self.size = 0
+
+    def append(self, src: int, trans: int, dst: int) -> None:
+        if self.size == len(self.src):
+            self._grow()
+        i = self.size
+        self.src[i] = src
+        self.trans[i] = trans
+        self.dst[i] = dst
+        self.size = i + 1
+
+    def _grow(self) -> None:
+        capacity = max(1, 2 * len(self.src))
+        for name in ("src", "trans", "dst"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=np.int32)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(src, trans, dst) — view, không copy."""
+        return self.src[:self.size], self.trans[:self.size], self.dst[:self.size]
+
+    def close(self) -> None:
+        pass
+
+
+class EdgeListWriter(EdgeBuffer):
+    """
+    Ghi cạnh ra file nhị phân ngay trong lúc duyệt: mỗi cạnh 3 số int32 little-endian
+    (src, transition, dst), tối đa chunk cạnh nằm trong RAM. Đọc lại bằng load_edges().
+    """
+
+    def __init__(self, path: str, chunk: int = GRAPH_CHUNK):
+        super().__init__(chunk)
+        self.path = path
+        self.written = 0
+        self._f = open(path, "wb")
+
+    def append(self, src: int, trans: int, dst: int) -> None:
+        if self.size == len(self.src):
+            self.flush()
+        super().append(src, trans, dst)
+
+    def flush(self) -> None:
+        if self.size:
+            block = np.stack(self.arrays(), axis=1).astype("<i4")
+            self._f.write(block.tobytes())
+            self.written += self.size
+            self.size = 0
+
+    def __len__(self) -> int:
+        return self.written + self.size
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+
+def load_edges(path: str) -> np.ndarray:
+    """memmap chỉ đọc file của EdgeListWriter / write_edges(): mảng int32 (n_edges, 3)."""
+    if os.path.getsize(path) == 0:
+        return np.empty((0, 3), dtype=np.int32)
+    return np.memmap(path, dtype="<i4", mode="r").reshape(-1, 3)
+
+
+class ReachabilityGraph:
+    """
+    Đồ thị reachability: marking được đánh id liên tiếp theo thứ tự phát hiện
+    (id 0 = M0), cạnh (src_id, transition, dst_id) nằm trong EdgeBuffer (hoặc đã
+    được ghi thẳng ra file nếu dùng EdgeListWriter).
+    - markings    : packed marking theo id (bit / trường như engine tương ứng)
+    - marking(i)  : tuple số token của marking i
+    - to_csr()    : ma trận kề CSR (n_states, n_states), data = chỉ số transition
+    - write_edges / write_dot / write_graphml : xuất đồ thị
+    """
+
+    def __init__(self, pn: PetriNet, markings: List[int], edges: EdgeBuffer, fields=None):
+        self.place_ids = list(pn.place_ids)
+        self.place_names = list(pn.place_names)
+        self.trans_ids = list(pn.trans_ids)
+        self.num_places = pn.num_places
+        self.markings = markings
+        self.edges = edges
+        self._fields = fields
+
+    @property
+    def num_states(self) -> int:
+        return len(self.markings)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edges)
+
+    def __len__(self) -> int:
+        return self.num_states
+
+    def __repr__(self) -> str:
+        return f"ReachabilityGraph(states={self.num_states}, edges={self.num_edges})"
+
+    def marking(self, i: int) -> Tuple[int, ...]:
+        if self._fields is not None:
+            return self._fields.unpack(self.markings[i])
+        return unpack_marking(self.markings[i], self.num_places)
+
+    def marking_set(self) -> Set[Tuple[int, ...]]:
+        """Tập marking (định dạng kết quả của bfs_reachable)."""
+        return {self.marking(i) for i in range(self.num_states)}
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(src, trans, dst) int32; với EdgeListWriter thì đọc lại từ file (memmap)."""
+        if isinstance(self.edges, EdgeListWriter):
+            self.edges.close()
+            e = load_edges(self.edges.path)
+            return e[:, 0], e[:, 1], e[:, 2]
+        return self.edges.arrays()
+
+    def to_csr(self) -> CSRMatrix:
+        """
+        Ma trận kề: hàng i là các cạnh ra của marking i, indices = dst, data =
+        transition. Giữ cạnh song song (hai transition cùng dẫn tới một marking).
+        """
+        src, trans, dst = self.edge_arrays()
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(self.num_states + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_states), out=indptr[1:])
+        return CSRMatrix(indptr, np.asarray(dst)[order], np.asarray(trans)[order],
+                         (self.num_states, self.num_states))
+
+    def write_edges(self, path: str) -> None:
+        """Ghi cạnh ra file nhị phân (định dạng của EdgeListWriter)."""
+        src, trans, dst = self.edge_arrays()
+        with open(path, "wb") as f:
+            for start in range(0, len(src), GRAPH_CHUNK):
+                stop = start + GRAPH_CHUNK
+                block = np.stack([src[start:stop], trans[start:stop], dst[start:stop]], axis=1)
+                f.write(block.astype("<i4").tobytes())
+
+    def label(self, i: int) -> str:
+        """Nhãn marking: các place có token (kèm số token nếu > 1)."""
+        names = [n or pid for n, pid in zip(self.place_names, self.place_ids)]
+        return ", ".join(name if v == 1 else f"{name}={v}"
+                         for name, v in zip(names, self.marking(i)) if v)
+
+    def _check_text_size(self, limit: Optional[int]) -> None:
+        if limit is not None and self.num_states > limit:
+            raise ValueError(f"Graph has {self.num_states} states, more than limit={limit} "
+                             "for text export; use write_edges() instead")
+
+    def write_dot(self, path: str, limit: Optional[int] = GRAPH_TEXT_LIMIT) -> None:
+        """Xuất Graphviz DOT, ghi từng dòng (không dựng cả chuỗi trong RAM)."""
+        self._check_text_size(limit)
+        src, trans, dst = self.edge_arrays()
+        quote = lambda s: '"' + str(s).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("digraph reachability {\n")
+            for i in range(self.num_states):
+                shape = ", shape=doublecircle" if i == 0 else ""
+                f.write(f"  s{i} [label={quote(self.label(i))}{shape}];\n")
+            for s, t, d in zip(np.asarray(src).tolist(), np.asarray(trans).tolist(),
+                               np.asarray(dst).tolist()):
+                f.write(f"  s{s} -> s{d} [label={quote(self.trans_ids[t])}];\n")
+            f.write("}\n")
+
+    def write_graphml(self, path: str, limit: Optional[int] = GRAPH_TEXT_LIMIT) -> None:
+        """Xuất GraphML (nhãn marking ở node, id transition ở cạnh)."""
+        self._check_text_size(limit)
+        src, trans, dst = self.edge_arrays()
+        root = ET.Element("graphml", xmlns="http://graphml.graphdrawing.org/xmlns")
+        ET.SubElement(root, "key", id="marking", attrib={"for": "node", "attr.name": "marking",
+                                                         "attr.type": "string"})
+        ET.SubElement(root, "key", id="transition", attrib={"for": "edge", "attr.name": "transition",
+                                                            "attr.type": "string"})
+        graph = ET.SubElement(root, "graph", id="reachability", edgedefault="directed")
+        for i in range(self.num_states):
+            node = ET.SubElement(graph, "node", id=f"s{i}")
+            ET.SubElement(node, "data", key="marking").text = self.label(i)
+        for k, (s, t, d) in enumerate(zip(np.asarray(src).tolist(), np.asarray(trans).tolist(),
+                                          np.asarray(dst).tolist())):
+            edge = ET.SubElement(graph, "edge", id=f"e{k}", source=f"s{s}", target=f"s{d}")
+            ET.SubElement(edge, "data", key="transition").text = self.trans_ids[t]
+        tree = ET.ElementTree(root)
+        ET.indent(tree)
+        tree.write(path, encoding="utf-8", xml_declaration=True)
+
+
+def reachability_graph(pn: PetriNet, order: str = "bfs", bound: Optional[int] = None,
+                       edges: Optional[EdgeBuffer] = None) -> ReachabilityGraph:
+    """
+    Duyệt packed marking như bfs/dfs_reachable_packed (bound=None, 1-safe) hoặc
+    bfs/dfs_reachable_bounded (bound=k) nhưng giữ lại mọi cạnh đã bắn.
+    order = "bfs" (hàng đợi) hoặc "dfs" (ngăn xếp). edges: nơi nhận cạnh, mặc định
+    EdgeBuffer trong RAM; truyền EdgeListWriter(path) để ghi thẳng ra đĩa.
+    """
+    if order not in ("bfs", "dfs"):
+        raise ValueError(f"Unknown graph order: {order}")
+    edges = EdgeBuffer() if edges is None else edges
+
+    fields = None
+    if bound is None:
+        rules = compile_masks(pn).rules()
+        init = pack_marking(pn.M0)
+    else:
+        fields = compile_fields(pn, bound)
+        rules = fields.rules()
+        init = fields.initial(pn)
+
+    ids: Dict[int, int] = {init: 0}
+    markings: List[int] = [init]
+    pending = deque([init])
+    take = pending.popleft if order == "bfs" else pending.pop
+
+    while pending:
+        m = take()
+        src = ids[m]
+        for m_new, t in successors(m, rules, fields):
+            dst = ids.get(m_new)
+            if dst is None:
+                if fields is not None:
+                    place = fields.over_bound(m_new)
+                    if place >= 0:
+                        edges.close()
+                        raise fields.violation(pn, m_new, place, m, t)
+                dst = ids[m_new] = len(markings)
+                markings.append(m_new)
+                pending.append(m_new)
+            edges.append(src, t, dst)
+
+    edges.close()
+    return ReachabilityGraph(pn, markings, edges, fields)
+
+
+class TraceTable:
+    """
+    Bảng marking đã phát hiện kèm con trỏ cha, dạng mảng: marking id i (theo thứ tự
+    phát hiện, id 0 = M0) có parent[i] (id marking trước, -1 với M0) và via[i]
+    (transition đã bắn, -1 với M0) trong hai mảng int32 — 8 byte / marking cộng
+    packed marking. Duyệt BFS nên trace(i) là dãy bắn ngắn nhất từ M0.
+    - deadlocks : id các marking không có transition nào enabled
+    """
+
+    def __init__(self, pn: PetriNet, fields=None, capacity: int = 1024):
+        self.place_ids = list(pn.place_ids)
+        self.trans_ids = list(pn.trans_ids)
+        self.num_places = pn.num_places
+        self.markings: List[int] = []
+        self.ids: Dict[int, int] = {}
+        self.parent = np.empty(capacity, dtype=np.int32)
+        self.via = np.empty(capacity, dtype=np.int32)
+        self.deadlocks: List[int] = []
+        self._fields = fields
+
+    def add(self, m: int, parent: int, via: int) -> int:
+        i = len(self.markings)
+        if i == len(self.parent):
+            self.parent = np.concatenate([self.parent, np.empty_like(self.parent)])
+            self.via = np.concatenate([self.via, np.empty_like(self.via)])
+        self.parent[i] = parent
+        self.via[i] = via
+        self.ids[m] = i
+        self.markings.append(m)
+        return i
+
+    def __len__(self) -> int:
+        return len(self.markings)
+
+    def __repr__(self) -> str:
+        return f"TraceTable(states={len(self)}, deadlocks={len(self.deadlocks)})"
+
+    def marking(self, i: int) -> Tuple[int, ...]:
+        if self._fields is not None:
+            return self._fields.unpack(self.markings[i])
+        return unpack_marking(self.markings[i], self.num_places)
+
+    def marking_set(self) -> Set[Tuple[int, ...]]:
+        """Tập marking (định dạng kết quả của bfs_reachable)."""
+        return {self.marking(i) for i in range(len(self))}
+
+    def index(self, marking) -> Optional[int]:
+        """Id của marking (tuple / vector số token), None nếu không reachable."""
+        m = self._fields.pack(marking) if self._fields is not None else pack_marking(marking)
+        return self.ids.get(m)
+
+    def trace(self, target) -> Optional[List[str]]:
+        """
+        Dãy transition id bắn từ M0 tới target (id hoặc marking), None nếu target
+        không reachable. Đi ngược theo parent nên chỉ tốn O(độ dài trace).
+        """
+        i = target if isinstance(target, (int, np.integer)) else self.index(target)
+        if i is None or not 0 <= i < len(self):
+            return None
+        path = []
+        while i > 0:
+            path.append(self.trans_ids[int(self.via[i])])
+            i = int(self.parent[i])
+        return path[::-1]
+
+
+def trace_table(pn: PetriNet, bound: Optional[int] = None) -> TraceTable:
+    """
+    BFS trên packed marking (1-safe, hoặc dạng trường nếu bound=k) ghi lại
+    parent / transition của mỗi marking mới (xem TraceTable).
+    """
+    if bound is None:
+        rules = compile_masks(pn).rules()
+        init = pack_marking(pn.M0)
+        fields = None
+    else:
+        fields = compile_fields(pn, bound)
+        rules = fields.rules()
+        init = fields.initial(pn)
+
+    table = TraceTable(pn, fields)
+    table.add(init, -1, -1)
+    head = 0
+
+    # Hàng đợi BFS chính là bảng marking: id tăng dần theo thứ tự phát hiện
+    while head < len(table):
+        m = table.markings[head]
+        enabled = False
+        for m_new, t in successors(m, rules, fields):
+            enabled = True
+            if m_new in table.ids:
+                continue
+            if fields is not None:
+                place = fields.over_bound(m_new)
+                if place >= 0:
+                    raise fields.violation(pn, m_new, place, m, t)
+            table.add(m_new, head, t)
+        if not enabled:
+            table.deadlocks.append(head)
+        head += 1
+
+    return table
@@ -0,0 +1,259 @@
+import numpy as np
+from .PetriNet import PetriNet
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class TransitionMasks:
+    """
+    Bitmask của từng transition cho net 1-safe, bit i <-> place i.
+
+    Marking 1-safe được lưu thành MỘT số nguyên (packed marking),
+    nên enable/fire chỉ còn vài phép toán bit:
+    - enabled : (m & pre) == pre  và  (m & out_only) == 0
+    - fire    : (m ^ pre) | post   (pre ⊆ m nên XOR = xóa token input)
+    """
+
+    def __init__(self, pre: List[int], post: List[int], num_places: int):
+        self.pre = pre
+        self.post = post
+        # Output-only places: là output nhưng KHÔNG phải input
+        self.out_only = [po & ~pr for pr, po in zip(pre, post)]
+        self.num_places = num_places
+        self.num_trans = len(pre)
+
+    def rules(self) -> List[Tuple[int, int, int]]:
+        """Danh sách (pre, post, out_only) để duyệt nhanh trong vòng lặp."""
+        return list(zip(self.pre, self.post, self.out_only))
+
+
+def compile_masks(pn: PetriNet) -> TransitionMasks:
+    """
+    Tính trước bitmask pre/post/output-only cho mỗi transition từ pn.I, pn.O.
+    Chỉ hỗ trợ net 1-safe (trọng số cung và M0 là 0 hoặc 1).
+    """
+    check_one_safe(pn)
+    st = pn.structure
+
+    pre = [index_mask(idx) for idx in st.pre_sets]
+    post = [index_mask(idx) for idx in st.post_sets]
+    return TransitionMasks(pre, post, st.num_places)
+
+
+def check_one_safe(pn: PetriNet) -> None:
+    """
+    Kiểm tra trọng số cung và M0 là 0/1 (điều kiện của các engine 1-safe).
+    Chỉ đọc các cung khác 0 trong pn.structure, không cần ma trận dense.
+    """
+    st = pn.structure
+    M0 = np.asarray(pn.M0)
+    if st.min_weight() < 0:
+        raise ValueError("Input/Output matrices must be non-negative")
+    if st.max_weight() > 1:
+        raise ValueError("For 1-safe Petri nets, arc weights must be 0 or 1")
+    if np.any(M0 < 0) or np.any(M0 > 1):
+        raise ValueError("Initial marking must be 0 or 1 for 1-safe net")
+
+
+class BoundViolation(ValueError):
+    """
+    Marking reachable đầu tiên có place vượt cận k đã khai báo (bound).
+    - marking     : tuple số token của marking vi phạm
+    - place       : id place vượt cận
+    - transition  : id transition vừa bắn để tới marking đó (None nếu chính M0 vi phạm)
+    - predecessor : marking ngay trước khi bắn (None nếu chính M0 vi phạm)
+    """
+
+    def __init__(self, marking: Tuple[int, ...], place: str, bound: int,
+                 transition: Optional[str] = None, predecessor: Optional[Tuple[int, ...]] = None):
+        self.marking = marking
+        self.place = place
+        self.bound = bound
+        self.transition = transition
+        self.predecessor = predecessor
+        where = "initial marking" if transition is None else f"marking reached by firing {transition}"
+        super().__init__(f"Place {place} exceeds bound {bound} in {where}: {marking}")
+
+
+class FieldMasks:
+    """
+    Marking k-bounded nén thành MỘT số nguyên (SWAR): place i chiếm trường width bit
+    bắt đầu từ bit i * width, gồm value_bits bit giá trị và 1 bit guard cao nhất
+    (luôn 0 trong một marking). value_bits đủ chứa k + trọng số cung lớn nhất nên
+    cộng / trừ trọng số không bao giờ tràn sang trường bên cạnh:
+    - enabled  : ((m | guard) - pre) & guard == guard   (mọi trường >= trọng số pre)
+    - fire     : m - pre + post
+    - vượt cận : (m + excess) & guard != 0, excess = 2^value_bits - 1 - k ở mỗi trường
+    Ngữ nghĩa P/T thông thường (không có điều kiện output rỗng như bản 1-safe).
+    """
+
+    def __init__(self, pre: List[int], post: List[int], num_places: int, bound: int,
+                 max_weight: int):
+        self.num_places = num_places
+        self.num_trans = len(pre)
+        self.bound = bound
+        self.value_bits = max(1, (bound + max_weight).bit_length())
+        self.width = self.value_bits + 1
+        ones = sum(1 << (i * self.width) for i in range(num_places))
+        self.guard = ones << self.value_bits
+        self.excess = ((1 << self.value_bits) - 1 - bound) * ones
+        self.pre = pre
+        self.post = post
+
+    def rules(self) -> List[Tuple[int, int]]:
+        """Danh sách (pre, post) dạng trường để duyệt nhanh trong vòng lặp."""
+        return list(zip(self.pre, self.post))
+
+    def pack(self, M: Iterable[int]) -> int:
+        m = 0
+        for i, v in enumerate(np.asarray(M).tolist()):
+            m |= int(v) << (i * self.width)
+        return m
+
+    def unpack(self, m: int) -> Tuple[int, ...]:
+        field = (1 << self.value_bits) - 1
+        return tuple((m >> (i * self.width)) & field for i in range(self.num_places))
+
+    def unpack_all(self, markings: Iterable[int]) -> Set[Tuple[int, ...]]:
+        """Như unpack_markings() cho marking dạng trường (giải nén bằng NumPy)."""
+        markings = list(markings)
+        if not markings:
+            return set()
+        nbits = self.width * self.num_places
+        nbytes = max(1, (nbits + 7) // 8)
+        raw = np.frombuffer(b"".join(m.to_bytes(nbytes, "little") for m in markings),
+                            dtype=np.uint8).reshape(len(markings), nbytes)
+        bits = np.unpackbits(raw, axis=1, bitorder="little")[:, :nbits]
+        bits = bits.reshape(len(markings), self.num_places, self.width)[:, :, :self.value_bits]
+        return rows_to_tuples(bits.astype(np.int64) @ (1 << np.arange(self.value_bits)))
+
+    def initial(self, pn: PetriNet) -> int:
+        """M0 dạng trường; M0 vượt cận -> BoundViolation."""
+        M0 = np.asarray(pn.M0)
+        over = np.flatnonzero(M0 > self.bound)
+        if len(over):
+            raise BoundViolation(tuple(M0.tolist()), pn.place_ids[over[0]], self.bound)
+        return self.pack(M0)
+
+    def over_bound(self, m: int) -> int:
+        """Chỉ số place đầu tiên vượt cận trong m, -1 nếu không có."""
+        over = (m + self.excess) & self.guard
+        if not over:
+            return -1
+        return ((over & -over).bit_length() - 1) // self.width
+
+    def violation(self, pn: PetriNet, m: int, place: int, predecessor: Optional[int] = None,
+                  transition: Optional[int] = None) -> BoundViolation:
+        return BoundViolation(
+            self.unpack(m), pn.place_ids[place], self.bound,
+            None if transition is None else pn.trans_ids[transition],
+            None if predecessor is None else self.unpack(predecessor),
+        )
+
+
+def compile_fields(pn: PetriNet, bound: int) -> FieldMasks:
+    """
+    Tính trước trường pre/post (có trọng số) của mỗi transition cho net k-bounded.
+    M0 vượt cận được báo bằng BoundViolation khi bắt đầu duyệt.
+    """
+    st = pn.structure
+    if bound < 1:
+        raise ValueError("Bound must be >= 1")
+    if st.min_weight() < 0 or np.any(np.asarray(pn.M0) < 0):
+        raise ValueError("Arc weights and initial marking must be non-negative")
+
+    fields = FieldMasks([], [], st.num_places, bound, st.max_weight())
+
+    def weighted(idx, weights) -> int:
+        m = 0
+        for i, w in zip(idx.tolist(), weights.tolist()):
+            m |= int(w) << (i * fields.width)
+        return m
+
+    fields.pre = [weighted(i, w) for i, w in zip(st.pre_sets, st.pre_weights)]
+    fields.post = [weighted(i, w) for i, w in zip(st.post_sets, st.post_weights)]
+    fields.num_trans = st.num_trans
+    return fields
+
+
+def successors(m: int, rules, fields: Optional[FieldMasks] = None) -> Iterator[Tuple[int, int]]:
+    """
+    Các cặp (marking mới, chỉ số transition) của mọi transition enabled tại packed
+    marking m. rules là TransitionMasks.rules() (1-safe: pre ⊆ m, out_only ∩ m = ∅,
+    bắn (m ^ pre) | post) hoặc FieldMasks.rules() khi truyền fields (dạng trường:
+    không trường nào mượn bit guard, bắn m - pre + post; chưa kiểm tra cận k).
+    """
+    if fields is None:
+        return (((m ^ pre) | post, t) for t, (pre, post, out_only) in enumerate(rules)
+                if m & pre == pre and not m & out_only)
+    guard = fields.guard
+    probe = m | guard
+    return ((m - pre + post, t) for t, (pre, post) in enumerate(rules)
+            if (probe - pre) & guard == guard)
+
+
+def index_mask(indices: Iterable[int]) -> int:
+    """Bitmask có bit i bật với mọi place i trong indices."""
+    m = 0
+    for i in np.asarray(indices).tolist():
+        m |= 1 << i
+    return m
+
+
+def pack_marking(M: Iterable[int]) -> int:
+    """Nén marking 0/1 thành số nguyên: place i -> bit i."""
+    m = 0
+    for i, v in enumerate(np.asarray(M).tolist()):
+        if v:
+            m |= 1 << i
+    return m
+
+
+def unpack_marking(m: int, num_places: int) -> Tuple[int, ...]:
+    """Giải nén số nguyên về tuple marking như các engine cũ trả về."""
+    return tuple((m >> i) & 1 for i in range(num_places))
+
+
+def unpack_markings(markings: Iterable[int], num_places: int) -> Set[Tuple[int, ...]]:
+    """
+    Chuyển tập packed marking về Set[Tuple[int, ...]] (định dạng kết quả cũ).
+    Với <= 64 place thì giải nén bằng NumPy cho nhanh.
+    """
+    if num_places > 64:
+        return {unpack_marking(m, num_places) for m in markings}
+
+    arr = np.fromiter(markings, dtype=np.uint64)
+    return rows_to_tuples(unpack_rows(arr, num_places))
+
+
+# ------------------------------------------------------------------
+# Packed rows: nén cả mảng marking 2-D (n_markings, n_places) một lần
+# ------------------------------------------------------------------
+
+def pack_rows(rows: np.ndarray) -> np.ndarray:
+    """
+    Nén mỗi hàng 0/1 thành một key để sort/unique/isin bằng NumPy.
+    - <= 64 place: key uint64, trùng giá trị với pack_marking() (bit i <-> place i)
+    - > 64 place : key kiểu void (chuỗi byte), chỉ dùng để so sánh bằng/sắp xếp
+    """
+    packed = np.packbits(np.asarray(rows, dtype=np.uint8), axis=1, bitorder="little")
+    nbytes = packed.shape[1]
+    if nbytes <= 8:
+        if nbytes < 8:
+            packed = np.pad(packed, ((0, 0), (0, 8 - nbytes)))
+        return np.ascontiguousarray(packed).view("<u8").ravel().astype(np.uint64)
+    return np.ascontiguousarray(packed).view(np.dtype((np.void, nbytes))).ravel()
+
+
+def unpack_rows(keys: np.ndarray, num_places: int) -> np.ndarray:
+    """Ngược lại pack_rows(): trả về mảng uint8 shape (n_markings, n_places)."""
+    keys = np.ascontiguousarray(keys)
+    if keys.dtype == np.uint64:
+        raw = keys.astype("<u8").view(np.uint8).reshape(-1, 8)
+    else:
+        raw = keys.view(np.uint8).reshape(len(keys), -1)
+    return np.unpackbits(raw, axis=1, bitorder="little")[:, :num_places]
+
+
+def rows_to_tuples(rows: np.ndarray) -> Set[Tuple[int, ...]]:
+    """Chuyển mảng marking 2-D về Set[Tuple[int, ...]] (định dạng kết quả cũ)."""
+    return set(map(tuple, np.asarray(rows, dtype=np.int64).tolist()))
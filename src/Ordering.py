@@ -0,0 +1,109 @@
+from collections import deque
+import numpy as np
+from typing import List
+from .PetriNet import NetStructure
+
+
+ORDER_METHODS = ("pnml", "force", "cuthill-mckee", "rcm")
+
+
+def _hyperedges(st: NetStructure) -> List[np.ndarray]:
+    """
+    Mỗi transition là một siêu cạnh nối các place nó ảnh hưởng (input ∪ output),
+    lấy thẳng từ st.affected_sets (pn.structure).
+    """
+    return [e for e in st.affected_sets if len(e) > 0]
+
+
+def total_span(order: List[int], st: NetStructure) -> int:
+    """
+    Tổng độ trải (max vị trí - min vị trí) của các transition theo thứ tự place.
+    Span càng nhỏ thì các biến liên quan càng gần nhau trong BDD.
+    """
+    pos = np.empty(len(order), dtype=np.int64)
+    pos[np.asarray(order, dtype=np.int64)] = np.arange(len(order))
+    return int(sum(pos[e].max() - pos[e].min() for e in _hyperedges(st)))
+
+
+def force_order(st: NetStructure, max_iter: int = 50) -> List[int]:
+    """
+    FORCE (Aloul, Markov, Sakallah): lặp lại
+    - trọng tâm mỗi transition = trung bình vị trí các place của nó
+    - vị trí mới của place = trung bình trọng tâm các transition chứa nó
+    rồi sắp xếp lại place theo vị trí mới, đến khi thứ tự không đổi nữa.
+    Giữ thứ tự có tổng span nhỏ nhất.
+    """
+    num_places = st.num_places
+    edges = _hyperedges(st)
+    order = list(range(num_places))
+    if not edges:
+        return order
+
+    best, best_span = order, total_span(order, st)
+    pos = np.arange(num_places, dtype=np.float64)
+
+    for _ in range(max_iter):
+        acc = np.zeros(num_places)
+        cnt = np.zeros(num_places)
+        for e in edges:
+            cog = pos[e].mean()
+            acc[e] += cog
+            cnt[e] += 1
+        # Place không thuộc transition nào giữ nguyên vị trí
+        new_pos = np.where(cnt > 0, acc / np.maximum(cnt, 1), pos)
+        new_order = [int(p) for p in np.lexsort((pos, new_pos))]
+        if new_order == order:
+            break
+        order = new_order
+        pos = np.empty(num_places)
+        pos[order] = np.arange(num_places)
+
+        span = total_span(order, st)
+        if span < best_span:
+            best, best_span = order, span
+
+    return best
+
+
+def cuthill_mckee_order(st: NetStructure, reverse: bool = False) -> List[int]:
+    """
+    Cuthill–McKee trên đồ thị place: hai place kề nhau nếu cùng thuộc một transition.
+    BFS từ place bậc nhỏ nhất của mỗi thành phần liên thông, thăm hàng xóm theo
+    bậc tăng dần, nhằm giảm bandwidth. reverse=True cho Reverse Cuthill–McKee.
+    """
+    num_places = st.num_places
+    adj = [set() for _ in range(num_places)]
+    for e in _hyperedges(st):
+        for p in e:
+            adj[p].update(int(q) for q in e if q != p)
+    degree = [len(a) for a in adj]
+
+    order: List[int] = []
+    seen = [False] * num_places
+    for start in sorted(range(num_places), key=lambda p: (degree[p], p)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        q = deque([start])
+        while q:
+            p = q.popleft()
+            order.append(p)
+            for nb in sorted(adj[p], key=lambda n: (degree[n], n)):
+                if not seen[nb]:
+                    seen[nb] = True
+                    q.append(nb)
+
+    return order[::-1] if reverse else order
+
+
+def place_order(st: NetStructure, method: str = "pnml") -> List[int]:
+    """Trả về hoán vị chỉ số place theo phương pháp sắp thứ tự tĩnh đã chọn."""
+    if method == "pnml":
+        return list(range(st.num_places))
+    if method == "force":
+        return force_order(st)
+    if method == "cuthill-mckee":
+        return cuthill_mckee_order(st)
+    if method == "rcm":
+        return cuthill_mckee_order(st, reverse=True)
+    raise ValueError(f"Unknown variable ordering: {method}")
@@ -0,0 +1,221 @@
+from .PetriNet import PetriNet
+from .Marking import compile_masks, pack_marking, unpack_marking
+from typing import List, Optional, Set, Tuple, Union
+
+
+class StubbornSets:
+    """
+    Strong stubborn set cho net 1-safe (ngữ nghĩa: enabled khi pre có token và
+    output-only rỗng). Tính từ pn.structure một lần:
+    - dependents[t] : transition có tập place ảnh hưởng (input ∪ output) giao với t.
+                      Transition ngoài tập này không thể enable/disable t và giao
+                      hoán với t (chúng sửa các place rời nhau).
+    - producers[p]  : transition đưa token VÀO p (p ∈ post \\ pre)
+    - consumers[p]  : transition lấy token KHỎI p (p ∈ pre \\ post)
+
+    Tập S = stubborn_set(m, seed) là bao đóng của seed theo:
+    - D1: t enabled ∈ S  -> mọi dependents[t] ∈ S
+    - D2: t disabled ∈ S -> một tập enabling cần thiết ∈ S: producers của một input
+          place đang rỗng, hoặc consumers của một output-only place đang có token
+    Nếu seed chứa một transition enabled thì chỉ bắn S ∩ enabled vẫn giữ nguyên
+    mọi deadlock reachable.
+    """
+
+    def __init__(self, pn: PetriNet):
+        st = pn.structure
+        masks = compile_masks(pn)
+        self.num_trans = st.num_trans
+        self.num_places = st.num_places
+        self.rules = masks.rules()
+
+        touching: List[List[int]] = [[] for _ in range(st.num_places)]
+        for t, aff in enumerate(st.affected_sets):
+            for p in aff.tolist():
+                touching[p].append(t)
+        self.dependents: List[Set[int]] = [
+            {u for p in st.affected_sets[t].tolist() for u in touching[p]} - {t}
+            for t in range(st.num_trans)
+        ]
+
+        self.producers: List[List[int]] = [[] for _ in range(st.num_places)]
+        self.consumers: List[List[int]] = [[] for _ in range(st.num_places)]
+        for t in range(st.num_trans):
+            pre, post = set(st.pre_sets[t].tolist()), set(st.post_sets[t].tolist())
+            for p in post - pre:
+                self.producers[p].append(t)
+            for p in pre - post:
+                self.consumers[p].append(t)
+
+    def enabled(self, m: int) -> List[int]:
+        return [t for t, (pre, _, out_only) in enumerate(self.rules)
+                if m & pre == pre and not m & out_only]
+
+    def _enabling_set(self, m: int, t: int, S: Set[int]) -> List[int]:
+        """D2: chọn lý do t bị disable cần ít transition mới nhất."""
+        pre, _, out_only = self.rules[t]
+        best = None
+        missing = pre & ~m       # input place đang rỗng
+        blocked = out_only & m   # output-only place đang có token
+        for mask, candidates in ((missing, self.producers), (blocked, self.consumers)):
+            while mask:
+                low = mask & -mask
+                p = low.bit_length() - 1
+                mask ^= low
+                option = [u for u in candidates[p] if u not in S]
+                if best is None or len(option) < len(best):
+                    best = option
+                    if not best:
+                        return best
+        return best or []
+
+    def stubborn_set(self, m: int, seed: List[int], enabled: Set[int]) -> Set[int]:
+        S: Set[int] = set()
+        work = list(seed)
+        while work:
+            t = work.pop()
+            if t in S:
+                continue
+            S.add(t)
+            if t in enabled:
+                work.extend(u for u in self.dependents[t] if u not in S)
+            else:
+                work.extend(self._enabling_set(m, t, S))
+        return S
+
+    def reduced_enabled(self, m: int, enabled: List[int],
+                        goal_seed: Optional[List[int]] = None) -> List[int]:
+        """
+        Transition cần bắn ở m. Không có goal_seed (deadlock): thử lần lượt từng
+        transition enabled làm seed, giữ S có ít transition enabled nhất.
+        Có goal_seed (up-set của mục tiêu): S = bao đóng của goal_seed; S không chứa
+        transition enabled nghĩa là mục tiêu không còn đạt được từ m.
+        """
+        en = set(enabled)
+        if goal_seed is not None:
+            return sorted(self.stubborn_set(m, goal_seed, en) & en)
+        best = enabled
+        for t in enabled:
+            chosen = self.stubborn_set(m, [t], en) & en
+            if len(chosen) < len(best):
+                best = sorted(chosen)
+                if len(best) == 1:
+                    break
+        return list(best)
+
+
+class PORResult:
+    """
+    Kết quả truy vấn (có rút gọn, hoặc on-the-fly ở Query / SymbolicReachability.query):
+    - found   : tìm thấy deadlock / marking phủ place / khớp phép gán mục tiêu
+    - marking : marking đó (tuple số token) hoặc None
+    - trace   : dãy transition id từ M0 tới marking đó
+    - states  : số marking đã thăm
+    - fired   : số lần bắn transition (bản BDD: số lần tính image của một tầng)
+    """
+
+    def __init__(self, found: bool, marking: Optional[Tuple[int, ...]], trace: List[str],
+                 states: int, fired: int):
+        self.found = found
+        self.marking = marking
+        self.trace = trace
+        self.states = states
+        self.fired = fired
+
+    def __bool__(self) -> bool:
+        return self.found
+
+    def __repr__(self) -> str:
+        return (f"PORResult(found={self.found}, states={self.states}, fired={self.fired}, "
+                f"trace_len={len(self.trace)})")
+
+
+def _search(pn: PetriNet, por: StubbornSets, is_goal, goal_seed: Optional[List[int]],
+            reduction: bool, proviso: bool, visited: Optional[Set[int]] = None) -> PORResult:
+    """
+    DFS dùng chung cho các truy vấn. Mỗi frame: (marking, transition sẽ bắn, vị trí).
+    proviso: nếu một successor rút gọn nằm trên stack (đóng chu trình) thì bắn
+    đủ mọi transition enabled, tránh bỏ quên transition mãi mãi (ignoring problem).
+    """
+    init = pack_marking(pn.M0)
+    visited = set() if visited is None else visited
+    visited.add(init)
+    on_stack = {init}
+    fired = 0
+
+    def expand(m: int) -> Tuple[List[int], bool]:
+        enabled = por.enabled(m)
+        if not reduction or not enabled:
+            return enabled, not enabled
+        chosen = por.reduced_enabled(m, enabled, goal_seed)
+        if proviso and len(chosen) < len(enabled):
+            for t in chosen:
+                pre, post, _ = por.rules[t]
+                if ((m ^ pre) | post) in on_stack:
+                    return enabled, False
+        return chosen, False
+
+    def result(found: bool, m: Optional[int]) -> PORResult:
+        trace = [pn.trans_ids[t] for _, _, _, t in stack[1:]] if found else []
+        marking = unpack_marking(m, por.num_places) if m is not None else None
+        return PORResult(found, marking, trace, len(visited), fired)
+
+    first, dead = expand(init)
+    stack = [(init, first, 0, -1)]
+    if is_goal(init, dead):
+        return result(True, init)
+
+    while stack:
+        m, to_fire, i, via = stack[-1]
+        if i == len(to_fire):
+            stack.pop()
+            on_stack.discard(m)
+            continue
+        stack[-1] = (m, to_fire, i + 1, via)
+        pre, post, _ = por.rules[to_fire[i]]
+        m_new = (m ^ pre) | post
+        fired += 1
+        if m_new in visited:
+            continue
+        visited.add(m_new)
+        succ, dead = expand(m_new)
+        stack.append((m_new, succ, 0, to_fire[i]))
+        on_stack.add(m_new)
+        if is_goal(m_new, dead):
+            return result(True, m_new)
+
+    return result(False, None)
+
+
+def find_deadlock(pn: PetriNet, reduction: bool = True) -> PORResult:
+    """
+    Tìm một marking reachable không có transition nào enabled.
+    reduction=True: chỉ bắn S ∩ enabled với S là strong stubborn set (giữ nguyên
+    tập deadlock reachable), thường thăm ít marking hơn theo cấp số mũ với các
+    thành phần song song độc lập. reduction=False: DFS đầy đủ để đối chiếu.
+    """
+    por = StubbornSets(pn)
+    return _search(pn, por, lambda m, dead: dead, None, reduction, proviso=False)
+
+
+def check_coverable(pn: PetriNet, place: Union[int, str], reduction: bool = True) -> PORResult:
+    """
+    Có marking reachable nào đặt token vào place (chỉ số, id hoặc tên) không.
+    Với rút gọn: S luôn chứa producers của place (mọi đường tới mục tiêu phải bắn
+    một trong số đó), cộng stack proviso để transition cần thiết không bị hoãn mãi.
+    """
+    p = pn.place_index(place)
+    por = StubbornSets(pn)
+    bit = 1 << p
+    seed = por.producers[p]
+    return _search(pn, por, lambda m, dead: bool(m & bit), seed, reduction, proviso=True)
+
+
+def dfs_reachable_stubborn(pn: PetriNet) -> Set[int]:
+    """
+    Không gian trạng thái rút gọn (packed marking) giữ nguyên mọi deadlock:
+    tập con của tập reachable đầy đủ, chứa mọi deadlock reachable.
+    """
+    por = StubbornSets(pn)
+    visited: Set[int] = set()
+    _search(pn, por, lambda m, dead: False, None, True, proviso=False, visited=visited)
+    return visited
@@ -0,0 +1,148 @@
+import multiprocessing as mp
+import os
+import queue
+from collections import deque
+from .PetriNet import PetriNet
+from .Marking import compile_masks, pack_marking
+from typing import Dict, List, Set, Tuple
+
+# Số marking gom lại trước khi gửi sang worker khác (giảm số lần put/get qua pipe)
+PARALLEL_BATCH = 4096
+
+# Thời gian chờ inbox trước khi kiểm tra lại điều kiện dừng (giây)
+_POLL_INTERVAL = 0.02
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def owner_of(m: int, workers: int) -> int:
+    """
+    Worker sở hữu packed marking m. hash() của int là tất định (không bị
+    PYTHONHASHSEED ảnh hưởng) nên mọi process tính ra cùng một chủ;
+    nhân với hằng số Fibonacci để các bit thấp giống nhau không dồn về một worker.
+    """
+    return (((hash(m) & _MASK64) * _GOLDEN & _MASK64) >> 32) % workers
+
+
+def default_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def _worker(wid: int, workers: int, rules: List[Tuple[int, int, int]],
+            inboxes, pending, results) -> None:
+    """
+    Vòng lặp của một worker: nhận batch marking thuộc phân vùng của mình,
+    bỏ qua marking đã thăm, duyệt tiếp cục bộ các successor cùng phân vùng
+    và gom successor của phân vùng khác thành batch gửi cho worker chủ.
+
+    pending = số batch đã gửi nhưng chưa xử lý xong. Batch con luôn được đếm
+    TRƯỚC khi batch cha được trừ đi, nên pending == 0 nghĩa là mọi hàng đợi
+    đã cạn và không còn worker nào đang sinh marking mới -> dừng.
+    """
+    inbox = inboxes[wid]
+    visited: Set[int] = set()
+    outgoing: Dict[int, List[int]] = {w: [] for w in range(workers) if w != wid}
+
+    def send(dest: int, batch: List[int]) -> None:
+        with pending.get_lock():
+            pending.value += 1
+        inboxes[dest].put(batch)
+
+    try:
+        while True:
+            try:
+                batch = inbox.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if pending.value == 0:
+                    break
+                continue
+
+            local = deque(m for m in batch if m not in visited)
+            while local:
+                m = local.popleft()
+                if m in visited:
+                    continue
+                visited.add(m)
+                for pre, post, out_only in rules:
+                    # Input places có token và output-only places rỗng
+                    if m & pre != pre or m & out_only:
+                        continue
+                    m_new = (m ^ pre) | post
+                    dest = owner_of(m_new, workers)
+                    if dest == wid:
+                        if m_new not in visited:
+                            local.append(m_new)
+                        continue
+                    buf = outgoing[dest]
+                    buf.append(m_new)
+                    if len(buf) >= PARALLEL_BATCH:
+                        send(dest, buf)
+                        outgoing[dest] = []
+
+            # Gửi nốt phần còn lại rồi mới đánh dấu batch hiện tại đã xong
+            for dest, buf in outgoing.items():
+                if buf:
+                    send(dest, buf)
+                    outgoing[dest] = []
+            with pending.get_lock():
+                pending.value -= 1
+
+        results.put((wid, list(visited)))
+    except BaseException as e:
+        results.put((wid, e))
+        raise
+
+
+def parallel_reachable(pn: PetriNet, workers: int = None) -> Set[int]:
+    """
+    Duyệt không gian trạng thái bằng nhiều process, mỗi worker sở hữu một
+    phân vùng băm của tập packed marking (owner_of) và giữ visited riêng.
+    Successor được chuyển tới worker chủ theo batch qua multiprocessing.Queue;
+    kết thúc khi mọi hàng đợi cạn. Trả về tập packed marking giống hệt
+    bfs_reachable_packed() (dùng unpack_markings() để đổi về tuple).
+    """
+    workers = default_workers() if workers is None else int(workers)
+    if workers < 1:
+        raise ValueError("workers must be >= 1")
+
+    masks = compile_masks(pn)
+    rules = masks.rules()
+    init = pack_marking(pn.M0)
+
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    pending = ctx.Value("q", 1)  # batch đầu tiên chứa M0
+    inboxes[owner_of(init, workers)].put([init])
+
+    procs = [
+        ctx.Process(target=_worker, args=(wid, workers, rules, inboxes, pending, results),
+                    daemon=True)
+        for wid in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    reachable: Set[int] = set()
+    try:
+        # Lấy kết quả TRƯỚC khi join: worker chỉ thoát được khi results đã được đọc
+        for _ in range(workers):
+            while True:
+                try:
+                    wid, part = results.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    dead = [p for p in procs if p.exitcode not in (None, 0)]
+                    if dead:
+                        raise RuntimeError(f"Worker exited with code {dead[0].exitcode}")
+            if isinstance(part, BaseException):
+                raise RuntimeError(f"Worker {wid} failed: {part!r}") from part
+            reachable.update(part)
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+    return reachable
@@ -1,16 +1,169 @@
+import hashlib
+import os
+import tempfile
+import warnings
+import zipfile
+from contextlib import contextmanager
 import numpy as np
 import xml.etree.ElementTree as ET
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
+
+# Tăng khi thay đổi cấu trúc file cache .npz
+CACHE_FORMAT_VERSION = 1
+CACHE_SUFFIX = ".cache.npz"
+
+class CSRMatrix:
+    """
+    Ma trận thưa dạng CSR, dùng cho I/O có dạng (n_trans, n_places):
+    hàng t chứa các place nối với transition t (indices) và trọng số cung (data).
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+
+    @classmethod
+    def from_coo(cls, rows, cols, vals, shape: Tuple[int, int]) -> "CSRMatrix":
+        """Dựng CSR từ bộ ba (hàng, cột, giá trị); các phần tử trùng vị trí được cộng dồn."""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        vals = np.asarray(vals, dtype=np.int64)
+        n_rows, n_cols = shape
+
+        if len(rows):
+            # Gộp các cung trùng (cùng hàng, cùng cột) bằng cách cộng trọng số
+            key = rows * max(n_cols, 1) + cols
+            uniq, inverse = np.unique(key, return_inverse=True)
+            vals = np.bincount(inverse, weights=vals).astype(np.int64)
+            rows = uniq // max(n_cols, 1)
+            cols = uniq % max(n_cols, 1)
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, cols.astype(np.int32), vals.astype(np.int32), shape)
+
+    @classmethod
+    def from_dense(cls, A: np.ndarray) -> "CSRMatrix":
+        A = np.asarray(A)
+        rows, cols = np.nonzero(A)
+        return cls.from_coo(rows, cols, A[rows, cols], A.shape)
+
+    @property
+    def nnz(self) -> int:
+        return int(len(self.indices))
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(chỉ số cột, giá trị) khác 0 của hàng i."""
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def toarray(self, dtype=int) -> np.ndarray:
+        A = np.zeros(self.shape, dtype=dtype)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        A[rows, self.indices] = self.data
+        return A
+
+    def transpose(self) -> "CSRMatrix":
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        return CSRMatrix.from_coo(self.indices, rows, self.data, (self.shape[1], self.shape[0]))
+
+    def rows(self) -> List[np.ndarray]:
+        """Danh sách chỉ số cột của từng hàng (view, không copy)."""
+        return [self.indices[self.indptr[i]:self.indptr[i + 1]] for i in range(self.shape[0])]
+
+    def with_row(self, i: int, cols, vals) -> "CSRMatrix":
+        """CSR mới với hàng i thay bằng (cols, vals); i == số hàng thì thêm một hàng ở cuối."""
+        n_rows, n_cols = self.shape
+        if not 0 <= i <= n_rows:
+            raise ValueError(f"Row index out of range: {i}")
+        rows = np.repeat(np.arange(n_rows), np.diff(self.indptr))
+        keep = rows != i
+        cols = np.asarray(cols, dtype=np.int64)
+        return CSRMatrix.from_coo(
+            np.concatenate([rows[keep], np.full(len(cols), i, dtype=np.int64)]),
+            np.concatenate([self.indices[keep], cols]),
+            np.concatenate([self.data[keep], np.asarray(vals, dtype=np.int64)]),
+            (max(n_rows, i + 1), n_cols),
+        )
+
+
+class NetStructure:
+    """
+    Cấu trúc thưa dùng chung cho cả ba engine (BFS, DFS, BDD), tính một lần từ
+    I_sparse / O_sparse và được cache trong pn.structure:
+    - pre / post           : CSR (n_trans, n_places) — pre-set / post-set của transition
+    - pre_sets, post_sets  : chỉ số place input / output của từng transition
+    - pre_weights, post_weights : trọng số cung tương ứng
+    - out_only_sets        : output không phải input (phải rỗng trước khi bắn, 1-safe)
+    - affected_sets        : input ∪ output (các place transition làm thay đổi/đọc)
+    - place_in / place_out : CSR (n_places, n_trans) — transition đưa token vào /
+                             lấy token ra khỏi từng place
+    - producers, consumers : danh sách tương ứng theo từng place
+    """
+
+    def __init__(self, pre: CSRMatrix, post: CSRMatrix):
+        self.pre = pre
+        self.post = post
+        self.num_trans, self.num_places = pre.shape
+
+        self.pre_sets = pre.rows()
+        self.post_sets = post.rows()
+        self.pre_weights = [pre.data[pre.indptr[t]:pre.indptr[t + 1]] for t in range(self.num_trans)]
+        self.post_weights = [post.data[post.indptr[t]:post.indptr[t + 1]] for t in range(self.num_trans)]
+        self.out_only_sets = [np.setdiff1d(po, pr, assume_unique=True).astype(np.int32)
+                              for pr, po in zip(self.pre_sets, self.post_sets)]
+        self.affected_sets = [np.union1d(pr, po).astype(np.int32)
+                              for pr, po in zip(self.pre_sets, self.post_sets)]
+
+        self.place_in = post.transpose()
+        self.place_out = pre.transpose()
+        self.producers = self.place_in.rows()
+        self.consumers = self.place_out.rows()
+
+    def max_weight(self) -> int:
+        """Trọng số cung lớn nhất (0 nếu net không có cung)."""
+        weights = np.concatenate([self.pre.data, self.post.data])
+        return int(weights.max()) if len(weights) else 0
+
+    def min_weight(self) -> int:
+        weights = np.concatenate([self.pre.data, self.post.data])
+        return int(weights.min()) if len(weights) else 0
+
+
+def _local(tag: str) -> str:
+    """Bỏ namespace: '{uri}place' -> 'place'."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem, child: str) -> Optional[str]:
+    """Text của <child><text>...</text></child> ngay dưới elem (vd name, initialMarking)."""
+    for c in elem:
+        if _local(c.tag) == child:
+            for t in c:
+                if _local(t.tag) == "text" and t.text is not None:
+                    return t.text.strip()
+            return None
+    return None
+
 
 class PetriNet:
+    """
+    I, O có dạng (n_trans, n_places). Có thể truyền vào mảng dense hoặc CSRMatrix;
+    dạng còn lại chỉ được tạo khi có người truy cập (pn.I / pn.O dense,
+    pn.I_sparse / pn.O_sparse thưa). pn.structure là NetStructure dùng chung,
+    được tính lại khi gán I hoặc O mới.
+    """
+
     def __init__(
         self,
         place_ids: List[str],
         trans_ids: List[str],
         place_names: List[Optional[str]],
         trans_names: List[Optional[str]],
-        I: np.ndarray,   
-        O: np.ndarray, 
+        I: Union[np.ndarray, CSRMatrix],
+        O: Union[np.ndarray, CSRMatrix],
         M0: np.ndarray
     ):
         self.place_ids = place_ids
@@ -21,76 +174,175 @@ class PetriNet:
         self.O = O
         self.M0 = M0
 
+    # ---- I / O: dense được materialize lazily từ CSR (và ngược lại) ----
+
+    @property
+    def I(self) -> np.ndarray:
+        if self._I is None:
+            self._I = self._I_sparse.toarray()
+        return self._I
+
+    @I.setter
+    def I(self, value):
+        if isinstance(value, CSRMatrix):
+            self._I, self._I_sparse = None, value
+        else:
+            self._I, self._I_sparse = value, None
+        self._structure = None
+
+    @property
+    def O(self) -> np.ndarray:
+        if self._O is None:
+            self._O = self._O_sparse.toarray()
+        return self._O
+
+    @O.setter
+    def O(self, value):
+        if isinstance(value, CSRMatrix):
+            self._O, self._O_sparse = None, value
+        else:
+            self._O, self._O_sparse = value, None
+        self._structure = None
+
+    @property
+    def I_sparse(self) -> CSRMatrix:
+        if self._I_sparse is None:
+            self._I_sparse = CSRMatrix.from_dense(self._I)
+        return self._I_sparse
+
+    @property
+    def O_sparse(self) -> CSRMatrix:
+        if self._O_sparse is None:
+            self._O_sparse = CSRMatrix.from_dense(self._O)
+        return self._O_sparse
+
+    @property
+    def structure(self) -> NetStructure:
+        if self._structure is None:
+            self._structure = NetStructure(self.I_sparse, self.O_sparse)
+        return self._structure
+
+    @property
+    def num_places(self) -> int:
+        return len(self.place_ids)
+
+    @property
+    def num_trans(self) -> int:
+        return len(self.trans_ids)
+
+    def place_index(self, place: Union[int, str]) -> int:
+        """Chỉ số place từ chỉ số, id hoặc tên."""
+        if isinstance(place, (int, np.integer)):
+            if not 0 <= place < self.num_places:
+                raise ValueError(f"Place index out of range: {place}")
+            return int(place)
+        if place in self.place_ids:
+            return self.place_ids.index(place)
+        if place in self.place_names:
+            return self.place_names.index(place)
+        raise ValueError(f"Unknown place: {place}")
+
+    def trans_index(self, transition: Union[int, str]) -> int:
+        """Chỉ số transition từ chỉ số, id hoặc tên."""
+        if isinstance(transition, (int, np.integer)):
+            if not 0 <= transition < self.num_trans:
+                raise ValueError(f"Transition index out of range: {transition}")
+            return int(transition)
+        if transition in self.trans_ids:
+            return self.trans_ids.index(transition)
+        if transition in self.trans_names:
+            return self.trans_names.index(transition)
+        raise ValueError(f"Unknown transition: {transition}")
+
+    def _arc_row(self, places) -> Tuple[List[int], List[int]]:
+        """places: iterable place (trọng số 1) hoặc dict {place: trọng số}."""
+        weights = places if isinstance(places, dict) else {p: 1 for p in places}
+        cols = [self.place_index(p) for p in weights]
+        vals = [int(w) for w in weights.values()]
+        if any(w < 1 for w in vals):
+            raise ValueError("Arc weights must be >= 1")
+        return cols, vals
+
+    def set_arcs(self, transition: Union[int, str], inputs=None, outputs=None) -> int:
+        """
+        Thay toàn bộ cung vào (inputs) và/hoặc ra (outputs) của một transition;
+        None giữ nguyên phía đó. Chỉ hàng t của I_sparse / O_sparse được dựng lại.
+        Trả về chỉ số transition.
+        """
+        t = self.trans_index(transition)
+        if inputs is not None:
+            self.I = self.I_sparse.with_row(t, *self._arc_row(inputs))
+        if outputs is not None:
+            self.O = self.O_sparse.with_row(t, *self._arc_row(outputs))
+        return t
+
+    def add_transition(self, trans_id: str, inputs=(), outputs=(),
+                       name: Optional[str] = None) -> int:
+        """Thêm transition mới (cung như set_arcs). Trả về chỉ số của nó."""
+        if trans_id in self.trans_ids:
+            raise ValueError(f"Duplicate transition id: {trans_id}")
+        t = self.num_trans
+        I = self.I_sparse.with_row(t, *self._arc_row(inputs))
+        O = self.O_sparse.with_row(t, *self._arc_row(outputs))
+        self.trans_ids = list(self.trans_ids) + [trans_id]
+        self.trans_names = list(self.trans_names) + [name]
+        self.I, self.O = I, O
+        return t
+
     @classmethod
     def from_pnml(cls, filename: str) -> "PetriNet":
-        ## TODO read file PNML
-        tree = ET.parse(filename)
-        root = tree.getroot()
-
-        # Lấy namespace (nếu có)
-        if root.tag.startswith("{"):
-            ns_uri = root.tag[root.tag.find("{") + 1 : root.tag.find("}")]
-            ns = {"pnml": ns_uri}
-            place_tag = ".//pnml:place"
-            trans_tag = ".//pnml:transition"
-            arc_tag   = ".//pnml:arc"
-            name_tag  = "pnml:name/pnml:text"
-            mark_tag  = "pnml:initialMarking/pnml:text"
-            ins_tag   = "pnml:inscription/pnml:text"
-        else:
-            ns = {}
-            place_tag = ".//place"
-            trans_tag = ".//transition"
-            arc_tag   = ".//arc"
-            name_tag  = "name/text"
-            mark_tag  = "initialMarking/text"
-            ins_tag   = "inscription/text"
-
-        # Đọc place: GIỮ THỨ TỰ XUẤT HIỆN TRONG PNML
+        """
+        Đọc PNML bằng iterparse trong MỘT lượt: mỗi place/transition/arc được xử lý
+        ngay khi gặp thẻ đóng rồi clear() để giải phóng bộ nhớ. Cung được gom dạng
+        COO rồi dựng thẳng CSR cho I, O (không cấp phát ma trận dense).
+        """
         places_info = {}          # place_id -> (name, init_mark)
         place_ids: List[str] = [] # theo thứ tự trong file
-        for p in root.findall(place_tag, ns):
-            pid = p.get("id")
-            if pid is None:
-                continue
-            place_ids.append(pid)
-
-            # name (nếu có)
-            name_elem = p.find(name_tag, ns)
-            pname = (
-                name_elem.text.strip()
-                if name_elem is not None and name_elem.text is not None
-                else None
-            )
+        trans_info = {}           # trans_id -> name
+        trans_ids: List[str] = [] # theo thứ tự trong file
+        arcs: List[Tuple[str, str, int]] = []  # (source, target, weight)
 
-            # initial marking (nếu có)
-            mark_elem = p.find(mark_tag, ns)
-            if mark_elem is not None and mark_elem.text is not None:
-                try:
-                    m0_val = int(mark_elem.text.strip())
-                except ValueError:
-                    m0_val = 0
-            else:
-                m0_val = 0
+        for _, elem in ET.iterparse(filename, events=("end",)):
+            tag = _local(elem.tag)
 
-            places_info[pid] = (pname, m0_val)
+            # Đọc place: GIỮ THỨ TỰ XUẤT HIỆN TRONG PNML
+            if tag == "place":
+                pid = elem.get("id")
+                if pid is not None:
+                    place_ids.append(pid)
+                    # initial marking (nếu có)
+                    mark_text = _child_text(elem, "initialMarking")
+                    try:
+                        m0_val = int(mark_text) if mark_text is not None else 0
+                    except ValueError:
+                        m0_val = 0
+                    places_info[pid] = (_child_text(elem, "name"), m0_val)
+                elem.clear()
 
-        # Đọc transition: GIỮ THỨ TỰ XUẤT HIỆN TRONG PNML
-        trans_info = {}           # trans_id -> name
-        trans_ids: List[str] = [] # theo thứ tự trong file
-        for t in root.findall(trans_tag, ns):
-            tid = t.get("id")
-            if tid is None:
-                continue
-            trans_ids.append(tid)
-
-            name_elem = t.find(name_tag, ns)
-            tname = (
-                name_elem.text.strip()
-                if name_elem is not None and name_elem.text is not None
-                else None
-            )
-            trans_info[tid] = tname
+            # Đọc transition: GIỮ THỨ TỰ XUẤT HIỆN TRONG PNML
+            elif tag == "transition":
+                tid = elem.get("id")
+                if tid is not None:
+                    trans_ids.append(tid)
+                    trans_info[tid] = _child_text(elem, "name")
+                elem.clear()
+
+            # Arc: chỉ ghi lại, id có thể xuất hiện trước place/transition tương ứng
+            elif tag == "arc":
+                src = elem.get("source")
+                tgt = elem.get("target")
+                if src is not None and tgt is not None:
+                    # weight (nếu có inscription), mặc định = 1
+                    ins_text = _child_text(elem, "inscription")
+                    try:
+                        w = int(ins_text) if ins_text is not None else 1
+                    except ValueError:
+                        w = 1
+                    arcs.append((src, tgt, w))
+                elem.clear()
+
+            elif tag == "page":
+                elem.clear()
 
         n_places = len(place_ids)
         n_trans  = len(trans_ids)
@@ -99,45 +351,21 @@ class PetriNet:
         p_index = {pid: i for i, pid in enumerate(place_ids)}
         t_index = {tid: j for j, tid in enumerate(trans_ids)}
 
-        # CHÚ Ý: I, O có dạng (n_trans, n_places)
-        I = np.zeros((n_trans, n_places), dtype=int)
-        O = np.zeros((n_trans, n_places), dtype=int)
-        M0 = np.zeros(n_places, dtype=int)
-
-        # Gán initial marking theo thứ tự place_ids
-        for i, pid in enumerate(place_ids):
-            _, m0_val = places_info[pid]
-            M0[i] = m0_val
-
-        # Đọc arcs để xây I và O
-        for arc in root.findall(arc_tag, ns):
-            src = arc.get("source")
-            tgt = arc.get("target")
-            if src is None or tgt is None:
-                continue
-
-            # weight (nếu có inscription), mặc định = 1
-            w = 1
-            ins_elem = arc.find(ins_tag, ns)
-            if ins_elem is not None and ins_elem.text is not None:
-                try:
-                    w = int(ins_elem.text.strip())
-                except ValueError:
-                    w = 1
-
+        # CHÚ Ý: I, O có dạng (n_trans, n_places), lưu dạng COO rồi chuyển CSR
+        I_rows, I_cols, I_vals = [], [], []
+        O_rows, O_cols, O_vals = [], [], []
+        for src, tgt, w in arcs:
             # place -> transition : input arc
             if src in p_index and tgt in t_index:
-                p = p_index[src]
-                t = t_index[tgt]
-                I[t, p] += w
-
+                I_rows.append(t_index[tgt]); I_cols.append(p_index[src]); I_vals.append(w)
             # transition -> place : output arc
             elif src in t_index and tgt in p_index:
-                t = t_index[src]
-                p = p_index[tgt]
-                O[t, p] += w
+                O_rows.append(t_index[src]); O_cols.append(p_index[tgt]); O_vals.append(w)
             # Trường hợp khác (place->place, trans->trans) bỏ qua
 
+        # Gán initial marking theo thứ tự place_ids
+        M0 = np.array([places_info[pid][1] for pid in place_ids], dtype=int)
+
         place_names = [places_info[pid][0] for pid in place_ids]
         trans_names = [trans_info[tid] for tid in trans_ids]
 
@@ -146,11 +374,170 @@ class PetriNet:
             trans_ids=trans_ids,
             place_names=place_names,
             trans_names=trans_names,
-            I=I,
-            O=O,
+            I=CSRMatrix.from_coo(I_rows, I_cols, I_vals, (n_trans, n_places)),
+            O=CSRMatrix.from_coo(O_rows, O_cols, O_vals, (n_trans, n_places)),
             M0=M0
         )
-        pass
+
+    def to_pnml(self, filename: str, net_id: str = "net", net_name: Optional[str] = None) -> None:
+        """
+        Ghi net ra PNML (P/T net, PNML 2009) đọc lại được bằng from_pnml:
+        place/transition theo đúng thứ tự chỉ số, cung lấy từ I_sparse / O_sparse,
+        inscription chỉ ghi khi trọng số khác 1.
+        """
+        ns = "http://www.pnml.org/version-2009/grammar/pnml"
+        ET.register_namespace("", ns)
+
+        def sub(parent, tag, **attrs):
+            return ET.SubElement(parent, f"{{{ns}}}{tag}", attrs)
+
+        def labelled(parent, tag, text):
+            sub(sub(parent, tag), "text").text = str(text)
+
+        root = ET.Element(f"{{{ns}}}pnml")
+        net = sub(root, "net", id=net_id, type="http://www.pnml.org/version-2009/grammar/ptnet")
+        labelled(net, "name", net_name or net_id)
+        page = sub(net, "page", id="page1")
+
+        for pid, name, m0 in zip(self.place_ids, self.place_names, np.asarray(self.M0).tolist()):
+            place = sub(page, "place", id=pid)
+            if name:
+                labelled(place, "name", name)
+            labelled(place, "initialMarking", m0)
+        for tid, name in zip(self.trans_ids, self.trans_names):
+            trans = sub(page, "transition", id=tid)
+            if name:
+                labelled(trans, "name", name)
+
+        arc_no = 0
+        for matrix, to_place in ((self.I_sparse, False), (self.O_sparse, True)):
+            for t in range(matrix.shape[0]):
+                cols, vals = matrix.row(t)
+                for p, w in zip(cols.tolist(), vals.tolist()):
+                    src, tgt = (self.trans_ids[t], self.place_ids[p]) if to_place \
+                        else (self.place_ids[p], self.trans_ids[t])
+                    arc = sub(page, "arc", id=f"a{arc_no}", source=src, target=tgt)
+                    if w != 1:
+                        labelled(arc, "inscription", w)
+                    arc_no += 1
+
+        tree = ET.ElementTree(root)
+        ET.indent(tree)
+        tree.write(filename, encoding="utf-8", xml_declaration=True)
+
+    def content_hash(self) -> str:
+        """
+        sha256 của nội dung net (ids, I/O, M0), không phụ thuộc file nguồn hay
+        tên hiển thị. Dùng làm khóa cho kết quả phân tích lưu trên đĩa.
+        """
+        h = hashlib.sha256()
+        for ids in (self.place_ids, self.trans_ids):
+            h.update("\x00".join(ids).encode("utf-8"))
+            h.update(b"\x01")
+        for matrix in (self.I_sparse, self.O_sparse):
+            for arr in (matrix.indptr, matrix.indices, matrix.data):
+                h.update(np.ascontiguousarray(arr, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(self.M0, dtype=np.int64).tobytes())
+        return h.hexdigest()
+
+    # ---- Cache nhị phân (.npz) để khỏi parse lại XML ----
+
+    def save_npz(self, path: str, source: Optional[str] = None) -> None:
+        """
+        Lưu net ra file .npz không nén: ids, names, I/O dạng CSR và M0.
+        Nếu có source (file PNML gốc) thì lưu kèm sha256, mtime, size để kiểm tra cache.
+        """
+        def names_arrays(names):
+            return (np.array([n or "" for n in names], dtype=str),
+                    np.array([n is None for n in names], dtype=bool))
+
+        place_names, place_name_none = names_arrays(self.place_names)
+        trans_names, trans_name_none = names_arrays(self.trans_names)
+        I, O = self.I_sparse, self.O_sparse
+        meta = {}
+        if source is not None:
+            st = os.stat(source)
+            meta = dict(
+                source_sha256=np.array(_file_sha256(source)),
+                source_mtime_ns=np.array(st.st_mtime_ns, dtype=np.int64),
+                source_size=np.array(st.st_size, dtype=np.int64),
+            )
+
+        with atomic_write(path) as f:
+            np.savez(
+                f,
+                format_version=np.array(CACHE_FORMAT_VERSION),
+                place_ids=np.array(self.place_ids, dtype=str),
+                trans_ids=np.array(self.trans_ids, dtype=str),
+                place_names=place_names, place_name_none=place_name_none,
+                trans_names=trans_names, trans_name_none=trans_name_none,
+                I_indptr=I.indptr, I_indices=I.indices, I_data=I.data,
+                O_indptr=O.indptr, O_indices=O.indices, O_data=O.data,
+                M0=np.asarray(self.M0),
+                **meta,
+            )
+
+    @classmethod
+    def load_npz(cls, path: str) -> "PetriNet":
+        """Đọc net từ file .npz do save_npz() ghi (không dùng pickle)."""
+        with np.load(path, allow_pickle=False) as z:
+            return cls._from_npz(z)
+
+    @classmethod
+    def _from_npz(cls, z) -> "PetriNet":
+        def names_list(names, none_mask):
+            return [None if none else str(n) for n, none in zip(names, none_mask)]
+
+        place_ids = [str(x) for x in z["place_ids"]]
+        trans_ids = [str(x) for x in z["trans_ids"]]
+        shape = (len(trans_ids), len(place_ids))
+        return cls(
+            place_ids=place_ids,
+            trans_ids=trans_ids,
+            place_names=names_list(z["place_names"], z["place_name_none"]),
+            trans_names=names_list(z["trans_names"], z["trans_name_none"]),
+            I=CSRMatrix(z["I_indptr"], z["I_indices"], z["I_data"], shape),
+            O=CSRMatrix(z["O_indptr"], z["O_indices"], z["O_data"], shape),
+            M0=z["M0"].astype(int),
+        )
+
+    @classmethod
+    def from_pnml_cached(cls, filename: str, cache_path: Optional[str] = None) -> "PetriNet":
+        """
+        Như from_pnml nhưng dùng cache nhị phân đặt cạnh file nguồn
+        (mặc định <filename>.cache.npz).
+        - mtime và size của file nguồn khớp với cache -> đọc cache, không cần hash
+        - không khớp nhưng sha256 nội dung vẫn khớp -> đọc cache, ghi lại metadata
+        - còn lại -> parse PNML và ghi cache mới
+        Không ghi được cache (thư mục chỉ đọc, ...) thì chỉ cảnh báo.
+        """
+        cache_path = cache_path or filename + CACHE_SUFFIX
+        st = os.stat(filename)
+
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path, allow_pickle=False) as z:
+                    if int(z["format_version"]) == CACHE_FORMAT_VERSION and "source_sha256" in z:
+                        same_stat = (int(z["source_mtime_ns"]) == st.st_mtime_ns
+                                     and int(z["source_size"]) == st.st_size)
+                        if same_stat:
+                            return cls._from_npz(z)
+                        if str(z["source_sha256"]) == _file_sha256(filename):
+                            pn = cls._from_npz(z)
+                            pn._write_cache(cache_path, filename)
+                            return pn
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+                pass  # cache hỏng, ghi dở hoặc khác định dạng -> parse lại
+
+        pn = cls.from_pnml(filename)
+        pn._write_cache(cache_path, filename)
+        return pn
+
+    def _write_cache(self, cache_path: str, source: str) -> None:
+        try:
+            self.save_npz(cache_path, source=source)
+        except OSError as e:
+            warnings.warn(f"Cannot write Petri net cache {cache_path}: {e}")
 
     def __str__(self) -> str:
         s = []
@@ -167,3 +554,30 @@ class PetriNet:
         return "\n".join(s)
 
 
+@contextmanager
+def atomic_write(path: str):
+    """
+    Mở file tạm cùng thư mục với path để ghi (nhị phân), thành công thì os.replace
+    sang path: tiến trình đọc song song hoặc lần ghi bị ngắt giữa chừng không bao
+    giờ để lại file cache cụt. Lỗi thì xóa file tạm và ném tiếp.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _file_sha256(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
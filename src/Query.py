@@ -0,0 +1,107 @@
+from collections import deque
+from .PetriNet import PetriNet
+from .Marking import compile_masks, compile_fields, pack_marking, successors
+from .Graph import TraceTable
+from .POR import PORResult
+from typing import Any, Dict, Optional, Tuple, Union
+
+# Target đặc biệt: marking không có transition nào enabled
+DEADLOCK = "deadlock"
+
+
+def compile_target(pn: PetriNet, partial: Dict[Any, int],
+                   fields=None) -> Optional[Tuple[int, int]]:
+    """
+    Phép gán một phần {place: số token} (place là chỉ số, id hoặc tên) thành cặp
+    (mask, value) trên packed marking: m khớp khi m & mask == value. Dạng trường
+    nếu truyền fields (net k-bounded). None nếu không marking nào khớp được
+    (số token ngoài 0/1 với net 1-safe, ngoài 0..k với net k-bounded).
+    """
+    mask = value = 0
+    for place, v in partial.items():
+        p = pn.place_index(place)
+        v = int(v)
+        if fields is None:
+            if v not in (0, 1):
+                return None
+            mask |= 1 << p
+            value |= v << p
+        else:
+            if not 0 <= v <= fields.bound:
+                return None
+            shift = p * fields.width
+            mask |= ((1 << fields.value_bits) - 1) << shift
+            value |= v << shift
+    return mask, value
+
+
+def query_reachable(pn: PetriNet, target: Union[str, Dict[Any, int]], order: str = "bfs",
+                    bound: Optional[int] = None) -> PORResult:
+    """
+    Truy vấn on-the-fly: duyệt packed marking (1-safe, hoặc dạng trường nếu bound=k)
+    và dừng ngay khi gặp marking thỏa target, không tính hết tập reachable.
+    - target : phép gán một phần {place: số token}, hoặc DEADLOCK ("deadlock")
+    - order  : "bfs" (trace ngắn nhất) hoặc "dfs" (thường tới mục tiêu sâu nhanh hơn)
+    Phép gán được kiểm tra ngay khi marking được sinh ra; deadlock được biết khi
+    mở rộng marking đó. Trả về POR.PORResult (found, marking, trace, states, fired).
+    Bản BDD: SymbolicReachability.query.
+    """
+    if order not in ("bfs", "dfs"):
+        raise ValueError(f"Unknown query order: {order}")
+    deadlock = target == DEADLOCK
+    if isinstance(target, str) and not deadlock:
+        raise ValueError(f"Unknown query target: {target}")
+
+    if bound is None:
+        fields = None
+        rules = compile_masks(pn).rules()
+        init = pack_marking(pn.M0)
+    else:
+        fields = compile_fields(pn, bound)
+        rules = fields.rules()
+        init = fields.initial(pn)
+
+    table = TraceTable(pn, fields)
+    fired = 0
+
+    def result(i: Optional[int]) -> PORResult:
+        if i is None:
+            return PORResult(False, None, [], len(table), fired)
+        return PORResult(True, table.marking(i), table.trace(i), len(table), fired)
+
+    if deadlock:
+        mask = value = None
+    else:
+        compiled = compile_target(pn, target, fields)
+        if compiled is None:
+            return result(None)
+        mask, value = compiled
+
+    table.add(init, -1, -1)
+    if mask is not None and init & mask == value:
+        return result(0)
+
+    # Hàng đợi / ngăn xếp chứa id trong bảng; parent[] cho trace khi tìm thấy
+    pending = deque([0])
+    take = pending.popleft if order == "bfs" else pending.pop
+    while pending:
+        i = take()
+        m = table.markings[i]
+        enabled = False
+        for m_new, t in successors(m, rules, fields):
+            enabled = True
+            fired += 1
+            if m_new in table.ids:
+                continue
+            if fields is not None:
+                place = fields.over_bound(m_new)
+                if place >= 0:
+                    raise fields.violation(pn, m_new, place, m, t)
+            j = table.add(m_new, i, t)
+            if mask is not None and m_new & mask == value:
+                return result(j)
+            pending.append(j)
+        if deadlock and not enabled:
+            return result(i)
+
+    return result(None)
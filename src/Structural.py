@@ -0,0 +1,396 @@
+import warnings
+import numpy as np
+from math import gcd
+from .PetriNet import PetriNet
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Số hàng tối đa của ma trận trung gian trong thuật toán Farkas (số semiflow tối
+# tiểu có thể tăng theo hàm mũ với số place)
+FARKAS_MAX_ROWS = 20000
+
+
+def incidence_matrix(pn: PetriNet) -> np.ndarray:
+    """C = O - I, dạng (n_trans, n_places): thay đổi số token khi bắn từng transition."""
+    return pn.O.astype(np.int64) - pn.I.astype(np.int64)
+
+
+def _normalize(rows: np.ndarray) -> np.ndarray:
+    """Chia mỗi hàng cho ước chung lớn nhất của nó (hàng 0 giữ nguyên)."""
+    g = np.gcd.reduce(np.abs(rows), axis=1)
+    g[g == 0] = 1
+    return rows // g[:, None]
+
+
+def _support(y: np.ndarray) -> int:
+    s = 0
+    for i in np.flatnonzero(y).tolist():
+        s |= 1 << i
+    return s
+
+
+def _minimal_supports(rows: np.ndarray, offset: int) -> np.ndarray:
+    """
+    Bỏ hàng có support (phần y, từ cột offset) chứa thực sự support của hàng khác
+    (không sinh ra được semiflow tối tiểu nào) và hàng trùng lặp.
+    """
+    supports = [_support(y) for y in rows[:, offset:]]
+    order = sorted(range(len(rows)), key=lambda i: bin(supports[i]).count("1"))
+    kept: List[int] = []
+    for i in order:
+        s = supports[i]
+        if all(s & supports[k] != supports[k]
+               or (supports[k] == s and not np.array_equal(rows[k], rows[i])) for k in kept):
+            kept.append(i)
+    return rows[sorted(kept)]
+
+
+def p_semiflows(pn: PetriNet, max_rows: int = FARKAS_MAX_ROWS) -> np.ndarray:
+    """
+    P-semiflow tối tiểu: vector nguyên y >= 0, y != 0 với C · y = 0, tức y · M
+    không đổi trên mọi marking reachable (y · M = y · M0). Thuật toán Farkas trên
+    ma trận [C^T | I_P]: lần lượt triệt tiêu từng cột transition bằng tổ hợp
+    dương của một hàng có hệ số dương với một hàng có hệ số âm, chỉ giữ các hàng
+    có support tối tiểu. Cột được chọn theo số tổ hợp sinh ra ít nhất.
+    Trả về mảng (k, |P|) int64, mỗi hàng đã chia cho ước chung lớn nhất.
+    Ma trận trung gian vượt max_rows hàng -> ValueError.
+    """
+    C = incidence_matrix(pn)
+    num_trans, num_places = C.shape
+    rows = np.hstack([C.T, np.eye(num_places, dtype=np.int64)])
+    remaining = set(range(num_trans))
+
+    while remaining and len(rows):
+        def cost(j):
+            pos = int(np.count_nonzero(rows[:, j] > 0))
+            neg = int(np.count_nonzero(rows[:, j] < 0))
+            return pos * neg - pos - neg
+        j = min(remaining, key=cost)
+        remaining.discard(j)
+
+        col = rows[:, j]
+        pos, neg = rows[col > 0], rows[col < 0]
+        kept = rows[col == 0]
+        # Tổ hợp theo từng khối hàng dương (mỗi khối tối đa ~max_rows tổ hợp) và lọc
+        # support tối tiểu ngay, không dựng cả mảng |pos| x |neg| một lúc
+        step = max(1, max_rows // max(1, len(neg)))
+        for start in range(0, len(pos), step):
+            block = pos[start:start + step]
+            combined = (-neg[:, j])[None, :, None] * block[:, None, :] + \
+                block[:, j][:, None, None] * neg[None, :, :]
+            combined = combined.reshape(-1, rows.shape[1])
+            kept = _minimal_supports(np.vstack([kept, _normalize(combined)]), num_trans)
+            if len(kept) > max_rows:
+                raise ValueError(f"Farkas algorithm exceeded {max_rows} rows")
+        rows = kept
+
+    return rows[:, num_trans:]
+
+
+def structural_bounds(pn: PetriNet, flows: Optional[np.ndarray] = None) -> List[Optional[int]]:
+    """
+    Cận trên số token của từng place suy từ semiflow: với y phủ p (y_p > 0),
+    y_p · M(p) <= y · M = y · M0 nên M(p) <= (y · M0) // y_p. Lấy min trên các
+    semiflow phủ p; None nếu không semiflow nào phủ p (không kết luận được).
+    """
+    flows = p_semiflows(pn) if flows is None else np.asarray(flows, dtype=np.int64)
+    M0 = np.asarray(pn.M0, dtype=np.int64)
+    bounds: List[Optional[int]] = [None] * pn.num_places
+    for y in flows:
+        c = int(y @ M0)
+        for p in np.flatnonzero(y > 0).tolist():
+            b = c // int(y[p])
+            if bounds[p] is None or b < bounds[p]:
+                bounds[p] = b
+    return bounds
+
+
+def is_structurally_safe(pn: PetriNet, flows: Optional[np.ndarray] = None) -> bool:
+    """
+    Net được phủ bởi semiflow và mọi cận <= 1: chứng minh net 1-safe (theo ngữ
+    nghĩa P/T) mà không cần duyệt. Khi đó điều kiện "output-only phải rỗng" của
+    các engine 1-safe luôn thỏa, nên hai ngữ nghĩa cho cùng tập reachable.
+    Trả về False nghĩa là không chứng minh được, không phải net không safe.
+    """
+    return all(b is not None and b <= 1 for b in structural_bounds(pn, flows))
+
+
+class ImpliedPlace:
+    """
+    Giá trị của place suy ra từ các place khác trên mọi marking reachable:
+    divisor · M(place) = constant - Σ terms[q] · M(q).
+    """
+
+    def __init__(self, place: int, divisor: int, constant: int, terms: Dict[int, int]):
+        self.place = place
+        self.divisor = divisor
+        self.constant = constant
+        self.terms = terms
+
+    def value(self, M: Sequence[int]) -> int:
+        return (self.constant - sum(a * int(M[q]) for q, a in self.terms.items())) // self.divisor
+
+    def __repr__(self) -> str:
+        return (f"ImpliedPlace(place={self.place}, divisor={self.divisor}, "
+                f"constant={self.constant}, terms={self.terms})")
+
+
+def implied_places(pn: PetriNet, flows: Optional[np.ndarray] = None) -> List[ImpliedPlace]:
+    """
+    Khử Gauss–Jordan nguyên (không dùng phân số) trên hệ y · M = y · M0 của các
+    semiflow: mỗi hàng độc lập cho một place trụ (pivot) có giá trị là hàm của
+    các place không phải trụ. Số place trụ = hạng của tập semiflow; các place
+    còn lại đủ để xác định cả marking.
+    """
+    flows = p_semiflows(pn) if flows is None else np.asarray(flows, dtype=np.int64)
+    M0 = np.asarray(pn.M0, dtype=np.int64)
+    num_places = pn.num_places
+    rows = [[int(v) for v in y] + [int(y @ M0)] for y in flows]
+
+    pivots: List[int] = []
+    r = 0
+    for col in range(num_places):
+        i = next((i for i in range(r, len(rows)) if rows[i][col]), None)
+        if i is None:
+            continue
+        rows[r], rows[i] = rows[i], rows[r]
+        a = rows[r][col]
+        for i in range(len(rows)):
+            b = rows[i][col]
+            if i == r or not b:
+                continue
+            row = [a * u - b * v for u, v in zip(rows[i], rows[r])]
+            g = 0
+            for v in row:
+                g = gcd(g, v)
+            rows[i] = [v // g for v in row] if g else row
+        pivots.append(col)
+        r += 1
+
+    result = []
+    for row, p in zip(rows, pivots):
+        sign = 1 if row[p] > 0 else -1
+        terms = {q: sign * row[q] for q in range(num_places) if q != p and row[q]}
+        result.append(ImpliedPlace(p, sign * row[p], sign * row[-1], terms))
+    return result
+
+
+class Reduction:
+    """
+    Net rút gọn cùng ánh xạ ngược về net gốc:
+    - net         : PetriNet rút gọn (duyệt bằng bất kỳ engine nào)
+    - places      : chỉ số place gốc của từng place trong net rút gọn
+    - rules       : ImpliedPlace của các place đã loại, theo thứ tự bị loại; terms
+                    chỉ dùng các place còn lại lúc đó (place gộp: hằng 0)
+    - transitions : {transition id rút gọn: dãy transition id gốc tương ứng}
+    - exact       : True nếu expand_all(R rút gọn) đúng bằng R gốc. False (có
+                    agglomeration) thì chỉ dựng lại các marking gốc có place đã gộp
+                    rỗng — đủ cho deadlock và truy vấn trên các place còn giữ, không
+                    có các marking trung gian khi token còn nằm ở place đã gộp.
+    """
+
+    def __init__(self, original: PetriNet, net: PetriNet, places: List[int],
+                 rules: List[ImpliedPlace], transitions: Dict[str, List[str]], exact: bool):
+        self.original = original
+        self.net = net
+        self.places = places
+        self.rules = rules
+        self.transitions = transitions
+        self.exact = exact
+
+    def __repr__(self) -> str:
+        return (f"Reduction(places={self.original.num_places}->{self.net.num_places}, "
+                f"transitions={self.original.num_trans}->{self.net.num_trans}, exact={self.exact})")
+
+    def expand(self, marking: Sequence[int]) -> Tuple[int, ...]:
+        """Marking của net rút gọn -> marking tương ứng của net gốc."""
+        M = [0] * self.original.num_places
+        for i, p in enumerate(self.places):
+            M[p] = int(marking[i])
+        for rule in reversed(self.rules):
+            M[rule.place] = rule.value(M)
+        return tuple(M)
+
+    def expand_all(self, markings) -> set:
+        return {self.expand(m) for m in markings}
+
+    def expand_trace(self, trace: Sequence[str]) -> List[str]:
+        """Dãy transition của net rút gọn -> dãy transition gốc bắn được từ M0."""
+        return [t for u in trace for t in self.transitions[u]]
+
+
+def reduce_net(pn: PetriNet, bound: Optional[int] = None,
+               flows: Optional[np.ndarray] = None) -> Reduction:
+    """
+    Áp dụng lặp các luật rút gọn cổ điển tới khi không còn thay đổi:
+    - place cô lập (không có cung)                : hằng M0(p)
+    - place trùng (cùng cung vào/ra và M0)         : M(p) = M(q)
+    - transition trùng (cùng pre / post)           : giữ một
+    - place ngầm định (không transition nào lấy token, giá trị suy từ semiflow)
+    - agglomeration chuỗi (fusion of series places / transitions): place p có
+      M0(p) = 0, các transition f lấy token từ p chỉ có input là p (trọng số 1) và
+      không trùng các transition h đưa token vào p (trọng số 1); f luôn bắn được
+      ngay sau h nên thay mỗi cặp bằng transition h+f và bỏ p
+    Hai luật cuối chỉ đúng với ngữ nghĩa P/T nên chỉ áp dụng khi semiflow chứng
+    minh mọi place <= bound (1 nếu bound=None, khi đó hai ngữ nghĩa trùng nhau);
+    hai luật đầu đúng với mọi net.
+    """
+    flows = p_semiflows(pn) if flows is None else np.asarray(flows, dtype=np.int64)
+    limit = 1 if bound is None else bound
+    pt_rules = all(b is not None and b <= limit for b in structural_bounds(pn, flows))
+
+    num_places = pn.num_places
+    I = pn.I.astype(np.int64).copy()
+    O = pn.O.astype(np.int64).copy()
+    M0 = np.asarray(pn.M0, dtype=np.int64)
+    flows = [y.copy() for y in flows]
+    alive = [True] * num_places
+    trans_ids = list(pn.trans_ids)
+    trans_names = list(pn.trans_names)
+    sequences = [[t] for t in trans_ids]
+    rules: List[ImpliedPlace] = []
+    exact = True
+
+    def remove_place(p: int, rule: ImpliedPlace) -> None:
+        alive[p] = False
+        rules.append(rule)
+        I[:, p] = 0
+        O[:, p] = 0
+
+    changed = True
+    while changed:
+        changed = False
+
+        # Place cô lập và place trùng
+        columns: Dict[Tuple[bytes, bytes, int], int] = {}
+        for p in range(num_places):
+            if not alive[p]:
+                continue
+            if not I[:, p].any() and not O[:, p].any():
+                for y in flows:
+                    y[p] = 0
+                remove_place(p, ImpliedPlace(p, 1, int(M0[p]), {}))
+                changed = True
+                continue
+            key = (I[:, p].tobytes(), O[:, p].tobytes(), int(M0[p]))
+            q = columns.setdefault(key, p)
+            if q != p:
+                for y in flows:
+                    y[q] += y[p]
+                    y[p] = 0
+                remove_place(p, ImpliedPlace(p, 1, 0, {q: -1}))
+                changed = True
+
+        # Transition trùng
+        rows: Dict[Tuple[bytes, bytes], int] = {}
+        keep = []
+        for t in range(len(trans_ids)):
+            key = (I[t].tobytes(), O[t].tobytes())
+            if rows.setdefault(key, t) == t:
+                keep.append(t)
+        if len(keep) < len(trans_ids):
+            I, O = I[keep], O[keep]
+            trans_ids = [trans_ids[t] for t in keep]
+            trans_names = [trans_names[t] for t in keep]
+            sequences = [sequences[t] for t in keep]
+            changed = True
+
+        if not pt_rules:
+            continue
+
+        # Place ngầm định: không bao giờ chặn transition nào, giá trị lấy từ semiflow
+        for p in range(num_places):
+            if not alive[p] or I[:, p].any():
+                continue
+            covering = [y for y in flows if y[p] > 0]
+            if not covering:
+                continue
+            y = min(covering, key=lambda y: int(np.count_nonzero(y)))
+            terms = {q: int(y[q]) for q in np.flatnonzero(y).tolist() if q != p}
+            remove_place(p, ImpliedPlace(p, int(y[p]), int(y @ M0), terms))
+            flows = [y for y in flows if y[p] == 0]
+            changed = True
+
+        # Agglomeration chuỗi
+        for p in range(num_places):
+            if not alive[p] or M0[p]:
+                continue
+            H = np.flatnonzero(O[:, p]).tolist()
+            F = np.flatnonzero(I[:, p]).tolist()
+            if not H or not F or set(H) & set(F) or len(H) * len(F) > len(H) + len(F):
+                continue
+            if any(O[h, p] != 1 or I[h, p] for h in H):
+                continue
+            if any(I[f, p] != 1 or O[f, p] or np.count_nonzero(I[f]) != 1 for f in F):
+                continue
+            merged_O = [O[h] + O[f] for h in H for f in F]
+            if bound is None and any(row.max() > 1 for row in merged_O):
+                continue
+
+            keep = [t for t in range(len(trans_ids)) if t not in H and t not in F]
+            new_ids = []
+            for h in H:
+                for f in F:
+                    tid = f"{trans_ids[h]}+{trans_ids[f]}"
+                    while tid in trans_ids or tid in new_ids:
+                        tid += "'"
+                    new_ids.append(tid)
+            I = np.vstack([I[keep]] + [I[h][None, :] for h in H for f in F])
+            O = np.vstack([O[keep]] + [row[None, :] for row in merged_O])
+            sequences = [sequences[t] for t in keep] + \
+                [sequences[h] + sequences[f] for h in H for f in F]
+            trans_ids = [trans_ids[t] for t in keep] + new_ids
+            trans_names = [trans_names[t] for t in keep] + [None] * len(new_ids)
+            for y in flows:
+                y[p] = 0
+            remove_place(p, ImpliedPlace(p, 1, 0, {}))
+            exact = False
+            changed = True
+
+    places = [p for p in range(num_places) if alive[p]]
+    net = PetriNet(
+        [pn.place_ids[p] for p in places], trans_ids,
+        [pn.place_names[p] for p in places], trans_names,
+        I[:, places], O[:, places], np.asarray(pn.M0)[places],
+    )
+    return Reduction(pn, net, places, rules, dict(zip(trans_ids, sequences)), exact)
+
+
+class StructuralAnalysis:
+    """
+    Kết quả phân tích cấu trúc trước khi duyệt (analyze):
+    - semiflows : P-semiflow tối tiểu, mảng (k, |P|)
+    - bounds    : cận token của từng place suy từ semiflow (None nếu không phủ)
+    - safe      : chứng minh được net 1-safe (is_structurally_safe)
+    - implied   : place có giá trị suy ra từ các place khác (implied_places)
+    - reduction : net rút gọn và ánh xạ ngược (reduce_net)
+    """
+
+    def __init__(self, semiflows: np.ndarray, bounds: List[Optional[int]], safe: bool,
+                 implied: List[ImpliedPlace], reduction: Optional[Reduction]):
+        self.semiflows = semiflows
+        self.bounds = bounds
+        self.safe = safe
+        self.implied = implied
+        self.reduction = reduction
+
+    def __repr__(self) -> str:
+        return (f"StructuralAnalysis(semiflows={len(self.semiflows)}, safe={self.safe}, "
+                f"implied={len(self.implied)}, reduction={self.reduction})")
+
+
+def analyze(pn: PetriNet, bound: Optional[int] = None, reduce: bool = True,
+            max_rows: int = FARKAS_MAX_ROWS) -> StructuralAnalysis:
+    """
+    Phân tích cấu trúc: semiflow (Farkas), cận token / chứng minh 1-safe, place
+    suy ra được và net rút gọn. Farkas vượt max_rows thì cảnh báo và tiếp tục
+    như net không có semiflow (chỉ các luật rút gọn không cần semiflow).
+    """
+    try:
+        flows = p_semiflows(pn, max_rows)
+    except ValueError as e:
+        warnings.warn(f"Skipping P-semiflows: {e}")
+        flows = np.zeros((0, pn.num_places), dtype=np.int64)
+    bounds = structural_bounds(pn, flows)
+    safe = all(b is not None and b <= 1 for b in bounds)
+    reduction = reduce_net(pn, bound, flows) if reduce else None
+    return StructuralAnalysis(flows, bounds, safe, implied_places(pn, flows), reduction)
@@ -0,0 +1,28 @@
+from src.Generator import NetBuilder
+from src.BFS import bfs_reachable
+from src.DFS import dfs_reachable
+
+
+def one_token_ring(n: int):
+    """Vòng n place, một token đi vòng p_i -> p_{i+1}: đúng n marking reachable."""
+    b = NetBuilder()
+    for i in range(n):
+        b.add_place(f"p{i}", 1 if i == 0 else 0)
+    for i in range(n):
+        b.add_transition(f"t{i}", [f"p{i}"], [f"p{(i + 1) % n}"])
+    return b.build()
+
+
+def test_bitstate_ring_wider_than_hash_modulus():
+    # Marking chỉ có p0 và chỉ có p61 lệch nhau 2^61 - 1 (modulus của hash(int))
+    for n in (62, 130):
+        pn = one_token_ring(n)
+        for result in (bfs_reachable(pn, mode="bitstate"),
+                       dfs_reachable(pn, mode="bitstate", memory_bytes=1 << 16, hashes=4)):
+            assert len(result) == n
+
+
+def test_bitstate_matches_packed():
+    pn = one_token_ring(70)
+    assert len(bfs_reachable(pn, mode="bitstate", memory_bytes=4096, hashes=2)) == \
+        len(bfs_reachable(pn, mode="packed"))
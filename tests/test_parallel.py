@@ -0,0 +1,32 @@
+import pytest
+
+from src.Generator import fork_join, fork_join_states, philosophers, philosophers_states
+from src.BFS import bfs_reachable
+from src.DFS import dfs_reachable
+
+
+def test_parallel_matches_sequential_wide_net():
+    # 1 + 2 * 34 = 69 place: packed marking dài hơn một word 64 bit
+    pn = fork_join(2, length=33)
+    expected = bfs_reachable(pn, mode="packed")
+    assert len(expected) == fork_join_states(2, length=33)
+    assert bfs_reachable(pn, workers=3) == expected
+    assert dfs_reachable(pn, mode="packed", workers=3) == expected
+
+
+def test_parallel_matches_sequential_with_deadlock():
+    # Mọi triết gia cùng cầm đũa trái: marking không có successor nào
+    pn = philosophers(5)
+    expected = bfs_reachable(pn)
+    assert len(expected) == philosophers_states(5)
+    assert bfs_reachable(pn, workers=3) == expected
+    assert dfs_reachable(pn, mode="packed", workers=3) == expected
+
+
+@pytest.mark.parametrize("workers", [0, -2])
+def test_invalid_workers_rejected(workers):
+    pn = philosophers(2)
+    with pytest.raises(ValueError):
+        bfs_reachable(pn, workers=workers)
+    with pytest.raises(ValueError):
+        dfs_reachable(pn, mode="packed", workers=workers)